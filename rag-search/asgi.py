@@ -0,0 +1,8 @@
+"""
+ASGI entry point for rag-search; see rag_search.asgi.
+
+    uvicorn asgi:application --port 9000
+"""
+from rag_search.asgi import application
+
+__all__ = ["application"]
@@ -0,0 +1 @@
+"""Offline benchmarks: fake upstream APIs (fake_upstreams) and a load tester (loadtest)."""
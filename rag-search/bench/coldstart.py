@@ -0,0 +1,146 @@
+"""
+Cold-start benchmark for rag-search.
+
+Measures what a new replica pays before it can serve: the time to import
+the app (from `python -X importtime`, median over several fresh
+interpreters), the modules that cost the most, and the wall time from
+starting a server process to its first /health response. SDKs that must
+stay lazy (google.genai, serpapi) are checked not to be imported.
+
+    python -m bench.coldstart
+    python -m bench.coldstart --server gunicorn --max-import-ms 500 --max-ready-ms 1000
+
+Run from the rag-search directory. Exits non-zero when a budget is exceeded
+(by default 700 ms to import and 1500 ms to the first response; 0 turns a
+budget off) or a lazy module is imported eagerly, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.loadtest import ROOT, SERVERS, free_port
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def env():
+    return dict(
+        os.environ,
+        GOOGLE_API_KEY="bench",
+        AGENTVERSE_API_KEY="bench",
+        GOOGLE_SERP_API="bench",
+        WARM_CLIENTS="false",
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING")
+    )
+
+
+def import_profile(module):
+    """
+    One `python -X importtime -c "import module"` run.
+
+    Returns:
+        dict: module name -> (self us, cumulative us) for every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env(), capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            profile[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return profile
+
+
+def time_to_ready(server, timeout=30):
+    """Seconds from starting the server process to its first 200 from /health"""
+    port = free_port()
+    command = [part.format(port=port) for part in SERVERS[server]]
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # One client for all polls: building a client (and its SSL context) per poll would compete with the server for CPU
+    client = httpx.Client(timeout=1)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{server} exited with {process.returncode} before becoming ready")
+            try:
+                if client.get(url).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        raise RuntimeError(f"{server} not ready after {timeout}s")
+    finally:
+        client.close()
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="app", help="module to import, e.g. asgi")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to take the median over")
+    parser.add_argument("--top", type=int, default=10, help="most expensive modules to list")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="flask", help="server mode for the time-to-ready run")
+    parser.add_argument("--no-server", action="store_true", help="only measure the import")
+    parser.add_argument("--forbid", default="google.genai,serpapi", help="comma-separated modules that must not be imported")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-import-ms", type=float, default=700,
+                        help="fail if the median import time exceeds this; 0 to disable")
+    parser.add_argument("--max-ready-ms", type=float, default=1500,
+                        help="fail if the median time to first response exceeds this; 0 to disable")
+    args = parser.parse_args(argv)
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(p[args.module][1] for p in profiles) / 1000
+    self_ms = {
+        name: statistics.median(p.get(name, (0, 0))[0] for p in profiles) / 1000
+        for name in profiles[0]
+    }
+    top = sorted(self_ms.items(), key=lambda item: -item[1])[:args.top]
+    forbidden = [name for name in args.forbid.split(",") if name and name in profiles[0]]
+
+    ready_ms = None
+    if not args.no_server:
+        ready_ms = statistics.median(time_to_ready(args.server) for _ in range(args.runs)) * 1000
+
+    print(f"import {args.module}: {import_ms:.1f} ms (median of {args.runs}), {len(profiles[0])} modules")
+    for name, ms in top:
+        print(f"  {ms:8.1f} ms  {name}")
+    if ready_ms is not None:
+        print(f"{args.server} ready: {ready_ms:.1f} ms from process start to first /health response")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": args.module,
+                "import_ms": round(import_ms, 1),
+                "modules": len(profiles[0]),
+                "top_self_ms": dict((name, round(ms, 1)) for name, ms in top),
+                "server": None if args.no_server else args.server,
+                "ready_ms": None if ready_ms is None else round(ready_ms, 1)
+            }, f, indent=2)
+
+    failures = [f"{name} is imported by import {args.module}" for name in forbidden]
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        failures.append(f"import {args.module} took {import_ms:.1f} ms > {args.max_import_ms} ms")
+    if args.max_ready_ms and ready_ms is not None and ready_ms > args.max_ready_ms:
+        failures.append(f"{args.server} ready after {ready_ms:.1f} ms > {args.max_ready_ms} ms")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
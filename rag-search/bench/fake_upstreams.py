@@ -0,0 +1,279 @@
+"""
+Local stand-ins for the ASI chat, Gemini embedding and SerpAPI endpoints.
+
+    POST /v1/chat/completions                     ASI chat completions, plain or streamed
+    POST /v1beta/models/<model>:batchEmbedContents Gemini embeddings
+    GET  /search                                  SerpAPI, serves fixtures/search_test.json
+
+Answers are shaped by the response_format schema name the app sends, so
+/clean, /clean/batch and /search all get parseable model output. Each
+call sleeps for a latency drawn from a simple model (fixed cost + jitter,
+plus output tokens over a token rate for chat, plus a per-text cost for
+embeddings), and a configurable share of calls fail with 429 or 500.
+
+    python -m bench.fake_upstreams --port 9100 --chat-latency-ms 300 --error-rate 0.01
+
+Point the app at it with ASI_CHAT_URL, GEMINI_BASE_URL and SERPAPI_URL
+(bench.loadtest does this for you).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+
+import numpy as np
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "search_test.json")
+
+EMBED_PATH = re.compile(r"^/v1beta/models/[^/:]+:(batchEmbedContents|embedContent)$")
+TABLE_ROW = re.compile(r"^(\d+)\|", re.MULTILINE)
+
+
+class LatencyModel:
+    """
+    Simulated upstream behaviour.
+
+    Args:
+        chat_latency_ms (float): Fixed cost of a chat completion
+        tokens_per_second (float): Output token rate; 0 makes generation free
+        embed_latency_ms (float): Fixed cost of an embedding call
+        embed_per_text_ms (float): Added cost per text in a batch
+        serp_latency_ms (float): Cost of a product search
+        jitter (float): Latencies are scaled by a uniform factor in [1 - jitter, 1 + jitter]
+        error_rate (float): Share of calls answered with 500
+        throttle_rate (float): Share of calls answered with 429 and Retry-After
+        dim (int): Embedding dimension
+    """
+
+    def __init__(self, chat_latency_ms=300, tokens_per_second=200, embed_latency_ms=80, embed_per_text_ms=2,
+                 serp_latency_ms=400, jitter=0.2, error_rate=0.0, throttle_rate=0.0, dim=3072):
+        self.chat_latency = chat_latency_ms / 1000
+        self.tokens_per_second = tokens_per_second
+        self.embed_latency = embed_latency_ms / 1000
+        self.embed_per_text = embed_per_text_ms / 1000
+        self.serp_latency = serp_latency_ms / 1000
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.dim = dim
+
+    def delay(self, seconds):
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def failure(self):
+        """(status, headers) for a simulated failure, or None"""
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429, [(b"retry-after", b"1")]
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, []
+        return None
+
+
+def _embedded_json(message):
+    """The JSON document the app appends to its prompts ("summarize this data: {...}")"""
+    starts = [i for i in (message.find("{"), message.find("[")) if i != -1]
+    if not starts:
+        return None
+    try:
+        return json.loads(message[min(starts):])
+    except ValueError:
+        return None
+
+
+def _summary(record):
+    return f"A page at {record.get('url', 'an unknown site')} about {str(record.get('metadata', ''))[:200]}"
+
+
+def _clean(record):
+    return {
+        "url": record.get("url", ""),
+        "metadata": str(record.get("metadata", ""))[:500],
+        "timestamp": record.get("timestamp"),
+        "getGeolocation": record.get("geolocation") if isinstance(record.get("geolocation"), dict) else None
+    }
+
+
+def chat_content(body):
+    """Model output matching the schema named in the request's response_format"""
+    schema = ((body.get("response_format") or {}).get("json_schema") or {}).get("name", "")
+    message = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+
+    if schema == "number_list_with_message":
+        positions = TABLE_ROW.findall(message)[:10]
+        return {"index": positions, "ai_message": "These match what you have been browsing lately."}
+    if schema == "search_message":
+        return {"ai_message": "These match what you have been browsing lately."}
+    record = _embedded_json(message)
+    if schema == "data_summary":
+        return {"context": _summary(record or {})}
+    if schema == "data_extraction_summary":
+        return {"cleaned": _clean(record or {}), "context": _summary(record or {})}
+    if schema.endswith("_batch"):
+        results = []
+        for item in record if isinstance(record, list) else []:
+            result = {"id": item.get("id"), "context": _summary(item)}
+            if schema == "data_extraction_summary_batch":
+                result["cleaned"] = _clean(item)
+            results.append(result)
+        return {"results": results}
+    return {"message": "ok"}
+
+
+def embedding(text, dim):
+    """Deterministic unit vector for a text, so repeated texts embed identically"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send(send, status, body, content_type=b"application/json", headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode("ascii")), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload, headers=()):
+    await _send(send, status, json.dumps(payload).encode("utf-8"), headers=headers)
+
+
+class FakeUpstreams:
+    """ASGI application serving all three fake APIs"""
+
+    def __init__(self, model, products=None):
+        self.model = model
+        if products is None:
+            with open(FIXTURE) as f:
+                products = json.load(f)
+        self.products = products
+        self.calls = {"chat": 0, "embed": 0, "serp": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": message["type"] + ".complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+        if scope["type"] != "http":
+            return
+
+        path, method = scope["path"], scope["method"]
+        if method == "POST" and path == "/v1/chat/completions":
+            await self.chat(receive, send)
+        elif method == "POST" and EMBED_PATH.match(path):
+            await self.embed(receive, send)
+        elif method == "GET" and path == "/search":
+            await self.serp(send)
+        elif method in ("GET", "HEAD") and path == "/stats":
+            await _send_json(send, 200, self.calls)
+        else:
+            await _send_json(send, 404, {"error": f"No fake for {method} {path}"})
+
+    async def _fail(self, send):
+        failure = self.model.failure()
+        if failure is None:
+            return False
+        status, headers = failure
+        await _send_json(send, status, {"error": {"code": status, "message": "Simulated failure", "status": "UNAVAILABLE"}}, headers)
+        return True
+
+    async def chat(self, receive, send):
+        self.calls["chat"] += 1
+        body = json.loads(await _read_body(receive) or b"{}")
+        if await self._fail(send):
+            return
+        content = json.dumps(chat_content(body))
+        tokens = max(1, len(content) // 4)
+        generation = tokens / self.model.tokens_per_second if self.model.tokens_per_second else 0.0
+        await asyncio.sleep(self.model.delay(self.model.chat_latency))
+
+        if not body.get("stream"):
+            await asyncio.sleep(generation)
+            await _send_json(send, 200, {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"completion_tokens": tokens}
+            })
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        })
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        for piece in pieces:
+            await asyncio.sleep(generation / len(pieces))
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+    async def embed(self, receive, send):
+        self.calls["embed"] += 1
+        body = json.loads(await _read_body(receive) or b"{}")
+        if await self._fail(send):
+            return
+        requests = body.get("requests") or [body]
+        texts = [" ".join(part.get("text", "") for part in r.get("content", {}).get("parts", [])) for r in requests]
+        await asyncio.sleep(self.model.delay(self.model.embed_latency + self.model.embed_per_text * len(texts)))
+        embeddings = [{"values": embedding(text, self.model.dim)} for text in texts]
+        await _send_json(send, 200, {"embeddings": embeddings} if "requests" in body else {"embedding": embeddings[0]})
+
+    async def serp(self, send):
+        self.calls["serp"] += 1
+        if await self._fail(send):
+            return
+        await asyncio.sleep(self.model.delay(self.model.serp_latency))
+        await _send_json(send, 200, {"search_metadata": {"status": "Success"}, "organic_results": self.products})
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--chat-latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--embed-per-text-ms", type=float, default=2)
+    parser.add_argument("--serp-latency-ms", type=float, default=400)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=3072)
+    args = parser.parse_args(argv)
+
+    model = LatencyModel(
+        chat_latency_ms=args.chat_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        embed_latency_ms=args.embed_latency_ms,
+        embed_per_text_ms=args.embed_per_text_ms,
+        serp_latency_ms=args.serp_latency_ms,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        dim=args.dim
+    )
+    # workers=1: uvicorn would otherwise pick up WEB_CONCURRENCY meant for the app server
+    uvicorn.run(FakeUpstreams(model), host=args.host, port=args.port, log_level="warning", workers=1)
+
+
+if __name__ == "__main__":
+    main()
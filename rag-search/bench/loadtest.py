@@ -0,0 +1,249 @@
+"""
+Offline load test for rag-search.
+
+Starts bench.fake_upstreams and the app (in the chosen server mode) as
+subprocesses wired to each other, drives /clean, /embedding and /search at
+each concurrency level, and reports throughput, latency percentiles,
+errors and the server's memory. No real API keys or quota are used.
+
+    python -m bench.loadtest --server asgi --concurrency 1,16,64 --requests 300
+    python -m bench.loadtest --json results.json --max-p99-ms 2000 --max-error-rate 0.01
+
+Run from the rag-search directory. Exits non-zero when a threshold is
+exceeded, so it can gate CI.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Server mode -> command line; {port} is filled in
+SERVERS = {
+    "flask": [sys.executable, "-m", "flask", "--app", "app", "run", "--port", "{port}", "--no-reload", "--with-threads"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:application", "--port", "{port}", "--log-level", "warning"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "--bind", "127.0.0.1:{port}", "--access-logfile", "/dev/null", "app:app"],
+    "gunicorn-asgi": [sys.executable, "-m", "gunicorn", "--bind", "127.0.0.1:{port}", "--access-logfile", "/dev/null",
+                      "--worker-class", "uvicorn_worker.UvicornWorker", "asgi:application"],
+}
+
+SEARCH_TERMS = ["jet air plane", "rc plane for beginners", "fighter jet book", "balloon arch kit", "coloring book"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with {process.returncode} before becoming ready")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def _status(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return dict(line.split(":", 1) for line in f)
+    except OSError:
+        return None
+
+
+def memory_mb(pid):
+    """
+    (current, peak) resident memory in MB of a process and its direct children
+    (e.g. a gunicorn master and its workers), from /proc; None where unavailable.
+    """
+    statuses = [_status(pid)]
+    if statuses[0] is None:
+        return None, None
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            status = _status(entry)
+            if status and status.get("PPid", "").strip() == str(pid):
+                statuses.append(status)
+
+    def mb(name):
+        return round(sum(int(s[name].split()[0]) for s in statuses if name in s) / 1024, 1)
+    return mb("VmRSS"), mb("VmHWM")
+
+
+def payloads(endpoint, run_id):
+    """Endless distinct request bodies, so request coalescing and the /search cache don't flatter the numbers"""
+    for n in itertools.count():
+        if endpoint == "clean":
+            yield {
+                "url": f"https://www.amazon.in/product-{run_id}-{n}/dp/B0DXF6NJ36/?tag=bench&utm_source={n}",
+                "metadata": f"Benchmark product {n}: a remote control plane with a {n % 7 + 2}-channel transmitter.",
+                "timestamp": 1759006852 + n,
+                "geolocation": {"ok": True, "latitude": 28.6542, "longitude": 77.2373},
+                "user_id": f"bench-{n % 16}"
+            }
+        elif endpoint == "embedding":
+            yield {"text": f"benchmark text {run_id}-{n} about remote control planes"}
+        else:
+            yield {
+                "search": f"{SEARCH_TERMS[n % len(SEARCH_TERMS)]} {run_id}-{n}",
+                "context": [f"Watched a video about jet engines {n % 5}", "Browsed RC planes on Amazon"],
+                "user_id": f"bench-{n % 16}"
+            }
+
+
+async def drive(base_url, endpoint, concurrency, total, run_id):
+    """Send `total` requests to one endpoint with `concurrency` in flight; returns (latencies, errors, seconds)"""
+    bodies = payloads(endpoint, run_id)
+    latencies = []
+    errors = {}
+    sent = 0
+
+    async def worker(client):
+        nonlocal sent
+        while sent < total:
+            sent += 1
+            body = next(bodies)
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/{endpoint}", json=body)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+
+
+def summarize(endpoint, concurrency, latencies, errors, seconds, pid):
+    ms = np.asarray(latencies) * 1000
+    rss, peak = memory_mb(pid)
+    failed = sum(errors.values())
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(failed / len(latencies), 4) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "max_ms": round(float(ms.max()), 1),
+        "rss_mb": rss,
+        "peak_rss_mb": peak
+    }
+
+
+def print_table(results):
+    columns = ["endpoint", "concurrency", "requests", "error_rate", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "rss_mb", "peak_rss_mb"]
+    widths = [max(len(c), *(len(str(r[c])) for r in results)) for c in columns]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in results:
+        print("  ".join(str(r[c]).rjust(w) for c, w in zip(columns, widths)))
+
+
+def start(command, env, log):
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", choices=sorted(SERVERS), default="flask")
+    parser.add_argument("--endpoints", default="clean,embedding,search")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    parser.add_argument("--upstream-args", default="", help="extra arguments for bench.fake_upstreams, e.g. '--error-rate 0.01'")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="keep the app's upstream rate limits instead of lifting them")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if any run's p99 latency exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="fail if any run's error rate exceeds this")
+    args = parser.parse_args(argv)
+
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    env = dict(
+        os.environ,
+        ASI_CHAT_URL=f"{upstream_url}/v1/chat/completions",
+        GEMINI_BASE_URL=f"{upstream_url}/",
+        SERPAPI_URL=upstream_url,
+        GOOGLE_API_KEY="bench",
+        AGENTVERSE_API_KEY="bench",
+        GOOGLE_SERP_API="bench",
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+        WARM_CLIENTS="false"
+    )
+    # Every /search runs the full pipeline; export SEARCH_CACHE_TTL to measure with the answer cache on
+    env.setdefault("SEARCH_CACHE_TTL", "0")
+    if not args.keep_rate_limits:
+        for name in ("ASI", "GEMINI", "SERP"):
+            env.setdefault(f"{name}_RATE_LIMIT", "100000")
+            env.setdefault(f"{name}_BURST", "100000")
+            env.setdefault(f"{name}_MAX_CONCURRENCY", "1024")
+
+    log = open(os.path.join(ROOT, "bench", "loadtest.log"), "w")
+    processes = []
+    try:
+        upstreams = start([sys.executable, "-m", "bench.fake_upstreams", "--port", str(upstream_port), *args.upstream_args.split()], env, log)
+        processes.append(upstreams)
+        wait_ready(f"{upstream_url}/stats", upstreams)
+
+        server = start([part.format(port=app_port) for part in SERVERS[args.server]], env, log)
+        processes.append(server)
+        base_url = f"http://127.0.0.1:{app_port}"
+        wait_ready(f"{base_url}/", server)
+
+        results = []
+        run_id = int(time.time())
+        for endpoint in args.endpoints.split(","):
+            for concurrency in (int(level) for level in args.concurrency.split(",")):
+                latencies, errors, seconds = asyncio.run(drive(base_url, endpoint, concurrency, args.requests, f"{run_id}-{concurrency}"))
+                results.append(summarize(endpoint, concurrency, latencies, errors, seconds, server.pid))
+                print(f"{endpoint} x{concurrency}: {results[-1]['throughput_rps']} req/s, p99 {results[-1]['p99_ms']} ms", file=sys.stderr)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"server": args.server, "results": results}, f, indent=2)
+
+    failures = []
+    for r in results:
+        if args.max_p99_ms is not None and r["p99_ms"] > args.max_p99_ms:
+            failures.append(f"{r['endpoint']} x{r['concurrency']}: p99 {r['p99_ms']} ms > {args.max_p99_ms} ms")
+        if args.max_error_rate is not None and r["error_rate"] > args.max_error_rate:
+            failures.append(f"{r['endpoint']} x{r['concurrency']}: error rate {r['error_rate']} > {args.max_error_rate}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
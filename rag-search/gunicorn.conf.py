@@ -0,0 +1,96 @@
+"""
+Production server settings; gunicorn reads this file from the working directory.
+
+    gunicorn                              # Flask app (app:app) on threaded workers
+    SERVER_MODE=asgi gunicorn             # asgi:application on uvicorn workers
+
+The master imports the app once (preload_app) and forks the workers from
+it, so module-level setup - prompts, schemas, caches, the vector index - is
+done once and shared copy-on-write. Each worker then replaces what can't
+cross a fork (pooled connections, the SQLite handle) in rag_search.lifecycle.after_fork.
+
+Reload gracefully with `kill -HUP <master pid>`: new workers start and old
+ones finish their in-flight requests (up to graceful_timeout). Because the
+app is preloaded, HUP keeps the code the master imported; to deploy new code
+send USR2 (start a new master), then QUIT to the old one.
+
+Request and span metrics are shared between the workers through files in
+PROMETHEUS_MULTIPROC_DIR (a new temporary directory unless set), so /metrics
+reports the totals of all workers; cache and upstream gauges are per worker.
+
+Every setting can be overridden from the environment as noted, or on the
+gunicorn command line.
+"""
+import glob
+import logging
+import multiprocessing
+import os
+import tempfile
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+cores = multiprocessing.cpu_count()
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', 9000)}")
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "asgi:application"
+    # uvicorn.workers is deprecated; the worker now lives in the uvicorn-worker package (0.4+ for uvicorn 0.36+)
+    worker_class = "uvicorn_worker.UvicornWorker"
+    # One event loop per core holds many concurrent requests on its own
+    workers = int(os.getenv("WEB_CONCURRENCY", cores))
+else:
+    wsgi_app = "app:app"
+    worker_class = "gthread"
+    # Requests spend most of their time waiting on ASI, Gemini and SerpAPI
+    workers = int(os.getenv("WEB_CONCURRENCY", cores * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+preload_app = True
+os.environ.setdefault("PRELOAD_APP", "1")
+# Must be set before the app (and prometheus_client) is imported
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="rag-search-metrics-")
+
+# A /clean can wait out the upstream retry window (UPSTREAM_MAX_DELAY) on top of the call itself
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 90))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then so slow leaks can't accumulate; jitter avoids restarting them all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 500))
+
+# Request line and header limits; body size is limited by MAX_CONTENT_LENGTH in the app
+limit_request_line = 8190
+limit_request_fields = 100
+limit_request_field_size = 8190
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def on_starting(server):
+    # Counts left in the directory by an earlier run would be added to this one's
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    from rag_search.lifecycle import after_fork, serve
+    after_fork()
+    serve()
+
+
+def when_ready(server):
+    if server.cfg.workers > 1 and not os.getenv("VECTOR_STORE_DIR"):
+        logging.getLogger("gunicorn.error").warning(
+            "The in-memory vector index is per worker; set VECTOR_STORE_DIR so /clean "
+            "and /search share stored contexts across the %d workers", server.cfg.workers
+        )
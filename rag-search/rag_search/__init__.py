@@ -0,0 +1,42 @@
+"""
+rag-search: contextual product search over a user's browsing history.
+
+create_app builds the Flask application. Importing the package is cheap;
+settings, caches, schemas and routes are loaded by create_app, and the
+model SDKs (google.genai, serpapi) only when they are first called.
+"""
+
+
+def create_app():
+    """
+    Build the Flask app: logging, JSON provider, CORS, body limit and routes.
+
+    Unless PRELOAD_APP is set, the upstream clients are warmed (with
+    WARM_CLIENTS); a preloading server does that in each worker through
+    lifecycle.after_fork. No job workers are started: the serving process
+    starts them with lifecycle.serve, or `flask jobs` runs them on their own.
+
+    Returns:
+        Flask: the application
+    """
+    import logging
+
+    from flask import Flask
+    from flask_cors import CORS
+
+    from . import lifecycle
+    from .response_encoding import OrjsonProvider
+    from .routes import bp
+    from .settings import LOG_FORMAT, LOG_LEVEL, MAX_CONTENT_LENGTH
+
+    # A no-op if the embedding process configured logging already
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    CORS(app)
+    # Bodies above this are rejected with 413 before they are read
+    app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
+    app.register_blueprint(bp)
+    app.cli.add_command(lifecycle.jobs_command)
+    lifecycle.start()
+    return app
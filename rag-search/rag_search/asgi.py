@@ -0,0 +1,187 @@
+"""
+ASGI entry point for rag-search.
+
+POST /clean is served by the asyncio pipeline in cleaning.clean_record_async, so
+one process can hold hundreds of in-flight cleaning requests while they wait
+on ASI and Gemini. Every other route falls through to the Flask app.
+
+    uvicorn asgi:application --port 9000
+"""
+import io
+import sys
+import time
+
+import orjson
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from . import clients, create_app, lifecycle
+from .cleaning import coalesced_clean_record_async, format_clean_payload, retry_after_headers
+from .observability import observe_request
+from .response_encoding import dumps, negotiate
+from .settings import MAX_CONTENT_LENGTH
+
+
+def _wsgi_environ(scope, body):
+    """WSGI environ for an ASGI http scope and its request body"""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = value.decode("latin-1")
+        environ[name] = environ[name] + "," + value if name in environ else value
+    return environ
+
+
+class ThreadPoolWsgiToAsgi:
+    """
+    Serve a WSGI app under ASGI, each request on a thread of the loop's pool.
+
+    asgiref's WsgiToAsgi runs WSGI apps thread-sensitively, i.e. one request
+    at a time on a single shared thread; Flask is thread-safe, so requests
+    here run concurrently. Response chunks are sent as the app yields them,
+    so a streamed /search isn't buffered.
+    """
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+        try:
+            body = await _read_body(receive)
+        except BodyTooLarge:
+            await _send_json(send, {
+                "error": "Request body too large",
+                "details": f"Limit is {MAX_CONTENT_LENGTH} bytes",
+                "status": "error"
+            }, 413)
+            return
+        await sync_to_async(self._run, thread_sensitive=False)(_wsgi_environ(scope, body), async_to_sync(send))
+
+    def _run(self, environ, send):
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            start.update(status=int(status.split(" ", 1)[0]), headers=[
+                (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+            ])
+
+        def send_body(chunk, more_body):
+            # WSGI headers go out with the first non-empty chunk, or at the end
+            if not start.get("sent"):
+                send({"type": "http.response.start", "status": start["status"], "headers": start["headers"]})
+                start["sent"] = True
+            send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            for chunk in response:
+                if chunk:
+                    send_body(chunk, True)
+            send_body(b"", False)
+        finally:
+            close = getattr(response, "close", None)
+            if close:
+                close()
+
+
+app = create_app()
+flask_application = ThreadPoolWsgiToAsgi(app)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def _read_body(receive, limit=MAX_CONTENT_LENGTH):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > limit:
+            raise BodyTooLarge()
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_json(send, payload, status, extra_headers=None):
+    body = dumps(payload)
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("ascii")),
+        (b"access-control-allow-origin", b"*"),
+    ]
+    for name, value in (extra_headers or {}).items():
+        headers.append((name.lower().encode("ascii"), value.encode("latin-1")))
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": headers,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def clean(scope, receive, send):
+    start = time.perf_counter()
+    try:
+        input_data = orjson.loads(await _read_body(receive) or b"null")
+    except BodyTooLarge:
+        await _send_json(send, {
+            "error": "Request body too large",
+            "details": f"Limit is {MAX_CONTENT_LENGTH} bytes",
+            "status": "error"
+        }, 413)
+        observe_request("/clean", "POST", 413, time.perf_counter() - start)
+        return
+    except ValueError:
+        input_data = None
+    payload, status = await coalesced_clean_record_async(input_data)
+    fmt = negotiate(dict(scope["headers"]).get(b"accept", b"").decode("latin-1"))
+    await _send_json(send, format_clean_payload(payload, fmt), status, retry_after_headers(payload))
+    observe_request("/clean", "POST", status, time.perf_counter() - start)
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            lifecycle.serve()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await clients.aclose()
+            clients.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/clean" and scope["method"] == "POST":
+        await clean(scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
@@ -0,0 +1,203 @@
+"""
+Calls to the chat models: ASI for cleaning and search, Gemini as the cleaning fallback.
+"""
+import json
+
+import httpx
+import orjson
+import requests
+
+from .clients import get_async_http_client, get_genai_client, get_http_session
+from .observability import span, timed
+from .rate_limit import RateLimitedError
+from .streaming import iter_sse_data
+from .settings import ASI_CHAT_URL, ASI_KEY, logger, payload_logger
+from .services import asi_upstream
+from .prompts import clean_output
+
+def get_google_embeddings(data):
+    """Clean and summarize the data using Gemini"""
+    client = get_genai_client()
+    prompt = """
+    Analyze this JSON data and do the following:
+    1. Create a cleaned version with sensitive/redundant data removed
+       - Keep the same structure (url, metadata, timestamp, getGeolocation)
+       - Remove query parameters and tracking IDs from URLs
+       - Keep only essential product information
+       
+    2. Write a brief but detailed summary describing what this data represents
+       - Include product type, category, and key features, or video type for youtube
+       - This can have data from any category so give accordingly
+       - Inference from the website url in very short
+       - Make it descriptive for meaningful embeddings
+    
+    Format your response strictly as valid JSON like this:
+    {
+        "cleaned": {
+            "url": "simplified-url",
+            "metadata": "cleaned-metadata",
+            "timestamp": null,
+            "getGeolocation": null
+        },
+        "context": "your detailed summary here"
+    }
+
+    Input Data: """ + str(data)
+
+    try:
+        response = client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt,
+        )
+
+        result = clean_output.parse(response.text)
+        return result["cleaned"], result["context"]
+    except Exception as e:
+        logger.error("Error in get_google_embeddings: %s", e)
+        return None, str(e)
+
+def _chat_request(message, system_prompt, model_name, response_format):
+    """Validate chat arguments and build the (headers, body) for the ASI request"""
+    if not message or not isinstance(message, str):
+        raise ValueError("Message must be a non-empty string")
+    if not system_prompt or not isinstance(system_prompt, str):
+        raise ValueError("System prompt must be a non-empty string")
+    if not model_name or not isinstance(model_name, str):
+        raise ValueError("Model name must be a non-empty string")
+    if not ASI_KEY:
+        raise ValueError("ASI_KEY environment variable is not set")
+
+    headers = {
+        "Authorization": f"Bearer {ASI_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    body = {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": message}
+        ],
+        "response_format": response_format
+    }
+    return headers, body
+
+def _chat_content(response_data):
+    """Validate the completion structure and return the message content"""
+    if "choices" not in response_data or not response_data["choices"]:
+        raise KeyError("No choices in response")
+    if "message" not in response_data["choices"][0]:
+        raise KeyError("No message in first choice")
+    if "content" not in response_data["choices"][0]["message"]:
+        raise KeyError("No content in message")
+
+    payload_logger.debug("Chat response: %s", response_data)
+    return response_data["choices"][0]["message"]["content"]
+
+@timed("chat")
+def chat(message: str, system_prompt: str, model_name: str, response_format: dict = { "type":"json_schema","json_schema":{"message":""}}) -> str:
+
+    headers, body = _chat_request(message, system_prompt, model_name, response_format)
+
+    def post():
+        response = get_http_session().post(ASI_CHAT_URL, headers=headers, json=body, timeout=30)  # Add timeout
+        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
+        return response
+
+    try:
+        response = asi_upstream.call(post, headers=lambda r: r.headers)
+        return _chat_content(orjson.loads(response.content))
+
+    except RateLimitedError:
+        raise
+    except requests.exceptions.Timeout:
+        raise requests.exceptions.RequestException("Request timed out after 30 seconds")
+    except requests.exceptions.RequestException as e:
+        raise requests.exceptions.RequestException(f"API request failed: {str(e)}")
+    except json.JSONDecodeError as e:
+        raise json.JSONDecodeError(f"Invalid JSON response from API: {str(e)}", e.doc, e.pos)
+    except (KeyError, IndexError) as e:
+        raise KeyError(f"Unexpected response structure: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Unexpected error in chat function: {str(e)}")
+
+@timed("chat")
+async def chat_async(message: str, system_prompt: str, model_name: str, response_format: dict = { "type":"json_schema","json_schema":{"message":""}}) -> str:
+    """Same contract as chat, awaiting the ASI call instead of blocking a thread"""
+
+    headers, body = _chat_request(message, system_prompt, model_name, response_format)
+
+    async def post():
+        response = await get_async_http_client().post(ASI_CHAT_URL, headers=headers, json=body, timeout=30)
+        response.raise_for_status()
+        return response
+
+    try:
+        response = await asi_upstream.call_async(post, headers=lambda r: r.headers)
+        return _chat_content(orjson.loads(response.content))
+
+    except RateLimitedError:
+        raise
+    except httpx.TimeoutException:
+        raise requests.exceptions.RequestException("Request timed out after 30 seconds")
+    except httpx.HTTPError as e:
+        raise requests.exceptions.RequestException(f"API request failed: {str(e)}")
+    except json.JSONDecodeError as e:
+        raise json.JSONDecodeError(f"Invalid JSON response from API: {str(e)}", e.doc, e.pos)
+    except (KeyError, IndexError) as e:
+        raise KeyError(f"Unexpected response structure: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Unexpected error in chat_async function: {str(e)}")
+
+def chat_stream(message: str, system_prompt: str, model_name: str, response_format: dict = { "type":"json_schema","json_schema":{"message":""}}):
+    """Like chat, but yields the message content piece by piece as the model produces it"""
+
+    headers, body = _chat_request(message, system_prompt, model_name, response_format)
+    body["stream"] = True
+
+    def post():
+        response = get_http_session().post(ASI_CHAT_URL, headers=headers, json=body, timeout=30, stream=True)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            response.close()
+            raise
+        return response
+
+    with span("chat_stream"):
+        try:
+            # Pacing and retries cover opening the stream; a stream that fails midway is not replayed
+            with asi_upstream.call(post, headers=lambda r: r.headers) as response:
+                for data in iter_sse_data(response.iter_lines(decode_unicode=True)):
+                    if data == "[DONE]":
+                        return
+                    choices = orjson.loads(data).get("choices") or []
+                    piece = choices[0].get("delta", {}).get("content") if choices else None
+                    if piece:
+                        yield piece
+
+        except RateLimitedError:
+            raise
+        except requests.exceptions.Timeout:
+            raise requests.exceptions.RequestException("Request timed out after 30 seconds")
+        except requests.exceptions.RequestException as e:
+            raise requests.exceptions.RequestException(f"API request failed: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f"Invalid JSON chunk from API: {str(e)}", e.doc, e.pos)
+
+def hello():
+    system_prompt="you are an helphul assistant"
+    message="hello"
+    headers = {
+        "Authorization": f"Bearer {ASI_KEY}",
+        "Content-Type": "application/json"
+    }
+    body = {
+        "model": 'asi1-mini',
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": message}
+        ]
+    }
+    response = get_http_session().post(ASI_CHAT_URL, headers=headers, json=body, timeout=30)
+    return response.json()
@@ -0,0 +1,342 @@
+"""
+The /clean pipeline: validation, rule-based precleaning, the model call and indexing.
+"""
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .observability import timed
+from .precleaner import preclean_record
+from .rate_limit import RateLimitedError
+from .request_cache import content_key
+from .response_encoding import embedding_fields
+from .structured_output import ResponseDecodeError
+from .settings import (CLEAN_BATCH_CONCURRENCY, CLEAN_BATCH_PACK, PRECLEAN_ENABLED, PRECLEAN_METADATA_CHARS,
+                       logger, payload_logger)
+from .services import context_cache, request_coalescer, user_profiles, vector_index
+from .prompts import (BATCH_INSTRUCTIONS, CLEAN_SYSTEM_PROMPT, SUMMARY_SYSTEM_PROMPT, batch_item_outputs,
+                      batch_output, batch_response_format, batch_summary_response_format, clean_output,
+                      response_format, summary_output, summary_response_format)
+from .chat import chat, chat_async
+from .embeddings import make_embeddings, make_embeddings_async, make_embeddings_many
+
+def validate_clean_input(input_data):
+    """Return an (error payload, status) pair for bad /clean input, or None"""
+    if not input_data or not isinstance(input_data, dict):
+        return {
+            "error": "No input data provided",
+            "status": "error"
+        }, 400
+
+    required_fields = ["url", "metadata"]
+    missing_fields = [field for field in required_fields if field not in input_data]
+    if missing_fields:
+        return {
+            "error": f"Missing required fields: {', '.join(missing_fields)}",
+            "status": "error"
+        }, 400
+    return None
+
+def _clean_message(input_data):
+    record = {key: value for key, value in input_data.items() if key != "user_id"}
+    message = "format this data: " + json.dumps(record)
+    payload_logger.debug("Prompt: %s", message)
+    return message
+
+def _summary_message(cleaned):
+    message = "summarize this data: " + json.dumps({"url": cleaned["url"], "metadata": cleaned["metadata"]})
+    payload_logger.debug("Prompt: %s", message)
+    return message
+
+@timed("parse_clean_response")
+def _parse_clean_response(response, schema=clean_output):
+    """Decode the model output; returns (cleaned_data, None) or (None, (error payload, status))"""
+    try:
+        cleaned_data = schema.parse(response)
+        payload_logger.debug("Cleaned data: %s", cleaned_data)
+    except ResponseDecodeError as e:
+        return None, (decode_failure(e), 500)
+    return cleaned_data, None
+
+def decode_failure(e):
+    """Error payload for model output that couldn't be decoded"""
+    if e.reason == "json":
+        return {
+            "error": "Invalid JSON response from model",
+            "details": f"{str(e)} \n \n Response was: {e.response}",
+            "status": "error"
+        }
+    return {
+        "error": "Invalid response structure from model",
+        "details": str(e),
+        "status": "error"
+    }
+
+def _context_key(cleaned):
+    """
+    context_cache key of a precleaned record: its canonical URL and condensed metadata.
+
+    Returns None for a record without a URL, whose summary can't be shared.
+    """
+    url = cleaned["url"]
+    if not isinstance(url, str) or not url.strip():
+        return None
+    return content_key("context", {"url": url, "metadata": cleaned["metadata"]})
+
+def _cached_context(cleaned):
+    key = _context_key(cleaned)
+    return context_cache.get(key) if key else None
+
+def _cache_context(cleaned, context):
+    key = _context_key(cleaned)
+    if key:
+        context_cache.set(key, context)
+
+def _index_record(user_id, cleaned_data, embedding_vector):
+    """Make a cleaned record retrievable for its user's later searches, and fold it into their profile"""
+    if user_id and embedding_vector:
+        vector_index.add(user_id, embedding_vector, {
+            "context": cleaned_data['context'],
+            "cleaned": cleaned_data['cleaned']
+        })
+        user_profiles.add(user_id, embedding_vector, cleaned_data['context'])
+
+def _clean_success(cleaned_data, embedding_vector):
+    final_response = {
+        "cleaned": cleaned_data['cleaned'],
+        "context": cleaned_data['context'],
+        "embedding": embedding_vector
+    }
+    return {
+        "data": final_response,
+        "status": "success"
+    }, 200
+
+def format_clean_payload(payload, fmt):
+    """
+    A /clean result with its embedding in the format the client asked for.
+
+    Results may be shared between coalesced requests, so a new dict is
+    returned rather than changing payload. Only base64 applies here; raw
+    binary is reserved for the embedding routes.
+    """
+    if fmt.kind != "base64" or not isinstance(payload.get("data"), dict):
+        return payload
+    return {**payload, "data": {**payload["data"], **embedding_fields(payload["data"].get("embedding"), fmt)}}
+
+def _clean_failure(e):
+    if isinstance(e, RateLimitedError):
+        return {
+            "error": "Upstream rate limit exceeded",
+            "details": str(e),
+            "retry_after": e.retry_after,
+            "status": "error"
+        }, 429
+    if isinstance(e, requests.exceptions.RequestException):
+        return {
+            "error": "API request failed",
+            "details": str(e),
+            "status": "error"
+        }, 503
+
+    logger.exception("Unexpected error in /clean endpoint: %s", e)
+    return {
+        "error": "Internal server error",
+        "details": str(e),
+        "status": "error"
+    }, 500
+
+def retry_after_headers(payload):
+    """Retry-After header for a rate-limited failure payload, else no headers"""
+    retry_after = payload.get("retry_after")
+    return {"Retry-After": str(math.ceil(retry_after))} if retry_after else {}
+
+def clean_record(input_data):
+    """Run the /clean pipeline (LLM clean, then embed) for one record; returns (payload, status)"""
+    try:
+        invalid = validate_clean_input(input_data)
+        if invalid:
+            return invalid
+
+        if PRECLEAN_ENABLED:
+            cleaned = preclean_record(input_data, PRECLEAN_METADATA_CHARS)
+            context = _cached_context(cleaned)
+            if context is None:
+                response = chat(_summary_message(cleaned), SUMMARY_SYSTEM_PROMPT, 'asi1-mini', summary_response_format)
+                summary, invalid = _parse_clean_response(response, summary_output)
+                if invalid:
+                    return invalid
+                context = summary["context"]
+                _cache_context(cleaned, context)
+            cleaned_data = {"cleaned": cleaned, "context": context}
+        else:
+            response = chat(_clean_message(input_data), CLEAN_SYSTEM_PROMPT, 'asi1-mini', response_format)
+            cleaned_data, invalid = _parse_clean_response(response)
+            if invalid:
+                return invalid
+
+        embedding_vector = make_embeddings(cleaned_data['context'])
+        _index_record(input_data.get("user_id"), cleaned_data, embedding_vector)
+        return _clean_success(cleaned_data, embedding_vector)
+    except Exception as e:
+        return _clean_failure(e)
+
+def _clean_succeeded(result):
+    return result[1] == 200
+
+def coalesced_clean_record(input_data):
+    """clean_record, shared among identical concurrent request bodies"""
+    return request_coalescer.do(
+        content_key("clean", input_data),
+        lambda: clean_record(input_data),
+        keep=_clean_succeeded
+    )
+
+async def coalesced_clean_record_async(input_data):
+    """clean_record_async, shared among identical concurrent request bodies"""
+    return await request_coalescer.do_async(
+        content_key("clean", input_data),
+        lambda: clean_record_async(input_data),
+        keep=_clean_succeeded
+    )
+
+def _clean_pack(items):
+    """
+    Clean several records with one model call.
+
+    Args:
+        items (list): (index, record, precleaned) triples; precleaned is None when PRECLEAN is off
+
+    Returns:
+        dict: index -> {"cleaned", "context"} for every record the model answered
+    """
+    if PRECLEAN_ENABLED:
+        payload = [{"id": i, "url": pre["url"], "metadata": pre["metadata"]} for i, record, pre in items]
+        message = "summarize each of these records: " + json.dumps(payload)
+        response = chat(message, SUMMARY_SYSTEM_PROMPT + BATCH_INSTRUCTIONS, 'asi1-mini', batch_summary_response_format)
+    else:
+        payload = [{"id": i, **{k: v for k, v in record.items() if k != "user_id"}} for i, record, pre in items]
+        message = "format each of these records: " + json.dumps(payload)
+        response = chat(message, CLEAN_SYSTEM_PROMPT + BATCH_INSTRUCTIONS, 'asi1-mini', batch_response_format)
+
+    parsed, invalid = _parse_clean_response(response, batch_output)
+    if invalid:
+        raise ValueError(invalid[0]["error"])
+
+    item_output = batch_item_outputs[PRECLEAN_ENABLED]
+    precleaned = {i: pre for i, record, pre in items}
+    out = {}
+    for entry in parsed["results"]:
+        try:
+            result = item_output.validate(entry)
+        except ResponseDecodeError as e:
+            logger.debug("Skipping batch result: %s", e)
+            continue
+        i = result["id"]
+        if i not in precleaned or i in out:
+            continue
+        if PRECLEAN_ENABLED:
+            out[i] = {"cleaned": precleaned[i], "context": result["context"]}
+            _cache_context(precleaned[i], result["context"])
+        else:
+            out[i] = {"cleaned": result["cleaned"], "context": result["context"]}
+    return out
+
+def clean_records(records):
+    """
+    Run the /clean pipeline over many records.
+
+    Records that need the model are packed CLEAN_BATCH_PACK to a prompt, at
+    most CLEAN_BATCH_CONCURRENCY prompts run at once, and every context is
+    embedded through one make_embeddings_many call.
+
+    Returns:
+        list: one {"index", "status", "data" | "error"} entry per record, in input order
+    """
+    results = [None] * len(records)
+    cleaned = {}
+    pending = []
+
+    def fail(i, error):
+        results[i] = {"index": i, "status": "error", "error": error}
+        cleaned.pop(i, None)
+
+    for i, record in enumerate(records):
+        invalid = validate_clean_input(record)
+        if invalid:
+            fail(i, invalid[0]["error"])
+            continue
+        if PRECLEAN_ENABLED:
+            pre = preclean_record(record, PRECLEAN_METADATA_CHARS)
+            context = _cached_context(pre)
+            if context is not None:
+                cleaned[i] = {"cleaned": pre, "context": context}
+                continue
+            cleaned[i] = {"cleaned": pre, "context": None}
+        pending.append(i)
+
+    packs = [pending[n:n + CLEAN_BATCH_PACK] for n in range(0, len(pending), CLEAN_BATCH_PACK)]
+    if packs:
+        with ThreadPoolExecutor(max_workers=min(CLEAN_BATCH_CONCURRENCY, len(packs))) as pool:
+            futures = [
+                pool.submit(_clean_pack, [(i, records[i], cleaned.get(i, {}).get("cleaned")) for i in pack])
+                for pack in packs
+            ]
+            for pack, future in zip(packs, futures):
+                try:
+                    answered = future.result()
+                except Exception as e:
+                    logger.warning("Error in clean_records: %s", e)
+                    for i in pack:
+                        fail(i, str(e))
+                    continue
+                for i in pack:
+                    if i in answered:
+                        cleaned[i] = answered[i]
+                    else:
+                        fail(i, "Model returned no result for this record")
+
+    order = sorted(cleaned)
+    embeddings, errors = make_embeddings_many([cleaned[i]["context"] for i in order])
+    for error in errors:
+        fail(order[error["index"]], error["error"])
+    for i, embedding_vector in zip(order, embeddings):
+        if embedding_vector is None:
+            continue
+        _index_record(records[i].get("user_id"), cleaned[i], embedding_vector)
+        results[i] = {"index": i, **_clean_success(cleaned[i], embedding_vector)[0]}
+    return results
+
+async def clean_record_async(input_data):
+    """Async counterpart of clean_record; upstream I/O is awaited rather than blocking a worker"""
+    try:
+        invalid = validate_clean_input(input_data)
+        if invalid:
+            return invalid
+
+        if PRECLEAN_ENABLED:
+            cleaned = preclean_record(input_data, PRECLEAN_METADATA_CHARS)
+            context = _cached_context(cleaned)
+            if context is None:
+                response = await chat_async(_summary_message(cleaned), SUMMARY_SYSTEM_PROMPT, 'asi1-mini', summary_response_format)
+                summary, invalid = _parse_clean_response(response, summary_output)
+                if invalid:
+                    return invalid
+                context = summary["context"]
+                _cache_context(cleaned, context)
+            cleaned_data = {"cleaned": cleaned, "context": context}
+        else:
+            response = await chat_async(_clean_message(input_data), CLEAN_SYSTEM_PROMPT, 'asi1-mini', response_format)
+            cleaned_data, invalid = _parse_clean_response(response)
+            if invalid:
+                return invalid
+
+        embedding_vector = await make_embeddings_async(cleaned_data['context'])
+        # Index and profile writes take locks and may touch disk, so keep them off the event loop
+        await asyncio.to_thread(_index_record, input_data.get("user_id"), cleaned_data, embedding_vector)
+        return _clean_success(cleaned_data, embedding_vector)
+    except Exception as e:
+        return _clean_failure(e)
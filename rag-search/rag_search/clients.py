@@ -0,0 +1,145 @@
+"""
+Process-wide upstream clients.
+
+The Gemini client and the keep-alive HTTP session for the ASI endpoint are
+created once, on first use, and shared by every request thread so that TLS
+connections are reused instead of re-negotiated per call. The async path
+shares one httpx.AsyncClient, owned by the event loop of the ASGI server.
+
+google.genai takes most of a second to import, so it is only imported when
+the Gemini client is first created (by warm_up, or by the first embedding).
+"""
+import atexit
+import logging
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 32))
+ASYNC_HTTP_POOL_SIZE = int(os.getenv('ASYNC_HTTP_POOL_SIZE', 256))
+# Point the Gemini client elsewhere, e.g. at the benchmark's fake upstreams
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL') or None
+
+_lock = threading.Lock()
+_genai_client = None
+_http_session = None
+_async_http_client = None
+
+
+def get_genai_client():
+    """Return the shared genai.Client, creating it on first use"""
+    global _genai_client
+    if _genai_client is None:
+        with _lock:
+            if _genai_client is None:
+                from google import genai
+
+                limits = httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE
+                )
+                async_limits = httpx.Limits(
+                    max_connections=ASYNC_HTTP_POOL_SIZE,
+                    max_keepalive_connections=ASYNC_HTTP_POOL_SIZE
+                )
+                _genai_client = genai.Client(
+                    api_key=os.getenv('GOOGLE_API_KEY'),
+                    http_options=genai.types.HttpOptions(
+                        base_url=GEMINI_BASE_URL,
+                        client_args={"limits": limits},
+                        async_client_args={"limits": async_limits}
+                    )
+                )
+    return _genai_client
+
+
+def get_http_session():
+    """Return the shared keep-alive requests.Session with a pool sized to HTTP_POOL_SIZE"""
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def get_async_http_client():
+    """Return the shared httpx.AsyncClient used by the async request path"""
+    global _async_http_client
+    if _async_http_client is None:
+        with _lock:
+            if _async_http_client is None:
+                limits = httpx.Limits(
+                    max_connections=ASYNC_HTTP_POOL_SIZE,
+                    max_keepalive_connections=ASYNC_HTTP_POOL_SIZE
+                )
+                _async_http_client = httpx.AsyncClient(limits=limits)
+    return _async_http_client
+
+
+def warm_up(urls=()):
+    """
+    Create the clients and open a pooled connection to each URL ahead of traffic.
+
+    Args:
+        urls (iterable): Endpoints to pre-connect to; any HTTP status counts as warm
+    """
+    try:
+        get_genai_client()
+    except ValueError as e:
+        logger.warning("Gemini client not created: %s", e)
+    session = get_http_session()
+    for url in urls:
+        try:
+            session.head(url, timeout=5)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Warm-up of %s failed: %s", url, e)
+
+
+def close():
+    """Release pooled connections; the clients are recreated if used again"""
+    global _genai_client, _http_session
+    with _lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+        if _genai_client is not None:
+            _genai_client.close()
+            _genai_client = None
+
+
+def reset():
+    """
+    Forget the clients without closing them.
+
+    For forked worker processes: the parent's pooled sockets must not be
+    used, or shut down, from the child. New clients are created on first use.
+    """
+    global _lock, _genai_client, _http_session, _async_http_client
+    _lock = threading.Lock()
+    _genai_client = None
+    _http_session = None
+    _async_http_client = None
+
+
+async def aclose():
+    """Release the async clients; call from the event loop that used them"""
+    global _async_http_client
+    client = _async_http_client
+    _async_http_client = None
+    if client is not None:
+        await client.aclose()
+    if _genai_client is not None:
+        await _genai_client.aio.aclose()
+
+
+atexit.register(close)
@@ -0,0 +1,170 @@
+"""
+Content-addressed cache for embedding vectors.
+
+Entries are keyed by a hash of (model name, normalized text) and live in two
+tiers: an in-memory LRU with a TTL, and an optional SQLite file that survives
+restarts. Disk hits are promoted back into memory.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+from cachetools import TTLCache
+
+
+def normalize_text(text):
+    """Normalize unicode and collapse whitespace so trivially different strings share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model, text):
+    """Hash of (model name, normalized text)"""
+    payload = f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    Args:
+        maxsize (int): Maximum number of vectors held in memory
+        ttl (float): Seconds a vector stays in the memory tier
+        db_path (str): Optional SQLite file for the persistent tier
+        disk_ttl (float): Seconds a vector stays valid on disk, 0 keeps it forever
+    """
+
+    def __init__(self, maxsize=10000, ttl=86400, db_path=None, disk_ttl=0):
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._disk_ttl = disk_ttl
+        self._db_path = db_path
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._db = self._connect()
+
+    def _connect(self):
+        db = sqlite3.connect(self._db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def reopen(self):
+        """
+        Open a fresh SQLite connection, e.g. in a forked worker.
+
+        A connection must not be used on both sides of a fork, so the
+        inherited one is dropped without being closed.
+        """
+        with self._lock:
+            if self._db_path:
+                self._db = self._connect()
+
+    def ping(self):
+        """True if the persistent tier (when configured) answers a query"""
+        if self._db is None:
+            return True
+        try:
+            with self._lock:
+                self._db.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _disk_get(self, key):
+        row = self._db.execute(
+            "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._disk_ttl and time.time() - row[1] > self._disk_ttl:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def get_many(self, model, texts):
+        """
+        Look up several texts at once.
+
+        Returns:
+            dict: index in texts -> cached vector, for every hit
+        """
+        found = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = cache_key(model, text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self.memory_hits += 1
+                    found[i] = vector
+                    continue
+                if self._db is not None:
+                    vector = self._disk_get(key)
+                    if vector is not None:
+                        self.disk_hits += 1
+                        self._memory[key] = vector
+                        found[i] = vector
+                        continue
+                self.misses += 1
+        return found
+
+    def set_many(self, model, items):
+        """Store (text, vector) pairs in both tiers"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in items:
+                key = cache_key(model, text)
+                vector = list(vector)
+                self._memory[key] = vector
+                if self._db is not None:
+                    rows.append((key, model, array("f", vector).tobytes(), now))
+            if rows:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+
+    def get(self, model, text):
+        return self.get_many(model, [text]).get(0)
+
+    def set(self, model, text, vector):
+        self.set_many(model, [(text, vector)])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_size": self._memory.currsize,
+                "memory_maxsize": self._memory.maxsize,
+                "persistent": self._db is not None
+            }
+            if self._db is not None:
+                stats["disk_size"] = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
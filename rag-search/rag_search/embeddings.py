@@ -0,0 +1,153 @@
+"""
+Gemini embeddings, cached per text and batched into batchEmbedContents calls.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .clients import get_genai_client
+from .embedding_cache import cache_key
+from .observability import timed
+from .settings import EMBEDDING_MODEL, EMBED_BATCH_LIMIT, EMBED_MAX_WORKERS, logger
+from .services import embedding_cache, gemini_upstream
+
+def _genai_headers(result):
+    http_response = getattr(result, "sdk_http_response", None)
+    return getattr(http_response, "headers", None)
+
+def _embed_chunk(texts):
+    """Embed up to EMBED_BATCH_LIMIT texts with one embed_content call"""
+    client = get_genai_client()
+    result = gemini_upstream.call(
+        lambda: client.models.embed_content(model=EMBEDDING_MODEL, contents=texts),
+        headers=_genai_headers
+    )
+    return _chunk_vectors(texts, result)
+
+async def _embed_chunk_async(texts):
+    """Async counterpart of _embed_chunk using the client's aio surface"""
+    client = get_genai_client()
+    result = await gemini_upstream.call_async(
+        lambda: client.aio.models.embed_content(model=EMBEDDING_MODEL, contents=texts),
+        headers=_genai_headers
+    )
+    return _chunk_vectors(texts, result)
+
+def _chunk_vectors(texts, result):
+    embeddings = result.embeddings or []
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+    return [e.values for e in embeddings]
+
+def _plan_embeddings(texts):
+    """
+    Validate texts and fill in cached vectors.
+
+    Returns:
+        tuple: (embeddings, errors, misses)
+            - misses: dict cache key -> indices in texts still to be embedded;
+              identical texts in one request share a single provider slot
+    """
+    embeddings = [None] * len(texts)
+    errors = []
+
+    pending = []
+    for i, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip():
+            errors.append({"index": i, "error": "Text must be a non-empty string"})
+        else:
+            pending.append(i)
+
+    cached = embedding_cache.get_many(EMBEDDING_MODEL, [texts[i] for i in pending])
+    misses = {}
+    for n, i in enumerate(pending):
+        if n in cached:
+            embeddings[i] = cached[n]
+        else:
+            misses.setdefault(cache_key(EMBEDDING_MODEL, texts[i]), []).append(i)
+    return embeddings, errors, misses
+
+def _chunk_keys(misses):
+    keys = list(misses)
+    return [keys[i:i + EMBED_BATCH_LIMIT] for i in range(0, len(keys), EMBED_BATCH_LIMIT)]
+
+def _apply_chunk(texts, embeddings, errors, misses, chunk, vectors):
+    """Record one chunk's outcome; vectors is the exception if the call failed"""
+    if isinstance(vectors, Exception):
+        logger.warning("Error in make_embeddings_many: %s", vectors)
+        errors.extend({"index": i, "error": str(vectors)} for key in chunk for i in misses[key])
+        return
+    embedding_cache.set_many(EMBEDDING_MODEL, [(texts[misses[key][0]], vector) for key, vector in zip(chunk, vectors)])
+    for key, vector in zip(chunk, vectors):
+        for i in misses[key]:
+            embeddings[i] = vector
+
+@timed("make_embeddings_many")
+def make_embeddings_many(texts):
+    """
+    Generate embeddings for many texts with as few provider round-trips as possible.
+
+    Cached vectors are served from embedding_cache; the remaining distinct
+    texts are packed into chunks of EMBED_BATCH_LIMIT, one embed_content call
+    per chunk, and the chunks are sent concurrently.
+
+    Args:
+        texts (list): List of strings to embed
+
+    Returns:
+        tuple: (embeddings, errors)
+            - embeddings: list aligned with texts, each a list of floats or None if that item failed
+            - errors: list of {"index": i, "error": message} for every failed item, in input order
+    """
+    embeddings, errors, misses = _plan_embeddings(texts)
+
+    chunks = _chunk_keys(misses)
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(EMBED_MAX_WORKERS, len(chunks))) as pool:
+            futures = [pool.submit(_embed_chunk, [texts[misses[key][0]] for key in chunk]) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    vectors = e
+                _apply_chunk(texts, embeddings, errors, misses, chunk, vectors)
+
+    errors.sort(key=lambda e: e["index"])
+    return embeddings, errors
+
+@timed("make_embeddings_many")
+async def make_embeddings_many_async(texts):
+    """Same contract as make_embeddings_many, with chunks awaited concurrently"""
+    embeddings, errors, misses = _plan_embeddings(texts)
+
+    chunks = _chunk_keys(misses)
+    if chunks:
+        limit = asyncio.Semaphore(EMBED_MAX_WORKERS)
+
+        async def run(chunk):
+            async with limit:
+                return await _embed_chunk_async([texts[misses[key][0]] for key in chunk])
+
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks), return_exceptions=True)
+        for chunk, vectors in zip(chunks, results):
+            _apply_chunk(texts, embeddings, errors, misses, chunk, vectors)
+
+    errors.sort(key=lambda e: e["index"])
+    return embeddings, errors
+
+@timed("make_embeddings")
+def make_embeddings(text):
+    """Generate embeddings for a single text string"""
+    embeddings, errors = make_embeddings_many([text])
+    if errors:
+        logger.warning("Error in make_embeddings: %s", errors[0]['error'])
+        return []
+    return embeddings[0]
+
+@timed("make_embeddings")
+async def make_embeddings_async(text):
+    """Generate embeddings for a single text string without blocking the event loop"""
+    embeddings, errors = await make_embeddings_many_async([text])
+    if errors:
+        logger.warning("Error in make_embeddings_async: %s", errors[0]['error'])
+        return []
+    return embeddings[0]
@@ -0,0 +1,329 @@
+"""
+Durable background queue for /clean ingestion.
+
+Jobs are rows in a SQLite file (WAL mode), so they survive restarts and can
+be shared by every worker process of a server. JobWorkers threads claim
+queued jobs in batches under a lease: a job whose worker dies is picked up
+again once its lease runs out. Failed jobs are retried with backoff up to
+max_attempts. Results stay in the table for polling and can also be POSTed
+to a per-job webhook.
+
+    queued -> running -> done
+                      -> queued (retry) -> ... -> failed
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "running", "done", "failed")
+LEASE_EXPIRED = "Lease expired on the last attempt"
+
+
+class JobQueue:
+    """
+    Args:
+        db_path (str): SQLite file holding the jobs
+        max_attempts (int): Tries per job before it is marked failed
+        retention (float): Seconds finished jobs are kept for polling
+    """
+
+    def __init__(self, db_path, max_attempts=3, retention=86400):
+        self._db_path = db_path
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._local = threading.local()
+        self.available = threading.Event()
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " webhook TEXT,"
+                " webhook_status TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " available_at REAL NOT NULL,"
+                " lease_until REAL,"
+                " lease_id TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            if "lease_id" not in {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}:
+                db.execute("ALTER TABLE jobs ADD COLUMN lease_id TEXT")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+
+    def _db(self):
+        """This thread's connection, in autocommit mode; transactions are opened explicitly"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self._db_path, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def reopen(self):
+        """Forget inherited connections, e.g. in a forked worker"""
+        self._local = threading.local()
+
+    def enqueue(self, payloads, webhook=None):
+        """
+        Add one job per payload.
+
+        Returns:
+            list: job ids, in payload order
+        """
+        now = time.time()
+        rows = [(uuid.uuid4().hex, json.dumps(payload), webhook, now, now, now) for payload in payloads]
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO jobs (id, status, payload, webhook, available_at, created_at, updated_at)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                rows
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.available.set()
+        return [row[0] for row in rows]
+
+    def fail_expired(self):
+        """
+        Mark failed the jobs whose lease expired on their last attempt (their worker
+        died or hung each time), so claim never runs a job more than max_attempts times.
+
+        Returns:
+            list: (id, webhook) of the jobs marked failed
+        """
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, webhook FROM jobs WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            ).fetchall()
+            db.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, lease_id = NULL, updated_at = ? WHERE id = ?",
+                [(LEASE_EXPIRED, now, row["id"]) for row in rows]
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return [(row["id"], row["webhook"]) for row in rows]
+
+    def claim(self, limit, lease=300):
+        """
+        Take up to limit ready jobs, oldest first, and mark them running until now + lease.
+
+        Jobs still "running" after their lease expired are taken over if they
+        have attempts left; see fail_expired for the others.
+
+        Returns:
+            list: (id, payload, webhook, lease) tuples; lease identifies this claim
+            and must be passed to complete or fail
+        """
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, payload, webhook FROM jobs"
+                " WHERE (status = 'queued' AND available_at <= ?)"
+                " OR (status = 'running' AND lease_until < ? AND attempts < ?)"
+                " ORDER BY created_at LIMIT ?",
+                (now, now, self.max_attempts, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, lease_id = ?, updated_at = ?"
+                " WHERE id = ?",
+                [(now + lease, lease_id, now, row["id"]) for row in rows]
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return [(row["id"], json.loads(row["payload"]), row["webhook"], lease_id) for row in rows]
+
+    def complete(self, job_id, result, lease_id):
+        """
+        Record a job's result, if the claim `lease_id` still holds it.
+
+        Returns:
+            bool: False if the lease was lost (expired and taken over) and nothing was written
+        """
+        now = time.time()
+        return self._db().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL, lease_id = NULL, updated_at = ?"
+            " WHERE id = ? AND status = 'running' AND lease_id = ?",
+            (json.dumps(result), now, job_id, lease_id)
+        ).rowcount == 1
+
+    def fail(self, job_id, error, lease_id, backoff=5):
+        """
+        Record a failed attempt, if the claim `lease_id` still holds the job; it is
+        queued again after backoff * 2**(attempts - 1) seconds, or marked failed
+        once it has had max_attempts.
+
+        Returns:
+            str: The job's new status, "queued" or "failed"; None if the lease
+            was lost and nothing was written
+        """
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND status = 'running' AND lease_id = ?", (job_id, lease_id)
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            attempts = row["attempts"]
+            status = "queued" if attempts < self.max_attempts else "failed"
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_until = NULL, lease_id = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (status, str(error), now + backoff * 2 ** (attempts - 1), now, job_id)
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return status
+
+    def set_webhook_status(self, job_id, status):
+        self._db().execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (status, job_id))
+
+    def get(self, job_id):
+        """A job as a dict (result decoded), or None"""
+        row = self._db().execute(
+            "SELECT id, status, result, error, attempts, webhook_status, created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def purge(self):
+        """Delete finished jobs older than retention; returns how many went"""
+        cutoff = time.time() - self.retention
+        return self._db().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+        ).rowcount
+
+    def ping(self):
+        try:
+            self._db().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def stats(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = self._db().execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {**counts, "oldest_queued_seconds": time.time() - oldest if oldest else 0.0}
+
+
+class JobWorkers:
+    """
+    Threads that drain a JobQueue.
+
+    Args:
+        queue (JobQueue): Where jobs come from
+        process (callable): list of payloads -> list of (ok, result or error message), one per payload
+        notify (callable): (webhook url, body) -> status string; called for jobs that have a webhook
+        workers (int): Number of threads
+        batch_size (int): Jobs claimed and processed together
+        poll_interval (float): Seconds an idle worker waits before looking again
+        lease (float): Seconds a claimed batch may take before others may take it over
+    """
+
+    def __init__(self, queue, process, notify=None, workers=2, batch_size=32, poll_interval=1.0, lease=300):
+        self.queue = queue
+        self.process = process
+        self.notify = notify
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._threads = []
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+
+    def start(self):
+        """Start the threads (again, in a forked process where they didn't survive)"""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self.queue.available.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception:
+                logger.exception("Job worker iteration failed")
+                worked = False
+            if not worked:
+                self.queue.available.wait(self.poll_interval)
+                self.queue.available.clear()
+
+    def run_once(self):
+        """Claim and process one batch; returns False if there was nothing to do"""
+        if time.time() - self._last_purge > 3600:
+            self._last_purge = time.time()
+            self.queue.purge()
+
+        for job_id, webhook in self.queue.fail_expired():
+            logger.warning("Job %s failed: %s", job_id, LEASE_EXPIRED)
+            if webhook and self.notify:
+                body = {"job_id": job_id, "status": "failed", "error": LEASE_EXPIRED}
+                self.queue.set_webhook_status(job_id, self.notify(webhook, body))
+
+        jobs = self.queue.claim(self.batch_size, self.lease)
+        if not jobs:
+            return False
+        try:
+            outcomes = self.process([payload for _, payload, _, _ in jobs])
+        except Exception as e:
+            logger.warning("Job batch of %d failed: %r", len(jobs), e)
+            outcomes = [(False, str(e))] * len(jobs)
+
+        for (job_id, _, webhook, lease_id), (ok, value) in zip(jobs, outcomes):
+            if ok:
+                recorded = self.queue.complete(job_id, value, lease_id)
+            else:
+                recorded = self.queue.fail(job_id, value, lease_id) == "failed"
+            if not recorded:
+                # Retried later, or the lease expired and another worker owns the job now
+                continue
+            if webhook and self.notify:
+                body = {"job_id": job_id, "status": "done" if ok else "failed"}
+                body["data" if ok else "error"] = value
+                self.queue.set_webhook_status(job_id, self.notify(webhook, body))
+        return True
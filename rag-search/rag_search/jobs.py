@@ -0,0 +1,81 @@
+"""
+Background /clean jobs: JobWorkers threads drain the job queue and notify webhooks.
+"""
+import ipaddress
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from .clients import get_http_session
+from .job_queue import JobWorkers
+from .settings import JOBS_WEBHOOK_PREFIXES, JOBS_WORKERS, logger
+from .services import get_job_queue
+from .cleaning import clean_records
+
+def process_clean_jobs(records):
+    """JobWorkers step: clean a claimed batch of records; returns (ok, data or error) per record"""
+    return [
+        (True, result["data"]) if result["status"] == "success" else (False, result["error"])
+        for result in clean_records(records)
+    ]
+
+def webhook_allowed(url):
+    """
+    Whether a job may be POSTed to `url`: it must start with one of
+    JOBS_WEBHOOK_PREFIXES (no prefixes means no webhooks) and its host must
+    only resolve to public addresses, so a webhook can't reach the internal network.
+    """
+    if not isinstance(url, str) or not JOBS_WEBHOOK_PREFIXES or not url.startswith(tuple(JOBS_WEBHOOK_PREFIXES)):
+        return False
+    try:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return False
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP)}
+    except (ValueError, OSError):
+        return False
+    return all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses)
+
+def notify_webhook(url, body, attempts=3):
+    """POST a finished job to its webhook; returns the HTTP status, or the last error's name"""
+    # Checked again at delivery: the host may resolve differently than when the job was queued
+    if not webhook_allowed(url):
+        logger.warning("Webhook %s refused for job %s", url, body.get("job_id"))
+        return "refused"
+    status = None
+    for attempt in range(attempts):
+        try:
+            response = get_http_session().post(url, json=body, timeout=10, allow_redirects=False)
+            status = str(response.status_code)
+            if response.status_code < 500:
+                return status
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        if attempt + 1 < attempts:
+            time.sleep(2 ** attempt)
+    logger.warning("Webhook %s failed for job %s: %s", url, body.get("job_id"), status)
+    return status
+
+_job_workers = None
+_job_workers_lock = threading.Lock()
+
+def get_job_workers():
+    """Return this process's JobWorkers, creating them (and opening the job queue) on first use"""
+    global _job_workers
+    if _job_workers is None:
+        with _job_workers_lock:
+            if _job_workers is None:
+                _job_workers = JobWorkers(
+                    get_job_queue(),
+                    process_clean_jobs,
+                    notify=notify_webhook,
+                    workers=JOBS_WORKERS,
+                    batch_size=int(os.getenv('JOBS_BATCH_SIZE', 32)),
+                    poll_interval=float(os.getenv('JOBS_POLL_INTERVAL', 1)),
+                    lease=float(os.getenv('JOBS_LEASE', 300))
+                )
+    return _job_workers
@@ -0,0 +1,91 @@
+"""
+Process setup: warming clients, starting the job workers and readiness checks.
+"""
+import os
+import time
+
+import click
+
+from . import clients
+from .clients import warm_up
+from .vector_store import VectorStore
+from .settings import API_KEY, ASI_CHAT_URL, ASI_KEY, JOBS_DB, JOBS_WORKERS, SERP_API, WARM_CLIENTS
+from .services import embedding_cache, get_job_queue, vector_index
+from .jobs import get_job_workers
+
+def warm_clients():
+    """Create the shared clients and pre-connect to the upstream hosts"""
+    warm_up([ASI_CHAT_URL])
+
+def after_fork():
+    """
+    Per-process setup for a worker forked from a preloaded app.
+
+    Pooled connections and the SQLite handle can't be shared with the parent,
+    so they are replaced; the clients are then warmed here rather than in
+    the parent, where they would go unused.
+    """
+    clients.reset()
+    embedding_cache.reopen()
+    get_job_queue().reopen()
+    if WARM_CLIENTS:
+        warm_clients()
+
+def readiness_checks():
+    """Name -> bool for each dependency /ready looks at"""
+    checks = {
+        "google_api_key": bool(API_KEY),
+        "asi_api_key": bool(ASI_KEY),
+        "serp_api_key": bool(SERP_API),
+        "embedding_cache": embedding_cache.ping(),
+        "job_queue": get_job_queue().ping()
+    }
+    if isinstance(vector_index, VectorStore):
+        checks["vector_store"] = os.access(vector_index.directory, os.W_OK)
+    return checks
+
+_started = False
+
+def start():
+    """
+    Per-process setup for a server that doesn't preload; create_app calls this once.
+
+    Under a preloading server the workers warm up after fork instead.
+    """
+    global _started
+    if _started or os.getenv('PRELOAD_APP'):
+        return
+    _started = True
+    if WARM_CLIENTS:
+        warm_clients()
+
+_serving_pid = None
+
+def serve():
+    """
+    Start this process's JOBS_WORKERS job worker threads.
+
+    Called by the processes that serve requests (gunicorn's post_fork, the
+    ASGI lifespan startup, app.py's development server), never by create_app,
+    so importing or building the app opens no job queue. Threads don't
+    survive a fork, so a forked process starts its own.
+    """
+    global _serving_pid
+    if not JOBS_WORKERS or _serving_pid == os.getpid():
+        return
+    _serving_pid = os.getpid()
+    get_job_workers().start()
+
+@click.command("jobs")
+def jobs_command():
+    """Drain the /jobs/clean queue in the foreground, e.g. next to `flask run`"""
+    if not JOBS_WORKERS:
+        raise click.UsageError("JOBS_WORKERS is 0")
+    workers = get_job_workers()
+    workers.start()
+    click.echo(f"{JOBS_WORKERS} job workers draining {JOBS_DB}; Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        workers.stop()
@@ -0,0 +1,166 @@
+"""
+Timing spans, Prometheus metrics and sampled payload logging.
+
+span()/timed() record how long an operation took into the
+rag_span_seconds histogram and count the ones that raised. Route latency
+goes into rag_http_request_seconds. Percentiles come from the histogram
+buckets on the Prometheus side, e.g.
+
+    histogram_quantile(0.95, sum by (le, span) (rate(rag_span_seconds_bucket[5m])))
+
+Components with a stats() method (caches, upstream limiters) are exported
+as gauges when /metrics is scraped, so they cost nothing in between.
+
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py does this), the
+histograms and counters are written to files shared by all worker
+processes and /metrics sums them, whichever worker answers the scrape.
+The stats gauges are always those of the answering worker.
+"""
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger("rag_search.spans")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+
+registry = CollectorRegistry()
+
+SPAN_SECONDS = Histogram(
+    "rag_span_seconds", "Duration of instrumented operations",
+    ["span"], buckets=LATENCY_BUCKETS, registry=registry
+)
+SPAN_ERRORS = Counter(
+    "rag_span_errors", "Instrumented operations that raised, by exception type",
+    ["span", "error"], registry=registry
+)
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "Time to produce a response, per route",
+    ["route", "method"], buckets=LATENCY_BUCKETS, registry=registry
+)
+REQUESTS = Counter(
+    "rag_http_requests", "Responses sent, per route and status",
+    ["route", "method", "status"], registry=registry
+)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as one observation of rag_span_seconds{span=name}"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        SPAN_ERRORS.labels(name, type(e).__name__).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.labels(name).observe(elapsed)
+        logger.debug("%s took %.1f ms", name, elapsed * 1000)
+
+
+def timed(name):
+    """Decorator form of span for plain and async functions"""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe_request(route, method, status, seconds):
+    REQUEST_SECONDS.labels(route, method).observe(seconds)
+    REQUESTS.labels(route, method, str(status)).inc()
+
+
+class StatsCollector:
+    """
+    Export stats() dicts as gauges named rag_<group>_<stat>.
+
+    Numeric values become one sample labelled with the component's name;
+    a nested dict (e.g. errors by reason) becomes one sample per key.
+    """
+
+    def __init__(self):
+        self._sources = []
+
+    def add(self, group, label, name, stats):
+        self._sources.append((group, label, name, stats))
+
+    def collect(self):
+        families = {}
+        for group, label, name, stats in self._sources:
+            for stat, value in stats().items():
+                metric = f"rag_{group}_{stat}"
+                if isinstance(value, dict):
+                    family = families.get(metric)
+                    if family is None:
+                        family = families[metric] = GaugeMetricFamily(metric, f"{group} {stat}", labels=[label, "kind"])
+                    for kind, count in value.items():
+                        family.add_metric([name, str(kind)], float(count))
+                elif isinstance(value, (int, float)):
+                    family = families.get(metric)
+                    if family is None:
+                        family = families[metric] = GaugeMetricFamily(metric, f"{group} {stat}", labels=[label])
+                    family.add_metric([name], float(value))
+        return list(families.values())
+
+
+stats_collector = StatsCollector()
+registry.register(stats_collector)
+
+
+def register_stats(group, label, name, stats):
+    """
+    Publish a component's stats() on /metrics.
+
+    Args:
+        group (str): Metric name prefix, e.g. "cache"
+        label (str): Label that tells components of a group apart, e.g. "cache"
+        name (str): This component's label value, e.g. "embeddings"
+        stats (callable): Returns a flat dict of numbers (one level of nesting allowed)
+    """
+    stats_collector.add(group, label, name, stats)
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        merged = CollectorRegistry()
+        multiprocess.MultiProcessCollector(merged)
+        merged.register(stats_collector)
+        return generate_latest(merged), CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class SampleFilter(logging.Filter):
+    """Let through a random fraction of records"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return self.rate >= 1 or random.random() < self.rate
+
+
+def sampled_logger(name, rate):
+    """A logger that emits only `rate` of its records, for large debug payloads"""
+    sampled = logging.getLogger(name)
+    sampled.addFilter(SampleFilter(rate))
+    return sampled
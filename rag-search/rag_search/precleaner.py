@@ -0,0 +1,140 @@
+"""
+Rule-based cleaning of captured browsing records.
+
+Canonicalizes URLs for hosts we see constantly (Amazon, YouTube, Google),
+strips tracking parameters everywhere else (site-specific ones, like Amazon's
+ref and tag, only on their own site), and condenses metadata, so the
+model is only needed for the summary. Timestamp and geolocation are passed
+through unchanged.
+"""
+import json
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Click and campaign IDs that mean tracking wherever they appear
+TRACKING_PARAMS = frozenset([
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+])
+TRACKING_PREFIXES = ("utm_",)
+
+# Tracking on one site only; elsewhere e.g. "ref", "tag" or "sr" can select content
+SITE_TRACKING = {
+    "amazon": (frozenset([
+        "ref", "ref_", "tag", "psc", "qid", "sr", "dib", "dib_tag", "crid", "sprefix",
+        "smid", "linkcode", "linkid", "ascsubtag", "content-id",
+    ]), ("pd_rd_", "pf_rd_", "_encoding")),
+    "youtube": (frozenset(["si"]), ()),
+}
+
+AMAZON_HOST = re.compile(r"(^|\.)amazon\.[a-z.]+$")
+GOOGLE_HOST = re.compile(r"(^|\.)google\.[a-z.]+$")
+YOUTUBE_HOSTS = frozenset(["youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"])
+
+AMAZON_PRODUCT = re.compile(r"^(/[^/]+)?/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE)
+AMAZON_REF_SEGMENT = re.compile(r"/ref=[^/]*")
+
+# Query parameters that carry meaning on a host's known pages
+KEEP_PARAMS = {
+    "amazon_search": ("k", "i", "rh", "node"),
+    "youtube_watch": ("v",),
+    "youtube_results": ("search_query",),
+    "google_search": ("q", "tbm"),
+}
+
+
+def _is_tracking(name, site=None):
+    name = name.lower()
+    if name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES):
+        return True
+    if site is None:
+        return False
+    params, prefixes = SITE_TRACKING[site]
+    return name in params or name.startswith(prefixes)
+
+
+def _query(query, keep=None, site=None):
+    pairs = parse_qsl(query, keep_blank_values=True)
+    if keep is not None:
+        pairs = [(k, v) for k, v in pairs if k in keep]
+    else:
+        pairs = [(k, v) for k, v in pairs if not _is_tracking(k, site)]
+    return urlencode(pairs)
+
+
+def canonical_url(url):
+    """
+    Canonical form of a URL, e.g. an Amazon product page becomes
+    https://<host>/<slug>/dp/<ASIN>/ and a YouTube video
+    https://www.youtube.com/watch?v=<id>.
+
+    Unparseable input is returned stripped but otherwise unchanged.
+    """
+    if not isinstance(url, str):
+        return url
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url
+    if not host:
+        return url
+
+    scheme = parts.scheme.lower() or "https"
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    path = parts.path or "/"
+
+    if AMAZON_HOST.search(host):
+        product = AMAZON_PRODUCT.match(path)
+        if product:
+            return urlunsplit((scheme, netloc, f"{product.group(1) or ''}/dp/{product.group(2).upper()}/", "", ""))
+        path = AMAZON_REF_SEGMENT.sub("", path) or "/"
+        keep = KEEP_PARAMS["amazon_search"] if path.rstrip("/") == "/s" else None
+        return urlunsplit((scheme, netloc, path, _query(parts.query, keep, "amazon"), ""))
+
+    if host == "youtu.be":
+        video = path.strip("/").split("/")[0]
+        if video:
+            return urlunsplit(("https", "www.youtube.com", "/watch", urlencode({"v": video}), ""))
+
+    if host in YOUTUBE_HOSTS:
+        if path == "/watch":
+            return urlunsplit(("https", "www.youtube.com", "/watch", _query(parts.query, KEEP_PARAMS["youtube_watch"]), ""))
+        if path == "/results":
+            return urlunsplit(("https", "www.youtube.com", "/results", _query(parts.query, KEEP_PARAMS["youtube_results"]), ""))
+        return urlunsplit(("https", "www.youtube.com", path, _query(parts.query, site="youtube"), ""))
+
+    if GOOGLE_HOST.search(host) and path == "/search":
+        return urlunsplit((scheme, netloc, path, _query(parts.query, KEEP_PARAMS["google_search"]), ""))
+
+    return urlunsplit((scheme, netloc, path, _query(parts.query), ""))
+
+
+def condense_metadata(metadata, max_chars=500):
+    """Collapse whitespace and cut metadata to max_chars at a word boundary"""
+    if metadata is None:
+        return ""
+    if not isinstance(metadata, str):
+        metadata = json.dumps(metadata, separators=(",", ":"))
+    text = " ".join(metadata.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0] or text[:max_chars]
+    return cut + "..."
+
+
+def preclean_record(record, max_metadata_chars=500):
+    """
+    Build the "cleaned" part of a /clean result without the model.
+
+    Returns:
+        dict: {url, metadata, timestamp, getGeolocation} in the response_format shape
+    """
+    geolocation = record.get("getGeolocation", record.get("geolocation"))
+    return {
+        "url": canonical_url(record.get("url")),
+        "metadata": condense_metadata(record.get("metadata"), max_metadata_chars),
+        "timestamp": record.get("timestamp"),
+        "getGeolocation": geolocation if isinstance(geolocation, dict) else None
+    }
@@ -0,0 +1,192 @@
+"""
+Local ranking of marketplace results for /search.
+
+Each product gets a weighted sum of five scores in [0, 1]:
+
+    context   how close its title is to the user's contexts (mean of the
+              best few cosine similarities)
+    profile   how close its title is to the user's interest clusters
+              (similarities weighted by each cluster's share, see user_profile)
+    query     cosine similarity of its title to the search term
+    lexical   BM25 of the search term against its title, over this result set
+    prior     Bayesian-averaged rating plus log review count
+
+The embedding scores are rescaled over the candidates, since absolute
+cosine values sit in a narrow band. Ties keep marketplace order. Title
+vectors come from TitleVectorCache, keyed by ASIN, so a product seen in
+one search costs nothing to score in the next.
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from cachetools import LRUCache
+
+from .vector_index import normalize
+
+TOKEN = re.compile(r"[a-z0-9]+")
+DEFAULT_WEIGHTS = {"context": 0.4, "profile": 0.2, "query": 0.25, "lexical": 0.2, "prior": 0.15}
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text or "").lower())
+
+
+def bm25_scores(query, titles, k1=1.2, b=0.75):
+    """BM25 of the query against each title, with document frequencies taken over the titles themselves"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    docs = [tokenize(title) for title in titles]
+    if not terms or not docs:
+        return np.zeros(len(docs))
+    lengths = np.array([len(doc) for doc in docs], dtype=float)
+    average = lengths.mean() or 1.0
+    tf = np.array([[counts[term] for term in terms] for counts in map(Counter, docs)], dtype=float)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / average)
+    return (tf * (k1 + 1) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def _number(value):
+    """Rating or review count from a SerpAPI field (number, "1,234" or missing)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def prior_scores(products, confidence=20, review_share=0.3):
+    """
+    Rating and popularity priors.
+
+    Ratings are shrunk towards the mean of the result set by `confidence`
+    pseudo-reviews, so a 5.0 from two reviews doesn't beat a 4.5 from two
+    thousand; review counts add log-scaled popularity.
+    """
+    ratings = np.array([_number(p.get("rating")) or np.nan for p in products], dtype=float)
+    reviews = np.array([_number(p.get("reviews")) or 0.0 for p in products], dtype=float)
+    mean = np.nanmean(ratings) if not np.all(np.isnan(ratings)) else 3.0
+    ratings = np.where(np.isnan(ratings), mean, ratings)
+    shrunk = (ratings * reviews + mean * confidence) / (reviews + confidence)
+    quality = np.clip((shrunk - 1) / 4, 0, 1)
+    popularity = np.log1p(reviews) / math.log1p(reviews.max()) if reviews.max() > 0 else np.zeros(len(products))
+    return (1 - review_share) * quality + review_share * popularity
+
+
+def _rescale(scores):
+    """Min-max scale to [0, 1]; constant scores become 0"""
+    spread = scores.max() - scores.min() if len(scores) else 0
+    return (scores - scores.min()) / spread if spread > 1e-9 else np.zeros(len(scores))
+
+
+def rank(query, products, title_vectors, query_vector=None, context_vectors=(), weights=None, top_contexts=3,
+         interests=()):
+    """
+    Order products by the weighted score described above.
+
+    Args:
+        query (str): Search term
+        products (list): Raw product records, in marketplace order
+        title_vectors (list): Unit title embedding per product, None where unavailable
+        query_vector (list): Embedding of the query, or None
+        context_vectors (list): Embeddings of the user's contexts
+        weights (dict): Overrides for DEFAULT_WEIGHTS
+        top_contexts (int): How many of a product's best context matches are averaged
+        interests (list): The user's interest clusters ({"vector", "weight"}), see UserProfiles.interests
+
+    Returns:
+        list: (score, product) pairs, best first
+    """
+    if not products:
+        return []
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    total = np.zeros(len(products))
+
+    embedded = [i for i, vector in enumerate(title_vectors) if vector is not None]
+    if embedded:
+        titles = np.asarray([title_vectors[i] for i in embedded], dtype=np.float32)
+        if query_vector:
+            semantic = np.zeros(len(products))
+            semantic[embedded] = _rescale(titles @ normalize(query_vector))
+            total += weights["query"] * semantic
+        context_vectors = [vector for vector in context_vectors if vector]
+        if context_vectors:
+            similarities = titles @ normalize(context_vectors).T
+            best = np.sort(similarities, axis=1)[:, -min(top_contexts, similarities.shape[1]):]
+            affinity = np.zeros(len(products))
+            affinity[embedded] = _rescale(best.mean(axis=1))
+            total += weights["context"] * affinity
+        if interests:
+            centers = np.asarray([interest["vector"] for interest in interests], dtype=np.float32)
+            shares = np.asarray([interest["weight"] for interest in interests], dtype=np.float32)
+            affinity = np.zeros(len(products))
+            affinity[embedded] = _rescale(titles @ centers.T @ shares / shares.sum())
+            total += weights["profile"] * affinity
+
+    lexical = bm25_scores(query, [p.get("title", "") for p in products])
+    if lexical.max() > 0:
+        total += weights["lexical"] * lexical / lexical.max()
+    total += weights["prior"] * prior_scores(products)
+
+    order = np.argsort(-total, kind="stable")
+    return [(float(total[i]), products[i]) for i in order]
+
+
+class TitleVectorCache:
+    """
+    Unit title embeddings by ASIN (or title, for results without one).
+
+    Args:
+        embed_many (callable): texts -> (vectors, errors), vectors None where embedding failed
+        maxsize (int): Products kept in memory
+        title_chars (int): Titles are cut to this length before embedding
+    """
+
+    def __init__(self, embed_many, maxsize=20000, title_chars=200):
+        self._embed_many = embed_many
+        self._vectors = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._title_chars = title_chars
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(product):
+        return product.get("asin") or product.get("title") or ""
+
+    def get_many(self, products):
+        """Title vector per product (None where embedding failed); misses are embedded in one batch"""
+        keys = [self.key(product) for product in products]
+        found = {}
+        with self._lock:
+            for key in set(keys):
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    found[key] = vector
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        missing = list(dict.fromkeys(key for key in keys if key and key not in found))
+        if missing:
+            titles = {self.key(product): str(product.get("title") or "")[:self._title_chars] for product in products}
+            vectors, _ = self._embed_many([titles[key] for key in missing])
+            fresh = {key: normalize(vector) for key, vector in zip(missing, vectors) if vector}
+            with self._lock:
+                self._vectors.update(fresh)
+            found.update(fresh)
+        return [found.get(key) for key in keys]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": self._vectors.currsize,
+                "maxsize": self._vectors.maxsize
+            }
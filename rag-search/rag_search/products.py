@@ -0,0 +1,159 @@
+"""
+Marketplace results from SerpAPI, cached and reduced to what the search prompt needs.
+"""
+import copy
+
+import orjson
+import requests
+
+from .observability import timed
+from .settings import SERPAPI_URL, SERP_API, payload_logger
+from .services import product_cache, serp_upstream
+
+# SerpAPI reports an empty result page as an error with this message
+NO_RESULTS = "hasn't returned any results"
+
+class SerpApiError(requests.exceptions.RequestException):
+    """SerpAPI answered with an error message instead of results"""
+
+def filter_products(products, top_k=5):
+    """
+    Filter product data to keep only selected fields and return top_k products.
+
+    Args:
+        products (list): List of product dictionaries
+        top_k (int): Number of top products to keep based on "position"
+
+    Returns:
+        tuple: (filtered_list, filtered_dict)
+            - filtered_list: list of product dicts with required fields
+            - filtered_dict: dict with "position" as key and product dict as value
+    """
+    
+    # Sort by position and take top_k
+    products_sorted = sorted(products, key=lambda x: x["position"])[:top_k]
+    
+    # Select only required fields
+    required_fields = ["position", "title", "link_clean", "rating", "reviews", "price"]
+    
+    filtered_list = []
+    filtered_dict = {}
+    
+    for p in products_sorted:
+        filtered = {field: p.get(field) for field in required_fields}
+        filtered_list.append(filtered)
+        filtered_dict[str(p["position"])] = filtered
+    
+    return filtered_list, filtered_dict
+
+class ProductResults:
+    """
+    One product search: the raw SerpAPI records, the compact view shown to the
+    model, and a position -> record index for resolving the model's choices.
+
+    Args:
+        products (list): Raw organic_results from SerpAPI
+        top_k (int): Number of products in the compact view
+    """
+
+    def __init__(self, products, top_k):
+        self.products = products
+        self.compact, _ = filter_products(products, top_k=top_k)
+        self.by_position = {int(p["position"]): p for p in products}
+        # Only positions the model was shown are valid answers
+        self.shown = {int(p["position"]) for p in self.compact}
+
+    def head(self, count):
+        """A view limited to the first count products, for when fewer fit in the prompt"""
+        view = copy.copy(self)
+        view.compact = self.compact[:count]
+        view.shown = {int(p["position"]) for p in view.compact}
+        return view
+
+    def ranked(self, limit=None):
+        """Raw records in marketplace order"""
+        records = [self.by_position[int(p["position"])] for p in self.compact]
+        return records[:limit] if limit else records
+
+    def select(self, positions, limit=None):
+        """
+        Resolve model-chosen positions to raw records in O(k).
+
+        Positions that aren't integers or weren't shown to the model are
+        dropped, repeats are removed, and the model's ranking is kept.
+        """
+        selected = []
+        seen = set()
+        for position in positions:
+            try:
+                number = float(position)
+            except (TypeError, ValueError):
+                continue
+            if not number.is_integer() or int(number) not in self.shown or int(number) in seen:
+                continue
+            seen.add(int(number))
+            selected.append(self.by_position[int(number)])
+            if limit and len(selected) >= limit:
+                break
+        return selected
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search term, used as a cache key"""
+    return " ".join(query.lower().split())
+
+@timed("get_products_details")
+def get_products_details(query, num_products=10):
+    """
+    SerpAPI Amazon results for a query, served from product_cache when possible.
+
+    Identical normalized queries within SERP_CACHE_TTL share one upstream call;
+    for SERP_CACHE_STALE_TTL after that the cached result is returned while a
+    background refresh runs. Callers must treat the returned objects as read-only.
+
+    Returns:
+        ProductResults: the raw results with their compact view and position index
+    """
+    key = (normalize_query(query), num_products)
+    return product_cache.get(key, lambda: _fetch_products_details(query, num_products))
+
+def _google_search(params):
+    """SerpAPI client for params; serpapi is imported on the first product lookup"""
+    from serpapi import GoogleSearch
+
+    search = GoogleSearch(params, timeout=30)
+    if SERPAPI_URL:
+        # Per client, so serpapi's class-wide default is left alone
+        search.BACKEND = SERPAPI_URL
+    return search
+
+@timed("serpapi_fetch")
+def _fetch_products_details(query, num_products):
+
+    params = {
+        "api_key": SERP_API,
+        "engine": "amazon",
+        "k": query,
+        "language": "amazon.in|en_IN",
+        "amazon_domain": "amazon.in",
+        "shipping_location": "IN",
+        "s": "exact-aware-popularity-rank"
+    }
+
+    search = _google_search(params)
+
+    def fetch():
+        response = search.get_response()
+        response.raise_for_status()  # 429 and 5xx are retried by serp_upstream
+        return response
+
+    response = serp_upstream.call(fetch, headers=lambda r: r.headers)
+    results = orjson.loads(response.content)
+    payload_logger.debug("SerpAPI results: %s", results)
+    if "organic_results" not in results:
+        error = results.get("error") or "No organic_results in SerpAPI response"
+        if NO_RESULTS not in error:
+            raise SerpApiError(f"SerpAPI error: {error}", response=response)
+    products = results.get('organic_results', [])
+
+    return ProductResults(products, top_k=num_products)
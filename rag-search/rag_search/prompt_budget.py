@@ -0,0 +1,128 @@
+"""
+Token budgeting for the /search prompt.
+
+Context chunks are de-duplicated, ranked by cosine similarity to the query
+and packed until their budget is spent; products are rendered as a compact
+pipe-separated table, cut off the same way. Token counts are estimated at
+four characters per token, which is close enough for English text to keep
+the prompt size bounded without shipping a tokenizer.
+"""
+import numpy as np
+
+from .embedding_cache import normalize_text
+from .vector_index import normalize
+
+CHARS_PER_TOKEN = 4
+PRODUCT_COLUMNS = ("position", "title", "rating", "reviews", "price")
+
+
+def estimate_tokens(text):
+    """Approximate token count of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text, tokens):
+    """Cut text to roughly `tokens` tokens at a word boundary"""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - 3].rsplit(" ", 1)[0] or text[:limit - 3]
+    return cut + "..."
+
+
+def unique_texts(texts):
+    """Drop empty and repeated texts (ignoring case and whitespace), keeping first occurrences"""
+    seen = set()
+    kept = []
+    for text in texts:
+        if not isinstance(text, str):
+            continue
+        key = normalize_text(text).lower()
+        if key and key not in seen:
+            seen.add(key)
+            kept.append(text)
+    return kept
+
+
+def rank_by_similarity(texts, vectors, query_vector, duplicate_threshold=0.95):
+    """
+    Order texts by cosine similarity to the query, dropping near-duplicates.
+
+    Args:
+        texts (list): Candidate context chunks
+        vectors (list): Embedding per text, None where embedding failed
+        query_vector (list): Embedding of the search query
+        duplicate_threshold (float): Texts at least this similar to a better-ranked one are dropped
+
+    Returns:
+        list: (score, text) pairs, best first; texts without a vector follow with score None
+    """
+    embedded = [i for i, vector in enumerate(vectors) if vector]
+    missing = [(None, texts[i]) for i, vector in enumerate(vectors) if not vector]
+    if not embedded:
+        return missing
+
+    matrix = normalize([vectors[i] for i in embedded])
+    scores = matrix @ normalize(query_vector)
+    order = np.argsort(-scores, kind="stable")
+
+    kept = []
+    for row in order:
+        if kept and float(np.max(matrix[kept] @ matrix[row])) >= duplicate_threshold:
+            continue
+        kept.append(row)
+    return [(float(scores[row]), texts[embedded[row]]) for row in kept] + missing
+
+
+def pack_texts(texts, budget, min_tokens=32):
+    """
+    Take texts in order until `budget` estimated tokens are used.
+
+    The first text that doesn't fit is truncated into the remaining space
+    when at least min_tokens are left; packing stops there.
+    """
+    packed = []
+    remaining = budget
+    for text in texts:
+        cost = estimate_tokens(text) + 1
+        if cost <= remaining:
+            packed.append(text)
+            remaining -= cost
+            continue
+        if remaining - 1 >= min_tokens:
+            packed.append(truncate_to_tokens(text, remaining - 1))
+        break
+    return packed
+
+
+def render_contexts(texts):
+    return "\n".join(f"{i}. {' '.join(text.split())}" for i, text in enumerate(texts, 1))
+
+
+def _cell(value, chars=None):
+    if value is None:
+        return ""
+    text = " ".join(str(value).replace("|", "/").split())
+    return truncate_to_tokens(text, chars // CHARS_PER_TOKEN) if chars else text
+
+
+def render_product_table(products, budget, title_chars=100):
+    """
+    Render products as a header plus one pipe-separated row each, within budget.
+
+    Returns:
+        tuple: (table, rows) - rows is how many products made it into the table
+    """
+    lines = ["|".join(PRODUCT_COLUMNS)]
+    used = estimate_tokens(lines[0]) + 1
+    for product in products:
+        row = "|".join(
+            _cell(product.get(column), title_chars if column == "title" else None)
+            for column in PRODUCT_COLUMNS
+        )
+        cost = estimate_tokens(row) + 1
+        if used + cost > budget:
+            break
+        lines.append(row)
+        used += cost
+    return "\n".join(lines), len(lines) - 1
@@ -0,0 +1,283 @@
+"""
+Response formats and system prompts sent to the models.
+
+Each response_format is compiled to a ResponseSchema here, once per process,
+and the decoders are reused by every request.
+"""
+from .observability import register_stats
+from .structured_output import ResponseSchema, item_schema
+
+response_format = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "data_extraction_summary",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "cleaned": {
+                    "type": "object",
+                    "properties": {
+                        "url": {"type": "string", "description": "A simplified, clean version of the source URL"},
+                        "metadata": {"type": "string", "description": "Cleaned and summarized metadata from the source"},
+                        "timestamp": {"type": ["number", "null"], "description": "UNIX timestamp of the content, or null if not available"},
+                        "getGeolocation": {
+                            "type": "object",
+                            "properties": {
+                                "ok": {"type": "boolean", "description": "True if geolocation data was successfully found"},
+                                "latitude": {"type": "number", "description": "The latitude coordinate"},
+                                "longitude": {"type": "number", "description": "The longitude coordinate"}
+                            },
+                            "required": ["ok", "latitude", "longitude"]
+                        }
+                    },
+                    "required": ["url", "metadata", "timestamp", "getGeolocation"]
+                },
+                "context": {
+                    "type": "string",
+                    "description": "A detailed summary of the content for contextual understanding"
+                }
+            },
+            "required": ["cleaned", "context"]
+        }
+    }
+}
+
+
+CLEAN_SYSTEM_PROMPT = """You are a formatting agent and cleaning agents removes any unwanted details/token from the given Url data/
+data but keeps the structure intact. VERY IMPORTANT!!! Return ONLY valid JSON matching the provided schema.
+Analyze this JSON data and do the following:
+1. Create a cleaned version with sensitive/redundant data removed
+    - Keep the same structure (url, metadata, timestamp, getGeolocation)
+    - Remove query parameters and tracking IDs from URLs
+    - Keep only essential product information
+    
+2. Write a brief but detailed summary describing what this data represents
+    - Include product type, category, and key features
+    - Make it descriptive for meaningful embeddings
+
+Format your response strictly as valid JSON like this:
+{
+    "cleaned": {
+        "url": "simplified-url",
+        "metadata": "cleaned-metadata",
+        "timestamp": number,
+        "getGeolocation": {
+            "ok": true,
+            "latitude": 28.6542 (do not change it),
+            "longitude":77.2373 (do not change it)
+        } or null if not available.
+    },
+    "context": "your detailed summary here"
+}
+
+You are a JSON-only generator.  
+Always return **valid, strict JSON** with double quotes for keys and string values.  
+
+DO NOT USE singles quotes of double doute in the context or cleaned sections.
+DO NOT add ```json ``` like this. Preserve the timestamp number also
+"""
+
+
+SUMMARY_SYSTEM_PROMPT = """You are a summarizing agent for browsing history records. The url and metadata you are given are already cleaned.
+Write a brief but detailed summary describing what this data represents
+    - Include product type, category, and key features, or video type for youtube
+    - This can have data from any category so give accordingly
+    - Inference from the website url in very short
+    - Make it descriptive for meaningful embeddings
+
+Format your response strictly as valid JSON like this:
+{
+    "context": "your detailed summary here"
+}
+
+You are a JSON-only generator.
+Always return **valid, strict JSON** with double quotes for keys and string values.
+
+DO NOT USE singles quotes of double doute in the context.
+DO NOT add ```json ``` like this.
+"""
+
+summary_response_format = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "data_summary",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "context": {
+                    "type": "string",
+                    "description": "A detailed summary of the content for contextual understanding"
+                }
+            },
+            "required": ["context"]
+        }
+    }
+}
+
+BATCH_INSTRUCTIONS = """
+BATCH MODE: The input is a JSON array of records, each with an integer "id".
+Apply the instructions above to every record independently and, instead of a single object, return strictly valid JSON like this:
+{
+    "results": [
+        {"id": <the record id>, ...the fields described above for that record...}
+    ]
+}
+Return exactly one entry per input id.
+"""
+
+def _batch_format(name, single_format):
+    """Wrap a single-record json_schema response format into an array of results keyed by id"""
+    schema = single_format["json_schema"]["schema"]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "results": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "integer", "description": "The id of the input record"},
+                                **schema["properties"]
+                            },
+                            "required": ["id", *schema["required"]]
+                        }
+                    }
+                },
+                "required": ["results"]
+            }
+        }
+    }
+
+batch_response_format = _batch_format("data_extraction_summary_batch", response_format)
+batch_summary_response_format = _batch_format("data_summary_batch", summary_response_format)
+
+search_response_template = {
+  "type": "json_schema",
+  "json_schema": {
+    "name": "number_list_with_message",
+    "strict": "true",
+    "schema": {
+      "type": "object",
+      "properties": {
+        "index": {
+          "type": "array",
+          "items": {
+            "type": "number",
+            "description": "A numeric element of the array"
+          },
+          "description": "A list of numbers"
+        },
+        "ai_message": {
+          "type": "string",
+          "description": "A message from the AI describing or explaining the choice of products"
+        }
+      },
+      "required": ["index", "ai_message"]
+    }
+  }
+}
+
+# Model replies are decoded against these, compiled once from the formats above
+clean_output = ResponseSchema(response_format)
+summary_output = ResponseSchema(summary_response_format)
+search_output = ResponseSchema(search_response_template)
+# Batch replies are checked per result, so one bad entry doesn't cost the whole pack
+batch_output = ResponseSchema({"json_schema": {"name": "batch_results", "schema": {
+    "type": "object", "properties": {"results": {"type": "array"}}, "required": ["results"]
+}}})
+batch_item_outputs = {
+    True: item_schema(batch_summary_response_format),
+    False: item_schema(batch_response_format)
+}
+for schema in (clean_output, summary_output, search_output, batch_output):
+    register_stats("decoder", "schema", schema.name, schema.stats)
+
+SEARCH_SYSTEM_PROMPT = """
+You are a search agent that finds the Best Product based on User Context, Search Term and List of Product and descriptions.
+Given a search term and its corresponding product details and a list of context entries, identify and return the top K most relevant entries.
+
+User will provide the data in the following format
+[Context Text Chunk 1]
+[Context Text Chunk 2]
+...
+[Context Text Chunk K]
+
+[Search Query Statement]
+
+[Product Details from Amazon 1]
+[Product Details from Amazon 2]
+...
+[Product Details from Amazon N]
+
+Return the top M most relevant context entries (use what products they like, what website they visit and what videos they have watched) that best match the search query and product details as per the response structure. Along with an AI message on why this is the best match from the past contexts. If the search query is very very wierd and not matching any of the context or product details, return Search didn't exactly match the queries here are similar products.
+
+Example:
+"Enjoy the videos and music you love, upload original content, and share it all with friends, family, and the world on YouTube."
+"Rozi Decoration Balloon Arch Garland Kit For Birthday/Anniverary/Bride to Be Decoration - Kit of 78 Pieces (Black, White Gold) : Amazon.in: Toys & Games"
+
+Give me the top 3 products that best match [search query] and product details as per the response structure. Along with an AI message on why this is the best match from the past contexts. If the search query is very very wierd and not matching any of the context or product details, return Search didn't exactly match the queries here are similar products. this comes with the key "ai_message".DO NOT Mention Product IDS in the AI Message.
+
+{}
+
+response: will in json with the "position" of the most relevant products.
+
+["1","5","7"] with the key as "index"(for this asumming that 5th 7th product were also there)
+ai_messsage: You seem be intrested in this and this field [infer this from the context]. (write summary reasons for selections if there is anything unique which u can observe with respect to the context )
+You are a JSON-only generator.  
+Always return **valid, strict JSON** with double quotes for keys and string values.  
+
+
+DO NOT USE singles quotes of double doute in the context or cleaned sections.
+DO NOT add ```json ``` like this
+""".format({
+    "position": 1,
+    "title": "Fighter Jet Combat Simulator: Jet Force Elite",
+    "link_clean": "https://www.amazon.com.au/Jet-Force-Elite-Combat-Simulator/dp/B0DXF6NJ36/",
+    "rating": 3.9,
+    "reviews": 198,
+    "price": "$0.00",
+})
+
+
+search_message_format = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "search_message",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "ai_message": {
+                    "type": "string",
+                    "description": "A message from the AI explaining why these products suit the user"
+                }
+            },
+            "required": ["ai_message"]
+        }
+    }
+}
+search_message_output = ResponseSchema(search_message_format)
+register_stats("decoder", "schema", search_message_output.name, search_message_output.stats)
+
+SEARCH_MESSAGE_SYSTEM_PROMPT = """You are a shopping assistant. The products for the user's search have already been chosen.
+Using the user's context entries (what products they like, what websites they visit and what videos they have watched),
+write a short message on why these products are a good match for them. If the search query is very very wierd and not
+matching any of the context or product details, say Search didn't exactly match the queries here are similar products.
+DO NOT Mention Product IDS or positions in the message.
+
+You are a JSON-only generator. Return strictly valid JSON like this:
+{
+    "ai_message": "your message here"
+}
+DO NOT add ```json ``` like this.
+"""
+
+# ai_message when the model isn't asked (SEARCH_AI_MESSAGE=false) or its reply is unusable
+RANKED_SEARCH_MESSAGE = "Products ranked by how well they match your search and recent interests."
@@ -0,0 +1,334 @@
+"""
+Client-side rate limiting and retries for upstream APIs.
+
+Each upstream (ASI chat, Gemini embeddings, SerpAPI) gets an Upstream: an
+adaptive token bucket that paces requests, a concurrency cap, and a tenacity
+retry policy with jittered exponential backoff. The bucket follows the
+quota signals the upstream sends back: rate-limit headers set the pace
+directly when present, a 429 halves it and honours Retry-After, and each
+success without headers nudges it back up towards the configured rate.
+"""
+import asyncio
+import email.utils
+import logging
+import re
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from tenacity import (AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt,
+                      stop_after_delay, wait_random_exponential)
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = frozenset([408, 429, 500, 502, 503, 504])
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitedError(requests.exceptions.RequestException):
+    """The upstream kept answering 429, or the local queue wait exceeded its limit"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value):
+    """
+    Seconds in a rate-limit header value.
+
+    Accepts plain seconds ("2", "0.5"), Go-style durations ("1s", "6m0s",
+    "20ms") and HTTP dates; returns None for anything else.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def _header(headers, *names):
+    if not headers:
+        return None
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _response_of(error):
+    return getattr(error, "response", None)
+
+
+def status_of(error):
+    """HTTP status carried by a requests, httpx or google-genai error, if any"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = _response_of(error)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(response, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_of(error):
+    """Retry-After seconds sent with a failed response, if any"""
+    response = _response_of(error)
+    return parse_duration(_header(getattr(response, "headers", None), "retry-after", "x-ratelimit-reset-requests"))
+
+
+def is_retryable(error):
+    """Connection failures, timeouts, 408/429 and 5xx are worth another attempt"""
+    if isinstance(error, RateLimitedError):
+        return False
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          httpx.TransportError)):
+        return True
+    return status_of(error) in RETRYABLE_STATUS
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate follows the upstream's quota signals.
+
+    Args:
+        rate (float): Requests per second to start at and recover towards
+        burst (int): Bucket capacity
+        min_rate (float): Lowest rate a string of 429s can push the bucket to
+        max_wait (float): Longest a caller queues for a token before giving up
+    """
+
+    def __init__(self, rate, burst, min_rate=None, max_wait=30.0):
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 16
+        self.rate = self.max_rate
+        self.burst = max(float(burst), 1.0)
+        self.max_wait = max_wait
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _reserve(self, now):
+        """Take a token, or return how long to sleep before trying again"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _too_long(self, waited, wait):
+        if waited + wait > self.max_wait:
+            raise RateLimitedError(f"Local rate limit queue exceeded {self.max_wait:g}s", retry_after=wait)
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            wait = self._reserve(time.monotonic())
+            if not wait:
+                return
+            self._too_long(waited, wait)
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self):
+        waited = 0.0
+        while True:
+            wait = self._reserve(time.monotonic())
+            if not wait:
+                return
+            self._too_long(waited, wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def on_success(self, headers=None):
+        """Follow x-ratelimit-* / ratelimit-* headers, or recover additively without them"""
+        remaining = _header(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining", "ratelimit-remaining")
+        reset = parse_duration(_header(headers, "x-ratelimit-reset-requests", "x-ratelimit-reset", "ratelimit-reset"))
+        try:
+            remaining = float(remaining) if remaining is not None else None
+        except ValueError:
+            remaining = None
+
+        with self._lock:
+            if remaining is not None and reset:
+                if remaining < 1:
+                    self._paused_until = max(self._paused_until, time.monotonic() + reset)
+                self.rate = min(self.max_rate, max(self.min_rate, remaining / reset))
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def on_throttle(self, retry_after=None):
+        """A 429: halve the rate and hold every caller until Retry-After has passed"""
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "tokens": round(self._tokens, 3),
+                "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 3),
+                "throttled": self.throttled
+            }
+
+
+class Upstream:
+    """
+    Pacing, concurrency cap and retry policy for one upstream service.
+
+    Args:
+        name (str): Used in error messages and stats
+        rate (float): Target requests per second
+        burst (int): Requests allowed back to back before pacing starts
+        max_concurrency (int): Requests in flight at once, per process
+        max_attempts (int): Attempts per call, including the first
+        max_delay (float): Give up retrying once this many seconds have passed
+    """
+
+    def __init__(self, name, rate, burst, max_concurrency, max_attempts=4, max_delay=30.0):
+        self.name = name
+        self.bucket = AdaptiveTokenBucket(rate, burst, max_wait=max_delay)
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.max_delay = max_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._backoff = wait_random_exponential(multiplier=0.5, max=8)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.errors = {}
+
+    def _async_semaphore(self):
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_slots.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._async_slots[loop] = semaphore
+            return semaphore
+
+    def _wait(self, retry_state):
+        """Jittered exponential backoff, but never sooner than the upstream's Retry-After"""
+        return max(self._backoff(retry_state), retry_after_of(retry_state.outcome.exception()) or 0.0)
+
+    def _before_sleep(self, retry_state):
+        error = retry_state.outcome.exception()
+        with self._lock:
+            self.retries += 1
+        logger.warning("%s: attempt %d failed (%r), retrying", self.name, retry_state.attempt_number, error)
+
+    def _policy(self, retrying_class):
+        return retrying_class(
+            retry=retry_if_exception(is_retryable),
+            wait=self._wait,
+            stop=stop_after_attempt(self.max_attempts) | stop_after_delay(self.max_delay),
+            before_sleep=self._before_sleep,
+            reraise=True
+        )
+
+    def _record(self, result, headers):
+        self.bucket.on_success(headers(result) if headers else None)
+        return result
+
+    def _on_error(self, error):
+        reason = str(status_of(error) or type(error).__name__)
+        with self._lock:
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+        if status_of(error) == 429:
+            self.bucket.on_throttle(retry_after_of(error))
+
+    def _give_up(self, error):
+        with self._lock:
+            self.failures += 1
+        if status_of(error) == 429:
+            return RateLimitedError(f"{self.name} rate limit exceeded: {error}", retry_after=retry_after_of(error))
+        return None
+
+    def call(self, fn, headers=None):
+        """
+        Call fn() under the limiter, retrying retryable failures.
+
+        Args:
+            fn (callable): Performs one attempt; raises on failure
+            headers (callable): Optional, maps fn's result to response headers for the bucket
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            RateLimitedError: the upstream was still answering 429 when retries ran out
+        """
+        def attempt():
+            self.bucket.acquire()
+            with self._slots:
+                try:
+                    return self._record(fn(), headers)
+                except Exception as e:
+                    self._on_error(e)
+                    raise
+
+        with self._lock:
+            self.calls += 1
+        try:
+            return self._policy(Retrying)(attempt)
+        except Exception as e:
+            limited = self._give_up(e)
+            if limited is not None:
+                raise limited from e
+            raise
+
+    async def call_async(self, fn, headers=None):
+        """Async counterpart of call; fn returns an awaitable"""
+        async def attempt():
+            await self.bucket.acquire_async()
+            async with self._async_semaphore():
+                try:
+                    return self._record(await fn(), headers)
+                except Exception as e:
+                    self._on_error(e)
+                    raise
+
+        with self._lock:
+            self.calls += 1
+        try:
+            return await self._policy(AsyncRetrying)(attempt)
+        except Exception as e:
+            limited = self._give_up(e)
+            if limited is not None:
+                raise limited from e
+            raise
+
+    def stats(self):
+        with self._lock:
+            counters = {"calls": self.calls, "retries": self.retries, "failures": self.failures, "errors": dict(self.errors)}
+        return {**counters, "max_concurrency": self.max_concurrency, **self.bucket.stats()}
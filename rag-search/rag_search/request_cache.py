@@ -0,0 +1,261 @@
+"""
+Caching primitives for slow upstream lookups.
+
+SingleFlight collapses concurrent calls for the same key into one execution.
+SWRCache adds a TTL result cache with stale-while-revalidate on top: fresh
+entries are served directly, stale ones are served while a single background
+refresh runs, and misses are fetched once no matter how many callers wait.
+TTLMemo is a plain locked TTL map for values computed elsewhere.
+Coalescer pairs single-flight with a short memo window for request handlers,
+in threaded and asyncio servers alike.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import LRUCache, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key at a time; concurrent callers share its result or exception"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines.
+
+    The shared work runs as its own task, so a caller that is cancelled
+    (e.g. a disconnected client) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        # Tasks belong to one event loop, so flights never cross loops
+        slot = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(slot)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[slot] = task
+            task.add_done_callback(lambda _: self._tasks.pop(slot, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class SWRCache:
+    """
+    Size-bounded result cache with stale-while-revalidate.
+
+    Args:
+        ttl (float): Seconds an entry is served as fresh
+        stale_ttl (float): Further seconds a stale entry is served while it refreshes
+        maxsize (int): Maximum number of entries, least recently used evicted first
+    """
+
+    def __init__(self, ttl=600, stale_ttl=3600, maxsize=1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._refreshing = set()
+        self._executor = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def get(self, key, fetch):
+        """Return the cached value for key, calling fetch() on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if entry and age < self.ttl:
+                self.hits += 1
+                return entry[0]
+            if entry and age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch)
+                return entry[0]
+            self.misses += 1
+
+        return self._flight.do(key, lambda: self._load(key, fetch))
+
+    def _load(self, key, fetch):
+        value = fetch()
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+        return value
+
+    def _schedule_refresh(self, key, fetch):
+        # Called with self._lock held
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="swr-refresh")
+        self._executor.submit(self._refresh, key, fetch)
+
+    def _refresh(self, key, fetch):
+        try:
+            self._flight.do(key, lambda: self._load(key, fetch))
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            logger.warning("Background refresh of %r failed: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self._flight.coalesced,
+                "refresh_errors": self.refresh_errors,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "size": self._entries.currsize,
+                "maxsize": self._entries.maxsize
+            }
+
+
+class TTLMemo:
+    """Thread-safe, size-bounded TTL map with hit/miss counters"""
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": self._entries.currsize,
+                "maxsize": self._entries.maxsize
+            }
+
+
+def content_key(namespace, data):
+    """Stable hash of a JSON-compatible request body, independent of key order"""
+    body = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return namespace + ":" + hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class Coalescer:
+    """
+    Share one execution among identical concurrent requests.
+
+    Callers with the same key wait on the in-progress call and receive its
+    result. Results accepted by keep() are then served for a further
+    `window` seconds, which catches duplicates arriving just after the first
+    one finished. Threaded and async callers are coalesced separately.
+
+    Args:
+        window (float): Seconds a finished result is reused, 0 disables the memo
+        maxsize (int): Maximum number of memoized results
+    """
+
+    def __init__(self, window=2.0, maxsize=4096):
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+        self._memo = TTLMemo(maxsize=maxsize, ttl=window) if window > 0 else None
+
+    def _remember(self, key, result, keep):
+        if self._memo is not None and keep(result):
+            self._memo.set(key, result)
+        return result
+
+    def do(self, key, fn, keep=lambda result: True):
+        if self._memo is not None:
+            result = self._memo.get(key)
+            if result is not None:
+                return result
+        return self._flight.do(key, lambda: self._remember(key, fn(), keep))
+
+    async def do_async(self, key, fn, keep=lambda result: True):
+        """Like do, but fn returns an awaitable"""
+        if self._memo is not None:
+            result = self._memo.get(key)
+            if result is not None:
+                return result
+
+        async def run():
+            return self._remember(key, await fn(), keep)
+        return await self._async_flight.do(key, run)
+
+    def stats(self):
+        memo = self._memo.stats() if self._memo is not None else {"hits": 0, "size": 0}
+        return {
+            "coalesced": self._flight.coalesced + self._async_flight.coalesced,
+            "memo_hits": memo["hits"],
+            "memo_size": memo["size"]
+        }
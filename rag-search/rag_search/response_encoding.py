@@ -0,0 +1,115 @@
+"""
+Response encoding: orjson for JSON bodies, and compact embedding formats.
+
+Clients pick an embedding format with the Accept header:
+
+    application/json                                  vectors as JSON number lists (default)
+    application/json; embedding=base64[; dtype=float16]
+                                                      each vector as base64 of its little-endian
+                                                      float32 (or float16) bytes
+    application/octet-stream[; dtype=float16]         raw little-endian rows, /embedding and
+                                                      /embeddings/batch only
+
+A 3072-dimension vector is about 60 KB as JSON, 16 KB as base64 float32
+and 6 KB as raw float16.
+"""
+import base64
+from collections import namedtuple
+
+import numpy as np
+import orjson
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import parse_options_header
+
+DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+EmbeddingFormat = namedtuple("EmbeddingFormat", ["kind", "dtype"])
+JSON_FORMAT = EmbeddingFormat("json", "float32")
+
+
+def dumps(value, default=None, options=0):
+    """Serialize to JSON bytes; NumPy arrays and scalars are written natively"""
+    return orjson.dumps(value, default=default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | options)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, honouring sort_keys and debug indentation"""
+
+    def _options(self):
+        options = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, default=self.default, options=self._options()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return Response(dumps(obj, default=self.default, options=self._options()) + b"\n", mimetype=self.mimetype)
+
+
+def negotiate(accept):
+    """
+    Embedding format requested by an Accept header.
+
+    Returns:
+        EmbeddingFormat: kind is "json", "base64" or "binary"; the first
+        recognised media range wins, and anything else means plain JSON
+    """
+    for media_range in (accept or "").split(","):
+        mimetype, params = parse_options_header(media_range)
+        dtype = params.get("dtype", "float32")
+        if dtype not in DTYPES:
+            continue
+        if mimetype == "application/octet-stream":
+            return EmbeddingFormat("binary", dtype)
+        if mimetype == "application/json":
+            return EmbeddingFormat("base64", dtype) if params.get("embedding") == "base64" else JSON_FORMAT
+    return JSON_FORMAT
+
+
+def vector_bytes(vectors, dtype):
+    """Little-endian bytes of one vector or of equal-length vectors stacked row by row"""
+    return np.asarray(vectors, dtype=np.float32).astype(DTYPES[dtype], copy=False).tobytes()
+
+
+def encode_vector(vector, dtype):
+    """A vector as base64 of its little-endian bytes; None stays None"""
+    if vector is None:
+        return None
+    return base64.b64encode(vector_bytes(vector, dtype)).decode("ascii")
+
+
+def embedding_fields(vector, fmt):
+    """
+    Response fields for one vector in the given format.
+
+    Returns:
+        dict: {"embedding": [...]} for JSON, or {"embedding": "<base64>", "encoding", "dtype", "dim"}
+    """
+    if fmt.kind == "json" or vector is None:
+        return {"embedding": vector}
+    return {"embedding": encode_vector(vector, fmt.dtype), "encoding": "base64", "dtype": fmt.dtype, "dim": len(vector)}
+
+
+def binary_response(vectors, dtype, headers=None):
+    """
+    application/octet-stream response of equal-length vectors as row-major little-endian values.
+
+    X-Embedding-Count, X-Embedding-Dim and X-Embedding-Dtype describe the
+    shape; rows that are None are filled with NaN.
+    """
+    dim = next((len(v) for v in vectors if v is not None), 0)
+    rows = [v if v is not None else [float("nan")] * dim for v in vectors]
+    body = vector_bytes(rows, dtype) if rows and dim else b""
+    return Response(body, mimetype="application/octet-stream", headers={
+        "X-Embedding-Count": str(len(vectors)),
+        "X-Embedding-Dim": str(dim),
+        "X-Embedding-Dtype": dtype,
+        **(headers or {})
+    })
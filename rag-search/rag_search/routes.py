@@ -0,0 +1,474 @@
+"""
+HTTP routes, registered on the app by create_app.
+"""
+import functools
+import time
+
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+
+from .observability import observe_request, render_metrics, span
+from .request_cache import content_key
+from .response_encoding import binary_response, dumps, embedding_fields, encode_vector, negotiate
+from .streaming import JsonStringFieldStream
+from .structured_output import ResponseDecodeError
+from .settings import (CLEAN_BATCH_MAX_RECORDS, EMBED_MAX_TEXTS, MAX_CONTENT_LENGTH,
+                       SEARCH_CHAT_TIMEOUT, SEARCH_RANKER, SEARCH_TEST_FIXTURE, logger, payload_logger)
+from .services import (asi_upstream, context_cache, embedding_cache, gemini_upstream, get_job_queue,
+                       product_cache, request_coalescer, search_cache, search_executor, serp_upstream)
+from .prompts import (SEARCH_MESSAGE_SYSTEM_PROMPT, search_message_format, search_output,
+                      search_response_template)
+from .chat import chat, chat_stream, hello
+from .embeddings import make_embeddings, make_embeddings_many
+from .cleaning import (clean_records, coalesced_clean_record, decode_failure, format_clean_payload,
+                       retry_after_headers, validate_clean_input)
+from .search import (fallback_search_result, prepare_ranked_search, prepare_search, ranked_message,
+                     ranked_search_result, remember_search, search_cache_key, stage_result, start_products,
+                     title_vectors)
+from .jobs import webhook_allowed
+from .lifecycle import readiness_checks
+
+bp = Blueprint("rag_search", __name__)
+
+@bp.before_app_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@bp.after_app_request
+def record_request(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe_request(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+@bp.route('/metrics')
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@bp.route('/')
+def home():
+    return jsonify({"message": "Welcome to the RAG server!"})
+
+@bp.route('/health')
+def health():
+    return jsonify({"status": "ok"}), 200
+
+@bp.route('/ready')
+def ready():
+    checks = readiness_checks()
+    ok = all(checks.values())
+    return jsonify({
+        "status": "ready" if ok else "not ready",
+        "checks": checks
+    }), 200 if ok else 503
+
+@bp.app_errorhandler(413)
+def too_large(e):
+    return jsonify({
+        "error": "Request body too large",
+        "details": f"Limit is {MAX_CONTENT_LENGTH} bytes",
+        "status": "error"
+    }), 413
+
+@bp.route('/hi')
+def hi():
+    res = hello()
+    payload_logger.debug("Response: %s", res)
+    return res
+
+@bp.route('/clean', methods=['POST'])
+def clean():
+    payload, status = coalesced_clean_record(request.get_json(silent=True))
+    fmt = negotiate(request.headers.get("Accept"))
+    return jsonify(format_clean_payload(payload, fmt)), status, retry_after_headers(payload)
+
+@bp.route('/clean/batch', methods=['POST'])
+def clean_batch():
+    '''
+    {
+        records: [{url, metadata, timestamp, geolocation, user_id}, ...]
+    }
+    '''
+    data = request.get_json(silent=True)
+    records = data.get("records") if isinstance(data, dict) else None
+    if not isinstance(records, list) or not records:
+        return jsonify({
+            "error": "records must be a non-empty list",
+            "status": "error"
+        }), 400
+    if len(records) > CLEAN_BATCH_MAX_RECORDS:
+        return jsonify({
+            "error": f"At most {CLEAN_BATCH_MAX_RECORDS} records can be cleaned per request",
+            "status": "error"
+        }), 413
+
+    results = clean_records(records)
+    failed = sum(1 for result in results if result["status"] == "error")
+    fmt = negotiate(request.headers.get("Accept"))
+    return jsonify({
+        "results": [format_clean_payload(result, fmt) for result in results],
+        "status": "success" if not failed else ("error" if failed == len(results) else "partial")
+    }), 200
+
+@bp.route('/jobs/clean', methods=['POST'])
+def enqueue_clean():
+    '''
+    {
+        records: [{url, metadata, timestamp, geolocation, user_id}, ...] (or a single record as the body),
+        webhook: "optional URL that is POSTed each finished job"
+    }
+    '''
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and "records" in data:
+        records, webhook = data["records"], data.get("webhook")
+    else:
+        records, webhook = [data], None
+    if not isinstance(records, list) or not records:
+        return jsonify({
+            "error": "records must be a non-empty list",
+            "status": "error"
+        }), 400
+    if len(records) > CLEAN_BATCH_MAX_RECORDS:
+        return jsonify({
+            "error": f"At most {CLEAN_BATCH_MAX_RECORDS} records can be queued per request",
+            "status": "error"
+        }), 413
+    if webhook is not None and not webhook_allowed(webhook):
+        return jsonify({
+            "error": "webhook must be a public http(s) URL starting with one of JOBS_WEBHOOK_PREFIXES",
+            "status": "error"
+        }), 400
+    for i, record in enumerate(records):
+        invalid = validate_clean_input(record)
+        if invalid:
+            return jsonify({**invalid[0], "index": i}), invalid[1]
+
+    job_ids = get_job_queue().enqueue(records, webhook)
+    return jsonify({
+        "job_ids": job_ids,
+        "status": "queued"
+    }), 202
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({
+            "error": "Job not found",
+            "status": "error"
+        }), 404
+    payload = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "data": job["result"],
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "webhook_status": job["webhook_status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    return jsonify(format_clean_payload(payload, negotiate(request.headers.get("Accept")))), 200
+
+@bp.route('/embedding', methods=['POST'])
+def embedding():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                "error": "No data provided"
+            }), 400
+
+        text = data.get("text", "")
+        embedding_vector = request_coalescer.do(
+            content_key("embedding", data),
+            lambda: make_embeddings(text),
+            keep=bool
+        )
+        if not embedding_vector:
+            return jsonify({
+                "error": "Failed to generate embeddings"
+            }), 500
+
+        fmt = negotiate(request.headers.get("Accept"))
+        if fmt.kind == "binary":
+            return binary_response([embedding_vector], fmt.dtype)
+        return jsonify(embedding_fields(embedding_vector, fmt)), 200
+
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@bp.route('/embeddings/batch', methods=['POST'])
+def embeddings_batch():
+    '''
+    {
+        texts: ["text 1", "text 2", ...]
+    }
+    '''
+    try:
+        data = request.get_json()
+        texts = data.get("texts") if isinstance(data, dict) else None
+        if not isinstance(texts, list) or not texts:
+            return jsonify({
+                "error": "texts must be a non-empty list of strings",
+                "status": "error"
+            }), 400
+        if len(texts) > EMBED_MAX_TEXTS:
+            return jsonify({
+                "error": f"At most {EMBED_MAX_TEXTS} texts can be embedded per request",
+                "status": "error"
+            }), 413
+
+        embeddings, errors = make_embeddings_many(texts)
+        if len(errors) == len(texts):
+            return jsonify({
+                "error": "Failed to generate embeddings",
+                "errors": errors,
+                "status": "error"
+            }), 500
+
+        status = "partial" if errors else "success"
+        fmt = negotiate(request.headers.get("Accept"))
+        if fmt.kind == "binary":
+            # Failed rows are NaN; their indices are listed in X-Embedding-Errors
+            failed = ",".join(str(error["index"]) for error in errors)
+            return binary_response(embeddings, fmt.dtype, {"X-Embedding-Errors": failed})
+        if fmt.kind == "base64":
+            dim = next((len(vector) for vector in embeddings if vector is not None), 0)
+            return jsonify({
+                "embeddings": [encode_vector(vector, fmt.dtype) for vector in embeddings],
+                "encoding": "base64",
+                "dtype": fmt.dtype,
+                "dim": dim,
+                "errors": errors,
+                "status": status
+            }), 200
+
+        return jsonify({
+            "embeddings": embeddings,
+            "errors": errors,
+            "status": status
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "status": "error"
+        }), 500
+
+@bp.route('/cache/stats')
+def cache_stats():
+    return jsonify({
+        "embeddings": embedding_cache.stats(),
+        "products": product_cache.stats(),
+        "contexts": context_cache.stats(),
+        "requests": request_coalescer.stats(),
+        "search": search_cache.stats(),
+        "titles": title_vectors.stats()
+    }), 200
+
+@bp.route('/upstreams/stats')
+def upstream_stats():
+    return jsonify({
+        upstream.name: upstream.stats()
+        for upstream in (asi_upstream, gemini_upstream, serp_upstream)
+    }), 200
+
+@bp.route('/search_test', methods=['POST'])
+def search_test():
+    return Response(_search_test_body(), mimetype="application/json")
+
+@functools.lru_cache(maxsize=1)
+def _search_test_body():
+    """The /search_test fixture, read on first use and served as-is from then on"""
+    with open(SEARCH_TEST_FIXTURE, "rb") as f:
+        return f.read()
+
+@bp.route('/search', methods=['POST'])
+def search():
+    '''
+    {
+        search: "search term",
+        context: [top K context chunk string],
+        user_id: "optional, adds the user's most similar stored contexts",
+        stream: "optional, true for a text/event-stream response"
+    }
+    '''
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get("search", ""), str):
+        return jsonify({
+            "error": "search must be a string",
+            "status": "error"
+        }), 400
+    num_best =10
+    degraded = []
+    if data.get("stream") or request.accept_mimetypes.best == "text/event-stream":
+        return Response(
+            stream_with_context(_streamed_search(data, num_best, degraded)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    # The SerpAPI fetch doesn't wait for the cache lookup's query embedding
+    products_future = start_products(data)
+    cache_key = search_cache_key(data)
+    cached = search_cache.get(*cache_key) if cache_key else None
+    if cached:
+        products_future.cancel()
+        return jsonify(cached["result"]), 200
+
+    if SEARCH_RANKER == "local":
+        return _ranked_search(data, num_best, degraded, cache_key, products_future)
+
+    prepared = prepare_search(data, num_best, degraded, products_future)
+    if prepared is None:
+        return jsonify({
+            "error": "Product search failed",
+            "status": "error"
+        }), 503
+    system, prompt, products = prepared
+
+    chat_future = search_executor.submit(chat, prompt, system, 'asi1-mini', search_response_template)
+    response = stage_result(chat_future, SEARCH_CHAT_TIMEOUT, "chat", degraded, None)
+    if response is None:
+        return jsonify(fallback_search_result(products, num_best, degraded)), 200
+
+    try:
+        with span("parse_search_response"):
+            res_dict = search_output.parse(response)
+        result = {
+            "products": products.select(res_dict['index'], limit=num_best),
+            "ai_message": res_dict['ai_message']
+        }
+        if degraded:
+            result["degraded"] = degraded
+        remember_search(cache_key, result, products)
+        return jsonify(result), 200
+    except ResponseDecodeError as e:
+        return jsonify({**decode_failure(e), "response": response}), 500
+
+def _ranked_search(data, num_best, degraded, cache_key=None, products_future=None):
+    """Non-streaming /search with the local ranker; the model only writes ai_message"""
+    prepared = prepare_ranked_search(data, num_best, degraded, products_future)
+    if prepared is None:
+        return jsonify({
+            "error": "Product search failed",
+            "status": "error"
+        }), 503
+    chosen, prompt, products = prepared
+
+    response = None
+    if prompt:
+        chat_future = search_executor.submit(chat, prompt, SEARCH_MESSAGE_SYSTEM_PROMPT, 'asi1-mini', search_message_format)
+        response = stage_result(chat_future, SEARCH_CHAT_TIMEOUT, "chat", degraded, None)
+    result = ranked_search_result(chosen, ranked_message(response, degraded), degraded)
+    remember_search(cache_key, result, products)
+    return jsonify(result), 200
+
+def _streamed_search(data, num_best, degraded):
+    """Body of a streaming /search; the cache lookup runs after a first comment line has gone out"""
+    # SSE comment, ignored by clients; sends the headers before any stage can take time
+    yield ": searching\n\n"
+    products_future = start_products(data)
+    cache_key = search_cache_key(data)
+    cached = search_cache.get(*cache_key) if cache_key else None
+    if cached:
+        products_future.cancel()
+        yield from _cached_search_events(cached)
+    else:
+        yield from _search_events(data, num_best, degraded, cache_key, products_future)
+
+def _search_events(data, num_best, degraded, cache_key=None, products_future=None):
+    """
+    Server-sent events for a streaming /search.
+
+    Events, in order: "products" (the SerpAPI results), zero or more "token"
+    ({"text"} pieces of ai_message as the model writes it), then "result"
+    (the same body as a non-streaming response) or "error", then "done".
+    """
+    if SEARCH_RANKER == "local":
+        yield from _ranked_search_events(data, num_best, degraded, cache_key, products_future)
+        return
+
+    prepared = prepare_search(data, num_best, degraded, products_future)
+    if prepared is None:
+        yield _sse("error", {"error": "Product search failed", "status": "error"})
+        yield _sse("done", {})
+        return
+    system, prompt, products = prepared
+    yield _sse("products", {"products": products.ranked()})
+
+    message = JsonStringFieldStream("ai_message")
+    response = ""
+    try:
+        for piece in chat_stream(prompt, system, 'asi1-mini', search_response_template):
+            response += piece
+            text = message.feed(piece)
+            if text:
+                yield _sse("token", {"text": text})
+    except Exception as e:
+        logger.warning("Search stage 'chat' failed: %r", e)
+        if not response:
+            degraded.append("chat")
+            yield _sse("result", fallback_search_result(products, num_best, degraded))
+            yield _sse("done", {})
+            return
+        yield _sse("error", {"error": "API request failed", "details": str(e), "status": "error"})
+        yield _sse("done", {})
+        return
+
+    try:
+        with span("parse_search_response"):
+            res_dict = search_output.parse(response)
+        result = {
+            "products": products.select(res_dict['index'], limit=num_best),
+            "ai_message": res_dict['ai_message']
+        }
+        if degraded:
+            result["degraded"] = degraded
+        remember_search(cache_key, result, products)
+        yield _sse("result", result)
+    except ResponseDecodeError as e:
+        yield _sse("error", {**decode_failure(e), "response": response})
+    yield _sse("done", {})
+
+def _ranked_search_events(data, num_best, degraded, cache_key=None, products_future=None):
+    """_search_events for the local ranker; a failed ai_message only costs the message"""
+    prepared = prepare_ranked_search(data, num_best, degraded, products_future)
+    if prepared is None:
+        yield _sse("error", {"error": "Product search failed", "status": "error"})
+        yield _sse("done", {})
+        return
+    chosen, prompt, products = prepared
+    yield _sse("products", {"products": products.ranked()})
+
+    response = None
+    if prompt:
+        message = JsonStringFieldStream("ai_message")
+        response = ""
+        try:
+            for piece in chat_stream(prompt, SEARCH_MESSAGE_SYSTEM_PROMPT, 'asi1-mini', search_message_format):
+                response += piece
+                text = message.feed(piece)
+                if text:
+                    yield _sse("token", {"text": text})
+        except Exception as e:
+            logger.warning("Search stage 'chat' failed: %r", e)
+            degraded.append("chat")
+            response = None
+    result = ranked_search_result(chosen, ranked_message(response, degraded), degraded)
+    remember_search(cache_key, result, products)
+    yield _sse("result", result)
+    yield _sse("done", {})
+
+def _cached_search_events(cached):
+    """_search_events for a search_cache hit; the message arrives as a single token"""
+    yield _sse("products", {"products": cached["products"]})
+    yield _sse("token", {"text": cached["result"]["ai_message"]})
+    yield _sse("result", cached["result"])
+    yield _sse("done", {})
+
+def _sse(event, payload):
+    # orjson writes no raw newlines, so the payload stays one data: line
+    return f"event: {event}\ndata: {dumps(payload).decode('utf-8')}\n\n"
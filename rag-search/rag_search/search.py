@@ -0,0 +1,294 @@
+"""
+The /search pipeline: retrieving the user's contexts, fetching and ranking
+products, building the prompts and caching finished answers.
+"""
+import os
+
+from . import product_ranker
+from .observability import register_stats, timed
+from .product_ranker import TitleVectorCache
+from .prompt_budget import (estimate_tokens, pack_texts, rank_by_similarity, render_contexts,
+                            render_product_table, unique_texts)
+from .request_cache import content_key
+from .structured_output import ResponseDecodeError
+from .settings import (SEARCH_AI_MESSAGE, SEARCH_CACHE_TTL, SEARCH_CONTEXT_TOKENS, SEARCH_DUPLICATE_THRESHOLD,
+                       SEARCH_PRODUCTS_TIMEOUT, SEARCH_PRODUCT_TOKENS, SEARCH_PROFILE_CLUSTERS, SEARCH_RANK_WEIGHTS,
+                       SEARCH_RETRIEVE_K, SEARCH_RETRIEVE_TIMEOUT, SEARCH_TITLE_TIMEOUT, logger)
+from .services import search_cache, search_executor, user_profiles, vector_index
+from .prompts import RANKED_SEARCH_MESSAGE, SEARCH_SYSTEM_PROMPT, search_message_output
+from .products import get_products_details, normalize_query
+from .embeddings import make_embeddings, make_embeddings_many
+
+# Products already seen skip the embedding call
+title_vectors = TitleVectorCache(
+    make_embeddings_many,
+    maxsize=int(os.getenv('TITLE_VECTOR_CACHE_SIZE', 20000))
+)
+
+register_stats("cache", "cache", "titles", title_vectors.stats)
+
+def retrieve(user_id, query, k=5):
+    """
+    Find a user's stored contexts most similar to a query.
+
+    Args:
+        user_id (str): Owner of the contexts, as sent to /clean
+        query (str): Search text to embed and compare against
+        k (int): Maximum number of records to return
+
+    Returns:
+        list: records ({"context", "cleaned", "score"}), best first
+    """
+    if not user_id or not vector_index.size(user_id):
+        return []
+    query_vector = make_embeddings(query)
+    if not query_vector:
+        return []
+    return [dict(record, score=score) for score, record in vector_index.search(user_id, query_vector, k)]
+
+@timed("rank_contexts")
+def rank_contexts(user_id, query, supplied, k, interests=False):
+    """
+    Candidate context chunks for a /search prompt, most relevant first.
+
+    The supplied chunks, the user's k most similar stored contexts and, with
+    interests, the summaries of their strongest interest clusters are
+    de-duplicated, then ordered by embedding similarity to the query with
+    near-duplicates (SEARCH_DUPLICATE_THRESHOLD) dropped. Embeddings come
+    from embedding_cache where possible.
+
+    Args:
+        interests (bool): Add the interest summaries; only for rankers that
+            don't already score products against the profile
+
+    Returns:
+        list: context strings
+    """
+    stored = [record["context"] for record in retrieve(user_id, query, k)]
+    summaries = []
+    if interests:
+        summaries = [interest["summary"] for interest in user_profiles.interests(user_id, SEARCH_PROFILE_CLUSTERS)]
+    candidates = unique_texts(list(supplied) + stored + summaries)
+    if not candidates or not isinstance(query, str) or not query.strip():
+        return candidates
+    embeddings, _ = make_embeddings_many([query] + candidates)
+    if not embeddings[0]:
+        return candidates
+    ranked = rank_by_similarity(candidates, embeddings[1:], embeddings[0], SEARCH_DUPLICATE_THRESHOLD)
+    return [text for _, text in ranked]
+
+def build_search_prompt(context_block, num_best, product_table):
+    return """
+Here are the context vectors:
+{}
+
+Give me the top {} entries (Yes strictly give me this many indexes if u have more records than this) that best match [search query] and product details as per the response structure. Along with an AI message on why this is the best match from the past contexts. If the search query is very very wierd and not matching any of the context or product details, return Search didn't exactly match the queries here are similar products.
+
+Here is the required product details (one product per row, columns separated by |):
+{}
+""".format(context_block, num_best, product_table)
+
+def start_products(data):
+    """
+    Start the SerpAPI fetch for a /search, so it runs while search_cache is consulted.
+
+    Returns:
+        Future: of the ProductResults; pass it on to prepare_search or prepare_ranked_search
+    """
+    return search_executor.submit(get_products_details, data.get("search", ""), 48)
+
+def _search_inputs(data, degraded, interests=False, products_future=None):
+    """
+    Fetch products and rank contexts for a /search.
+
+    The two don't depend on each other, so they run concurrently. interests
+    is passed on to rank_contexts; products_future is a fetch already begun
+    by start_products.
+
+    Returns:
+        tuple: (query, contexts, ProductResults), or None if the product fetch failed
+    """
+    supplied = data.get("context") or []
+    query = data.get("search", "")
+
+    if products_future is None:
+        products_future = start_products(data)
+    contexts_future = search_executor.submit(
+        rank_contexts, data.get("user_id"), query, supplied, SEARCH_RETRIEVE_K, interests
+    )
+
+    # Partial fallback: without ranking the supplied context is still usable, in its given order
+    contexts = stage_result(contexts_future, SEARCH_RETRIEVE_TIMEOUT, "retrieve", degraded, unique_texts(supplied))
+
+    products = stage_result(products_future, SEARCH_PRODUCTS_TIMEOUT, "products", degraded, None)
+    if products is None:
+        return None
+    return query, contexts, products
+
+def prepare_search(data, num_best, degraded, products_future=None):
+    """
+    Run the /search stages that precede the model call (SEARCH_RANKER=llm).
+
+    The user's interest summaries reach the model as extra contexts, its
+    only view of their profile. Both prompt sections are cut to their token budgets (SEARCH_CONTEXT_TOKENS,
+    SEARCH_PRODUCT_TOKENS); the returned products only cover the rows that
+    made it into the prompt.
+
+    Returns:
+        tuple: (system, prompt, ProductResults), or None if the product fetch failed
+    """
+    inputs = _search_inputs(data, degraded, interests=True, products_future=products_future)
+    if inputs is None:
+        return None
+    query, contexts, products = inputs
+
+    context_block = render_contexts(pack_texts(contexts, SEARCH_CONTEXT_TOKENS))
+    product_table, rows = render_product_table(products.compact, SEARCH_PRODUCT_TOKENS)
+    prompt = build_search_prompt(context_block, num_best, product_table)
+    logger.debug("Search prompt: ~%d tokens, %d products", estimate_tokens(SEARCH_SYSTEM_PROMPT) + estimate_tokens(prompt), rows)
+    return SEARCH_SYSTEM_PROMPT, prompt, products.head(rows)
+
+def _rank_vectors(query, contexts, user_id):
+    """Query and context embeddings and interest clusters for rank_products; returns (vectors, errors, interests)"""
+    vectors, errors = make_embeddings_many([query] + contexts[:SEARCH_RETRIEVE_K])
+    interests = user_profiles.interests(user_id, SEARCH_PROFILE_CLUSTERS, vectors[0])
+    return vectors, errors, interests
+
+@timed("rank_products")
+def rank_products(query, contexts, products, limit, degraded, user_id=None):
+    """
+    Choose the best products locally with product_ranker.
+
+    Query and context embeddings were computed by rank_contexts and come from
+    embedding_cache; titles are embedded in one batch on a title_vectors miss.
+    The user's interest clusters closest to the query add the profile score.
+    The two run concurrently as stages bounded by SEARCH_RETRIEVE_TIMEOUT and
+    SEARCH_TITLE_TIMEOUT, since a cold batch of titles takes longer. If they
+    are unavailable or late, ranking falls back to the lexical and rating
+    scores and "rank_embeddings" or "title_embeddings" is added to degraded;
+    late titles still reach title_vectors when their batch finishes.
+
+    Returns:
+        list: up to limit raw product records, best first
+    """
+    candidates = products.ranked()
+    titles_future = search_executor.submit(title_vectors.get_many, candidates)
+    future = search_executor.submit(_rank_vectors, query, contexts, user_id)
+    embedded = stage_result(future, SEARCH_RETRIEVE_TIMEOUT, "rank_embeddings", degraded, None)
+    if embedded is None:
+        vectors, interests = [None], []
+    else:
+        vectors, errors, interests = embedded
+        if errors:
+            degraded.append("rank_embeddings")
+    vectors_by_title = stage_result(titles_future, SEARCH_TITLE_TIMEOUT, "title_embeddings", degraded, None)
+    if vectors_by_title is None:
+        vectors_by_title = [None] * len(candidates)
+    elif any(vector is None for vector in vectors_by_title):
+        degraded.append("title_embeddings")
+    ranked = product_ranker.rank(
+        query, candidates, vectors_by_title,
+        query_vector=vectors[0],
+        context_vectors=vectors[1:],
+        weights=SEARCH_RANK_WEIGHTS,
+        interests=interests
+    )
+    return [product for _, product in ranked[:limit]]
+
+def build_message_prompt(query, context_block, product_table):
+    return """
+Here are the user's context entries:
+{}
+
+Search query: {}
+
+Chosen products (one per row, columns separated by |):
+{}
+""".format(context_block, query, product_table)
+
+def prepare_ranked_search(data, num_best, degraded, products_future=None):
+    """
+    Run the /search stages for SEARCH_RANKER=local.
+
+    The user's profile only counts through product_ranker's profile score;
+    their interest summaries are not added to the contexts as well.
+
+    Returns:
+        tuple: (chosen products, ai_message prompt or None, ProductResults), or None if the product fetch failed
+    """
+    inputs = _search_inputs(data, degraded, products_future=products_future)
+    if inputs is None:
+        return None
+    query, contexts, products = inputs
+    chosen = rank_products(query, contexts, products, num_best, degraded, data.get("user_id"))
+    if not SEARCH_AI_MESSAGE:
+        return chosen, None, products
+    context_block = render_contexts(pack_texts(contexts, SEARCH_CONTEXT_TOKENS))
+    product_table, _ = render_product_table(chosen, SEARCH_PRODUCT_TOKENS)
+    return chosen, build_message_prompt(query, context_block, product_table), products
+
+def ranked_message(response, degraded):
+    """ai_message from the model's reply, or RANKED_SEARCH_MESSAGE if there is none"""
+    if response is None:
+        return RANKED_SEARCH_MESSAGE
+    try:
+        return search_message_output.parse(response)["ai_message"]
+    except ResponseDecodeError as e:
+        logger.warning("Unusable ai_message reply: %s", e)
+        degraded.append("message")
+        return RANKED_SEARCH_MESSAGE
+
+def ranked_search_result(chosen, message, degraded):
+    result = {"products": chosen, "ai_message": message}
+    if degraded:
+        result["degraded"] = degraded
+    return result
+
+def search_cache_key(data):
+    """
+    Where a /search answer is kept in search_cache.
+
+    Returns:
+        tuple: (scope, normalized query, query embedding), or None when caching
+        is off or the query can't be embedded within SEARCH_RETRIEVE_TIMEOUT.
+        The scope covers the user_id and the set of supplied contexts, in any order.
+    """
+    query = data.get("search")
+    if SEARCH_CACHE_TTL <= 0 or not isinstance(query, str) or not query.strip():
+        return None
+    # A slow embedding only costs the cache lookup; it still lands in embedding_cache for rank_contexts
+    future = search_executor.submit(make_embeddings, query)
+    try:
+        query_vector = future.result(timeout=SEARCH_RETRIEVE_TIMEOUT)
+    except Exception as e:
+        logger.warning("Search cache lookup skipped: %r", e)
+        return None
+    if not query_vector:
+        return None
+    scope = content_key("search", {
+        "user_id": data.get("user_id") or "",
+        "context": sorted(text.lower() for text in unique_texts(data.get("context") or []))
+    })
+    return scope, normalize_query(query), query_vector
+
+def remember_search(cache_key, result, products):
+    """Keep a complete answer (no degraded stages) for later similar searches"""
+    if cache_key is not None and not result.get("degraded"):
+        search_cache.set(*cache_key, {"result": result, "products": products.ranked()})
+
+def fallback_search_result(products, num_best, degraded):
+    """The top products by marketplace rank, for when the model's selection is unavailable"""
+    return {
+        "products": products.ranked(num_best),
+        "ai_message": "Search didn't exactly match the queries here are similar products.",
+        "degraded": degraded
+    }
+
+def stage_result(future, timeout, stage, degraded, fallback):
+    """Wait for one /search stage; on error or timeout record it in degraded and return fallback"""
+    try:
+        return future.result(timeout=timeout)
+    except Exception as e:
+        logger.warning("Search stage '%s' failed: %r", stage, e)
+        degraded.append(stage)
+        return fallback
@@ -0,0 +1,116 @@
+"""
+Semantic cache for finished /search answers.
+
+Entries live in scopes (a user plus a fingerprint of the contexts they
+sent), so an answer is only reused for the same person with the same
+context. Within a scope a lookup is a hit when the normalized query text
+matches exactly, and a near hit when the cosine similarity of the query
+embeddings reaches the threshold ("jet plane toy" vs "toy jet airplane").
+Entries expire after ttl seconds; the least recently used entry is evicted
+once maxsize is reached.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .vector_index import normalize
+
+
+class _Entry:
+    __slots__ = ("scope", "text", "vector", "value", "expires")
+
+    def __init__(self, scope, text, vector, value, expires):
+        self.scope = scope
+        self.text = text
+        self.vector = vector
+        self.value = value
+        self.expires = expires
+
+
+class SemanticCache:
+    """
+    Args:
+        threshold (float): Minimum query cosine similarity for a near hit; 1 or more disables near hits
+        ttl (float): Seconds an answer stays usable
+        maxsize (int): Entries kept across all scopes
+    """
+
+    def __init__(self, threshold=0.92, ttl=900, maxsize=2048):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._scopes = {}  # scope -> {id: _Entry}
+        self._ids = itertools.count()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _drop(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        scoped = self._scopes[entry.scope]
+        del scoped[entry_id]
+        if not scoped:
+            del self._scopes[entry.scope]
+
+    def get(self, scope, text, vector):
+        """
+        The cached value for the closest query in scope, or None.
+
+        Args:
+            scope (str): User and context fingerprint
+            text (str): Normalized query text
+            vector (list): Query embedding
+        """
+        now = time.monotonic()
+        with self._lock:
+            scoped = self._scopes.get(scope, {})
+            for entry_id in [i for i, entry in scoped.items() if entry.expires <= now]:
+                self._drop(entry_id)
+            scoped = self._scopes.get(scope, {})
+
+            match = next((i for i, entry in scoped.items() if entry.text == text), None)
+            if match is not None:
+                self.hits += 1
+            elif scoped and self.threshold < 1:
+                ids = list(scoped)
+                scores = np.stack([scoped[i].vector for i in ids]) @ normalize(vector)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    match = ids[best]
+                    self.near_hits += 1
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            return self._entries[match].value
+
+    def set(self, scope, text, vector, value):
+        """Store value for a query, replacing an earlier entry for the same text in scope"""
+        entry = _Entry(scope, text, normalize(vector), value, time.monotonic() + self.ttl)
+        with self._lock:
+            scoped = self._scopes.setdefault(scope, {})
+            for entry_id in [i for i, old in scoped.items() if old.text == text]:
+                self._drop(entry_id)
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._scopes.setdefault(scope, {})[entry_id] = entry
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "near_hit_ratio": self.near_hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
@@ -0,0 +1,130 @@
+"""
+Process-wide caches, stores, the job queue and upstream limiters.
+
+One instance of each per process, shared by every request thread. Their
+stats are published under /metrics. The job queue opens its SQLite file
+on first use (get_job_queue), so importing the app writes nothing.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .embedding_cache import EmbeddingCache
+from .job_queue import JobQueue
+from .observability import register_stats
+from .rate_limit import Upstream
+from .request_cache import Coalescer, SWRCache, TTLMemo
+from .semantic_cache import SemanticCache
+from .user_profile import UserProfiles
+from .vector_index import VectorIndex
+from .vector_store import VectorStore
+from .settings import JOBS_DB, SEARCH_CACHE_TTL, UPSTREAM_MAX_ATTEMPTS, UPSTREAM_MAX_DELAY
+
+embedding_cache = EmbeddingCache(
+    maxsize=int(os.getenv('EMBED_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('EMBED_CACHE_TTL', 86400)),
+    db_path=os.getenv('EMBED_CACHE_DB') or None,
+    disk_ttl=float(os.getenv('EMBED_CACHE_DB_TTL', 0))
+)
+
+if os.getenv('VECTOR_STORE_DIR'):
+    vector_index = VectorStore(
+        os.getenv('VECTOR_STORE_DIR'),
+        dtype=os.getenv('VECTOR_STORE_DTYPE', 'float32'),
+        dims=int(os.getenv('VECTOR_STORE_DIMS', 0))
+    )
+else:
+    vector_index = VectorIndex(backend=os.getenv('VECTOR_INDEX_BACKEND', 'exact'))
+
+# Per-user interest clusters, updated as /clean indexes contexts; PROFILE_CLUSTERS=0 turns them off
+user_profiles = UserProfiles(
+    k=int(os.getenv('PROFILE_CLUSTERS', 8)),
+    half_life=float(os.getenv('PROFILE_HALF_LIFE', 14 * 86400)),
+    threshold=float(os.getenv('PROFILE_THRESHOLD', 0.75)),
+    maxsize=int(os.getenv('PROFILE_CACHE_SIZE', 10000)),
+    flush_interval=float(os.getenv('PROFILE_FLUSH_INTERVAL', 5)),
+    directory=os.getenv('PROFILE_DIR') or (
+        os.path.join(os.getenv('VECTOR_STORE_DIR'), "profiles") if os.getenv('VECTOR_STORE_DIR') else None
+    )
+)
+
+context_cache = TTLMemo(
+    maxsize=int(os.getenv('CONTEXT_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('CONTEXT_CACHE_TTL', 86400))
+)
+
+# Identical /clean and /embedding bodies in flight share one execution, and a
+# successful result is reused for COALESCE_WINDOW seconds afterwards
+request_coalescer = Coalescer(
+    window=float(os.getenv('COALESCE_WINDOW', 2)),
+    maxsize=int(os.getenv('COALESCE_SIZE', 4096))
+)
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """
+    Return the durable queue behind /jobs/clean, opening JOBS_DB on first use;
+    JOBS_WORKERS threads per process drain it in JOBS_BATCH_SIZE batches.
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                os.makedirs(os.path.dirname(os.path.abspath(JOBS_DB)), exist_ok=True)
+                _job_queue = JobQueue(
+                    JOBS_DB,
+                    max_attempts=int(os.getenv('JOBS_MAX_ATTEMPTS', 3)),
+                    retention=float(os.getenv('JOBS_RETENTION', 86400))
+                )
+    return _job_queue
+
+search_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SEARCH_STAGE_WORKERS', 32)))
+
+search_cache = SemanticCache(
+    threshold=float(os.getenv('SEARCH_CACHE_THRESHOLD', 0.92)),
+    ttl=SEARCH_CACHE_TTL,
+    maxsize=int(os.getenv('SEARCH_CACHE_SIZE', 2048))
+)
+
+product_cache = SWRCache(
+    ttl=float(os.getenv('SERP_CACHE_TTL', 600)),
+    stale_ttl=float(os.getenv('SERP_CACHE_STALE_TTL', 3600)),
+    maxsize=int(os.getenv('SERP_CACHE_SIZE', 1024))
+)
+
+asi_upstream = Upstream(
+    "asi_chat",
+    rate=float(os.getenv('ASI_RATE_LIMIT', 5)),
+    burst=int(os.getenv('ASI_BURST', 10)),
+    max_concurrency=int(os.getenv('ASI_MAX_CONCURRENCY', 16)),
+    max_attempts=UPSTREAM_MAX_ATTEMPTS,
+    max_delay=UPSTREAM_MAX_DELAY
+)
+gemini_upstream = Upstream(
+    "gemini_embed",
+    rate=float(os.getenv('GEMINI_RATE_LIMIT', 10)),
+    burst=int(os.getenv('GEMINI_BURST', 20)),
+    max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', 8)),
+    max_attempts=UPSTREAM_MAX_ATTEMPTS,
+    max_delay=UPSTREAM_MAX_DELAY
+)
+serp_upstream = Upstream(
+    "serpapi",
+    rate=float(os.getenv('SERP_RATE_LIMIT', 2)),
+    burst=int(os.getenv('SERP_BURST', 5)),
+    max_concurrency=int(os.getenv('SERP_MAX_CONCURRENCY', 4)),
+    max_attempts=UPSTREAM_MAX_ATTEMPTS,
+    max_delay=UPSTREAM_MAX_DELAY
+)
+
+register_stats("cache", "cache", "embeddings", embedding_cache.stats)
+register_stats("cache", "cache", "products", product_cache.stats)
+register_stats("cache", "cache", "contexts", context_cache.stats)
+register_stats("cache", "cache", "requests", request_coalescer.stats)
+register_stats("cache", "cache", "search", search_cache.stats)
+register_stats("jobs", "queue", "clean", lambda: get_job_queue().stats())
+register_stats("profiles", "store", "users", user_profiles.stats)
+for upstream in (asi_upstream, gemini_upstream, serp_upstream):
+    register_stats("upstream", "upstream", upstream.name, upstream.stats)
@@ -0,0 +1,92 @@
+"""
+Configuration read from the environment (and .env), plus the shared loggers.
+
+Everything here is a plain constant; the objects built from them live in
+services.
+"""
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from .observability import sampled_logger
+
+load_dotenv()
+
+# Bodies above this are rejected with 413 before they are read
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 4 * 1024 * 1024))
+
+# INFO by default; at DEBUG, large payloads (prompts, model responses) are logged for LOG_PAYLOAD_SAMPLE of calls.
+# create_app configures the root logger with these, unless the host process already has
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+logger = logging.getLogger("rag_search")
+payload_logger = sampled_logger("rag_search.payloads", float(os.getenv('LOG_PAYLOAD_SAMPLE', 0.01)))
+
+API_KEY=os.getenv('GOOGLE_API_KEY')
+ASI_KEY=os.getenv('AGENTVERSE_API_KEY')
+SERP_API=os.getenv('GOOGLE_SERP_API')
+
+ASI_CHAT_URL = os.getenv('ASI_CHAT_URL', "https://api.asi1.ai/v1/chat/completions")
+# Point the SerpAPI client elsewhere, e.g. at the benchmark's fake upstreams
+SERPAPI_URL = os.getenv('SERPAPI_URL')
+
+# Sample SerpAPI organic_results served by /search_test
+SEARCH_TEST_FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "search_test.json")
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBED_BATCH_LIMIT = int(os.getenv('EMBED_BATCH_LIMIT', 100))  # batchEmbedContents accepts at most 100 items
+EMBED_MAX_WORKERS = int(os.getenv('EMBED_MAX_WORKERS', 4))
+EMBED_MAX_TEXTS = int(os.getenv('EMBED_MAX_TEXTS', 2000))
+
+SEARCH_RETRIEVE_K = int(os.getenv('SEARCH_RETRIEVE_K', 10))
+# Interest clusters from the user's profile added to the /search contexts and ranking
+SEARCH_PROFILE_CLUSTERS = int(os.getenv('SEARCH_PROFILE_CLUSTERS', 3))
+
+# Estimated-token budgets for the /search prompt's context and product sections
+SEARCH_CONTEXT_TOKENS = int(os.getenv('SEARCH_CONTEXT_TOKENS', 1500))
+SEARCH_PRODUCT_TOKENS = int(os.getenv('SEARCH_PRODUCT_TOKENS', 1500))
+SEARCH_DUPLICATE_THRESHOLD = float(os.getenv('SEARCH_DUPLICATE_THRESHOLD', 0.95))
+
+# "local" ranks products in-process and asks the model only for ai_message; "llm" has the model pick them
+SEARCH_RANKER = os.getenv('SEARCH_RANKER', 'local')
+SEARCH_AI_MESSAGE = os.getenv('SEARCH_AI_MESSAGE', 'true').lower() in ('1', 'true', 'yes')
+SEARCH_RANK_WEIGHTS = {
+    "context": float(os.getenv('RANK_WEIGHT_CONTEXT', 0.4)),
+    "profile": float(os.getenv('RANK_WEIGHT_PROFILE', 0.2)),
+    "query": float(os.getenv('RANK_WEIGHT_QUERY', 0.25)),
+    "lexical": float(os.getenv('RANK_WEIGHT_LEXICAL', 0.2)),
+    "prior": float(os.getenv('RANK_WEIGHT_PRIOR', 0.15))
+}
+
+# Rule-based URL/metadata cleaning; the model then only writes the summary
+PRECLEAN_ENABLED = os.getenv('PRECLEAN', 'true').lower() in ('1', 'true', 'yes')
+PRECLEAN_METADATA_CHARS = int(os.getenv('PRECLEAN_METADATA_CHARS', 500))
+
+CLEAN_BATCH_PACK = int(os.getenv('CLEAN_BATCH_PACK', 8))
+CLEAN_BATCH_CONCURRENCY = int(os.getenv('CLEAN_BATCH_CONCURRENCY', 4))
+CLEAN_BATCH_MAX_RECORDS = int(os.getenv('CLEAN_BATCH_MAX_RECORDS', 1000))
+
+# Where the app keeps the files it writes (e.g. the job queue) unless a path is set for them;
+# defaults to data/ next to the package rather than the working directory
+DATA_DIR = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+JOBS_DB = os.getenv('JOBS_DB') or os.path.join(DATA_DIR, "jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+# Comma-separated URL prefixes webhooks must start with; empty refuses all webhooks
+JOBS_WEBHOOK_PREFIXES = [prefix for prefix in os.getenv('JOBS_WEBHOOK_PREFIXES', '').split(',') if prefix]
+
+SEARCH_RETRIEVE_TIMEOUT = float(os.getenv('SEARCH_RETRIEVE_TIMEOUT', 3))
+# A cold batch of product titles takes longer to embed than a query and a few contexts
+SEARCH_TITLE_TIMEOUT = float(os.getenv('SEARCH_TITLE_TIMEOUT', 8))
+SEARCH_PRODUCTS_TIMEOUT = float(os.getenv('SEARCH_PRODUCTS_TIMEOUT', 20))
+SEARCH_CHAT_TIMEOUT = float(os.getenv('SEARCH_CHAT_TIMEOUT', 35))
+
+# Finished /search answers, reused for the same user and context when the query is close enough
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', 900))
+
+# Client-side pacing, concurrency caps and retries, one per upstream (rates are requests/second)
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv('UPSTREAM_MAX_ATTEMPTS', 4))
+UPSTREAM_MAX_DELAY = float(os.getenv('UPSTREAM_MAX_DELAY', 30))
+
+WARM_CLIENTS = os.getenv('WARM_CLIENTS', '').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,109 @@
+"""
+Helpers for consuming streamed model output.
+"""
+import json
+import re
+
+
+def iter_sse_data(lines):
+    """
+    Yield the data payload of each server-sent event from an iterable of lines.
+
+    Multi-line data fields are joined with newlines, per the SSE spec.
+    """
+    data = []
+    for line in lines:
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+    if data:
+        yield "\n".join(data)
+
+
+HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+
+
+def _decode_escape(escape):
+    """
+    Decode a JSON escape sequence.
+
+    Returns:
+        tuple: (text, characters of escape consumed), or None if it isn't a valid escape
+    """
+    try:
+        return json.loads('"' + escape + '"'), len(escape)
+    except ValueError:
+        if len(escape) == 12:
+            # A high surrogate followed by something that isn't a valid escape: decode the first half alone
+            return _decode_escape(escape[:6])
+        return None
+
+
+class JsonStringFieldStream:
+    """
+    Incrementally extract one top-level string field from JSON arriving in pieces.
+
+    feed() returns the newly decoded part of the field's value, so a caller can
+    forward it before the rest of the document (or the closing quote) arrives.
+    Escape sequences split across pieces are held back until complete;
+    malformed ones are passed through as text rather than raising.
+    """
+
+    def __init__(self, field):
+        self._start = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._text = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, piece):
+        self._text += piece
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self._text)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        text = self._text
+        pos = self._pos
+        while pos < len(text):
+            ch = text[pos]
+            if ch == "\\":
+                if pos + 1 >= len(text):
+                    break
+                length = 6 if text[pos + 1] == "u" else 2
+                if pos + length > len(text):
+                    break
+                if length == 6 and HIGH_SURROGATE.match(text, pos):
+                    # High surrogate: decode together with the low half if another \u escape follows
+                    if pos + 8 > len(text):
+                        break
+                    if text.startswith("\\u", pos + 6):
+                        length = 12
+                        if pos + length > len(text):
+                            break
+                decoded = _decode_escape(text[pos:pos + length])
+                if decoded is None:
+                    # Malformed escape (e.g. \uZZZZ): keep the backslash as text and go on
+                    out.append(ch)
+                    pos += 1
+                    continue
+                out.append(decoded[0])
+                pos += decoded[1]
+            elif ch == '"':
+                self.done = True
+                pos += 1
+                break
+            else:
+                out.append(ch)
+                pos += 1
+        self._pos = pos
+        return "".join(out)
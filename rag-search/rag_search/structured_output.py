@@ -0,0 +1,250 @@
+"""
+Decoding of structured model output.
+
+Each response_format the app sends is compiled once into a pydantic model
+(ResponseSchema), and replies are parsed with orjson and validated against
+it. Output that isn't clean JSON is repaired locally rather than re-asked:
+
+    ```json fences, prose before or after the document, trailing commas,
+    raw newlines inside strings, Python-style dicts ('single quotes', None)
+
+Anything still unreadable raises ResponseDecodeError, whose reason tells
+malformed JSON ("json") from a document of the wrong shape ("schema").
+"""
+import ast
+import json
+import re
+import threading
+from typing import Any, List, Optional, Union
+
+import orjson
+from pydantic import ConfigDict, ValidationError, create_model
+
+FENCE = re.compile(r"```[\w-]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+
+
+class ResponseDecodeError(ValueError):
+    """
+    Model output that couldn't be decoded or didn't match its schema.
+
+    Attributes:
+        reason (str): "json" for unparseable output, "schema" for a wrong structure
+        response (str): The raw model output
+    """
+
+    def __init__(self, message, reason, response):
+        super().__init__(message)
+        self.reason = reason
+        self.response = response
+
+
+def _scan(text):
+    """
+    Find the first JSON object or array in text.
+
+    Returns:
+        str: The document with commas before a closing bracket removed, or None
+        if text has no opening bracket. An unclosed document runs to the end of text.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    depth = 0
+    in_string = escaped = False
+    dangling = None
+    drop = []
+    end = len(text)
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            if dangling is not None:
+                drop.append(dangling)
+            depth -= 1
+            if depth == 0:
+                end = i + 1
+                break
+        elif char == ",":
+            dangling = i
+            continue
+        if not char.isspace():
+            dangling = None
+    pieces = []
+    for cut in drop:
+        pieces.append(text[start:cut])
+        start = cut + 1
+    pieces.append(text[start:end])
+    return "".join(pieces)
+
+
+def _python_literal(text):
+    """Parse a Python dict/list literal, as models sometimes write; never evaluates code"""
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return value if isinstance(value, (dict, list)) else None
+
+
+def loads(text):
+    """
+    Parse model output as JSON, repairing common damage.
+
+    Returns:
+        tuple: (value, repaired) - repaired is True when the raw text wasn't valid JSON
+
+    Raises:
+        ResponseDecodeError: no JSON document could be recovered
+    """
+    if not isinstance(text, (str, bytes)):
+        raise ResponseDecodeError(f"Expected text, got {type(text).__name__}", "json", text)
+    try:
+        return orjson.loads(text), False
+    except orjson.JSONDecodeError as e:
+        error = e
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+
+    fenced = FENCE.search(text)
+    document = _scan(fenced.group(1) if fenced else text)
+    if document is None:
+        raise ResponseDecodeError(f"No JSON document in model output: {error}", "json", text)
+    try:
+        return orjson.loads(document), True
+    except orjson.JSONDecodeError as e:
+        error = e
+    try:
+        # strict=False accepts raw control characters (e.g. newlines) inside strings
+        return json.loads(document, strict=False), True
+    except json.JSONDecodeError:
+        pass
+    value = _python_literal(document)
+    if value is not None:
+        return value, True
+    raise ResponseDecodeError(str(error), "json", text)
+
+
+_SCALARS = {
+    "string": str,
+    "integer": int,
+    # int first so whole numbers (timestamps, positions) keep their type
+    "number": Union[int, float],
+    "boolean": bool,
+}
+
+
+def _annotation(schema, name):
+    """Python type for a JSON schema node; objects become nested models"""
+    types = schema.get("type", "object")
+    types = [types] if isinstance(types, str) else list(types)
+    nullable = "null" in types
+    types = [t for t in types if t != "null"] or ["object"]
+
+    options = []
+    for kind in types:
+        if kind == "object":
+            options.append(_model(schema, name) if schema.get("properties") else dict)
+            # Models write null for objects they can't fill in (e.g. a missing geolocation)
+            nullable = True
+        elif kind == "array":
+            items = schema.get("items")
+            options.append(List[_annotation(items, name + "Item")] if items else list)
+        else:
+            options.append(_SCALARS.get(kind, Any))
+    annotation = options[0] if len(options) == 1 else Union[tuple(options)]
+    return Optional[annotation] if nullable else annotation
+
+
+def _model(schema, name):
+    """pydantic model for an object schema; extra keys are kept, listed ones must be present"""
+    properties = schema.get("properties", {})
+    required = set(schema.get("required", ()))
+    fields = {
+        field: (_annotation(subschema, name + field[:1].upper() + field[1:]), ... if field in required else None)
+        for field, subschema in properties.items()
+    }
+    return create_model(name, __config__=ConfigDict(extra="allow"), **fields)
+
+
+def _class_name(name):
+    return "".join(part[:1].upper() + part[1:] for part in re.split(r"[^0-9A-Za-z]+", name)) or "Response"
+
+
+class ResponseSchema:
+    """
+    A response_format compiled to a pydantic model, plus decode counters.
+
+    Args:
+        response_format (dict): {"type": "json_schema", "json_schema": {"name", "schema"}}
+    """
+
+    def __init__(self, response_format):
+        spec = response_format["json_schema"]
+        self.name = spec.get("name", "response")
+        self.model = _model(spec["schema"], _class_name(self.name))
+        self._lock = threading.Lock()
+        self._counts = {"parsed": 0, "repaired": 0, "invalid_json": 0, "invalid_schema": 0}
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def validate(self, value, response=None):
+        """
+        Check an already-decoded value against the schema.
+
+        Returns:
+            dict: The value with fields coerced to their schema types; keys the model omitted stay omitted
+
+        Raises:
+            ResponseDecodeError: reason "schema"
+        """
+        try:
+            return self.model.model_validate(value).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            raise ResponseDecodeError(
+                f"Response does not match {self.name}: {e.error_count()} error(s), first: "
+                f"{'.'.join(map(str, e.errors()[0]['loc'])) or 'document'} {e.errors()[0]['msg']}",
+                "schema", response if response is not None else value
+            ) from None
+
+    def parse(self, text):
+        """
+        Decode and validate model output.
+
+        Raises:
+            ResponseDecodeError: see the reason attribute
+        """
+        try:
+            value, repaired = loads(text)
+            result = self.validate(value, text)
+        except ResponseDecodeError as e:
+            self._count("invalid_" + e.reason)
+            raise
+        self._count("repaired" if repaired else "parsed")
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def item_schema(response_format, field="results"):
+    """ResponseSchema for the items of an array field, to validate batch results one by one"""
+    spec = response_format["json_schema"]
+    return ResponseSchema({"json_schema": {
+        "name": spec.get("name", "response") + "_item",
+        "schema": spec["schema"]["properties"][field]["items"]
+    }})
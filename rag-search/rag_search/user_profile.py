@@ -0,0 +1,327 @@
+"""
+Incremental per-user interest profiles, built from /clean embeddings.
+
+Each context a user's /clean produces is folded into their profile as it
+is indexed: up to k interest clusters whose centers are running
+centroids, updated online k-means style (the nearest cluster moves
+towards the new vector by 1 / (its weight + 1)). All weights decay
+with a half-life, so recent browsing outweighs old browsing, and a
+cluster whose weight has decayed away is reused for the next new interest.
+Each cluster keeps the context closest to its center as a readable summary.
+
+A profile is a few fixed-size float32 arrays, whatever the history length:
+
+    centers    (k, dim)   unit cluster centers
+    labels     (k, dim)   unit vector of each cluster's summary context
+    weights    (k,)       decayed weight per cluster, 0 for an unused slot
+
+With a directory, profiles are stored in <dir>/<user hash>.npz and re-read
+when another process (e.g. a gunicorn worker) has changed them. Writes are
+deferred: updates apply in memory at once and are written every
+flush_interval seconds (and at exit) by a background thread, one file per
+user that changed. If another process wrote the file in between, the flush
+re-reads it and replays this process's pending updates on top, under a
+lock on that user's file only.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import numpy as np
+from cachetools import LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, use one process per directory
+    fcntl = None
+
+from .vector_index import normalize
+
+logger = logging.getLogger(__name__)
+
+
+class _Profile:
+    """One user's arrays, with weights as of `updated`"""
+
+    def __init__(self, k, dim):
+        self.centers = np.zeros((k, dim), dtype=np.float32)
+        self.labels = np.zeros((k, dim), dtype=np.float32)
+        self.weights = np.zeros(k, dtype=np.float32)
+        self.summaries = [""] * k
+        self.updated = 0.0
+        self.count = 0
+        self.mtime = None  # of the file this was read from
+
+    @property
+    def dim(self):
+        return self.centers.shape[1]
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                centers=self.centers,
+                labels=self.labels,
+                weights=self.weights,
+                summaries=np.array(self.summaries, dtype=str),
+                meta=np.array([self.updated, self.count], dtype=np.float64)
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            profile = cls(*data["centers"].shape)
+            profile.centers = data["centers"]
+            profile.labels = data["labels"]
+            profile.weights = data["weights"]
+            profile.summaries = [str(text) for text in data["summaries"]]
+            profile.updated, count = data["meta"]
+            profile.count = int(count)
+        return profile
+
+
+class UserProfiles:
+    """
+    Args:
+        k (int): Interest clusters per user
+        half_life (float): Seconds after which a context counts half as much
+        threshold (float): Minimum cosine similarity to join a cluster; below it a
+            free slot starts a new one
+        min_weight (float): Clusters lighter than this count as free slots
+        maxsize (int): Profiles kept in memory
+        directory (str): Where profiles are stored; None keeps them in memory only
+        flush_interval (float): Seconds between writes of changed profiles to directory
+    """
+
+    def __init__(self, k=8, half_life=14 * 86400, threshold=0.75, min_weight=0.05, maxsize=10000, directory=None,
+                 flush_interval=5.0):
+        self.k = k
+        self.half_life = half_life
+        self.threshold = threshold
+        self.min_weight = min_weight
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._profiles = LRUCache(maxsize=maxsize)
+        # Guards _profiles, _pending and _user_locks only; each user's arrays are guarded by their own lock
+        self._lock = threading.Lock()
+        self._user_locks = weakref.WeakValueDictionary()
+        # user id -> [(vector, text, now)] folded in memory but not yet written
+        self._pending = {}
+        self._flusher = None
+        self.updates = 0
+        self.flushes = 0
+        if directory:
+            atexit.register(self.flush)
+
+    def _path(self, user_id):
+        name = hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, name + ".npz")
+
+    def _user_lock(self, user_id):
+        """The in-process lock for one user's profile, held while it is read or updated"""
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def _file_lock(self, user_id):
+        """Exclusive lock on one user's profile file, held for a read-modify-write"""
+        if fcntl is None or not self.directory:
+            yield
+            return
+        with open(self._path(user_id) + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _get(self, user_id):
+        """
+        A user's profile, re-read if another process wrote its file since, with
+        this process's pending updates replayed on top; None if there is none.
+        Called with the user's lock held.
+        """
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            pending = list(self._pending.get(user_id, ()))
+        if not self.directory:
+            return profile
+        path = self._path(user_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if profile is not None and profile.mtime == mtime:
+            return profile
+        # Changed on disk, or evicted from memory: rebuild from the file and what we haven't written yet
+        profile = _Profile.load(path) if mtime is not None else None
+        if profile is not None:
+            profile.mtime = mtime
+        for x, text, now in pending:
+            profile = self._fold(profile, x, text, now)
+        if profile is not None:
+            with self._lock:
+                self._profiles[user_id] = profile
+        return profile
+
+    def _decay(self, profile, now):
+        return 0.5 ** (max(now - profile.updated, 0.0) / self.half_life) if profile.updated else 1.0
+
+    def add(self, user_id, vector, text, now=None):
+        """
+        Fold one ingested context into a user's profile.
+
+        Args:
+            user_id (str): Owner of the context, as sent to /clean
+            vector (list): Embedding of the context
+            text (str): The context, kept as a summary if it is a cluster's most central one
+            now (float): Ingestion time, defaults to the current time
+        """
+        if not user_id or not vector or not self.k:
+            return
+        x = normalize(vector)
+        now = time.time() if now is None else now
+        with self._user_lock(user_id):
+            profile = self._fold(self._get(user_id), x, text, now)
+            with self._lock:
+                self._profiles[user_id] = profile
+                if self.directory:
+                    self._pending.setdefault(user_id, []).append((x, text, now))
+                self.updates += 1
+        if self.directory:
+            self._start_flusher()
+
+    def _fold(self, profile, x, text, now):
+        """Apply one unit vector to a profile (a new one if None or of another dimension); returns the profile"""
+        if profile is None or profile.dim != len(x):
+            profile = _Profile(self.k, len(x))
+
+        profile.weights *= self._decay(profile, now)
+
+        active = profile.weights > self.min_weight
+        similarities = profile.centers @ x
+        nearest = int(np.argmax(np.where(active, similarities, -np.inf))) if active.any() else None
+        if nearest is None or (similarities[nearest] < self.threshold and not active.all()):
+            slot = int(np.argmin(profile.weights))
+            profile.centers[slot] = x
+            profile.labels[slot] = x
+            profile.weights[slot] = 1.0
+            profile.summaries[slot] = text
+        else:
+            weight = profile.weights[nearest]
+            center = normalize(profile.centers[nearest] + (x - profile.centers[nearest]) / (weight + 1))
+            profile.centers[nearest] = center
+            profile.weights[nearest] = weight + 1
+            if x @ center >= profile.labels[nearest] @ center:
+                profile.labels[nearest] = x
+                profile.summaries[nearest] = text
+
+        profile.updated = now
+        profile.count += 1
+        return profile
+
+    def flush(self):
+        """
+        Write the profiles changed in this process since the last flush.
+
+        Returns:
+            int: Profiles written
+        """
+        with self._lock:
+            users = list(self._pending)
+        written = 0
+        for user_id in users:
+            with self._user_lock(user_id), self._file_lock(user_id):
+                # _get re-reads the file if another process wrote it, replaying our updates on top
+                profile = self._get(user_id)
+                with self._lock:
+                    pending = self._pending.pop(user_id, None)
+                if not pending or profile is None:
+                    continue
+                path = self._path(user_id)
+                profile.save(path)
+                profile.mtime = os.stat(path).st_mtime_ns
+                written += 1
+        with self._lock:
+            self.flushes += written
+        return written
+
+    def _start_flusher(self):
+        """Start the background flush thread in this process, if it isn't running (threads don't survive a fork)"""
+        flusher = self._flusher
+        if flusher is not None and flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is flusher:
+                self._flusher = threading.Thread(target=self._flush_loop, name="profile-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing user profiles failed")
+
+    def interests(self, user_id, n=3, query_vector=None, now=None):
+        """
+        A user's strongest interest clusters.
+
+        Args:
+            n (int): Most clusters to return
+            query_vector (list): If given, clusters are ordered by decayed weight
+                times their similarity to it, so the interests relevant to a
+                search come first
+            now (float): Time the weights are decayed to
+
+        Returns:
+            list: {"summary", "weight", "vector"} dicts, strongest first; weights
+            are shares of the user's decayed total and vectors are unit cluster centers
+        """
+        if not user_id:
+            return []
+        now = time.time() if now is None else now
+        with self._user_lock(user_id):
+            profile = self._get(user_id)
+            if profile is None:
+                return []
+            weights = profile.weights * self._decay(profile, now)
+            centers = profile.centers.copy()
+            summaries = list(profile.summaries)
+        active = np.flatnonzero(weights > self.min_weight)
+        if not len(active):
+            return []
+        scores = weights[active]
+        if query_vector:
+            scores = scores * np.maximum(centers[active] @ normalize(query_vector), 0)
+        order = active[np.argsort(-scores, kind="stable")][:n]
+        total = weights[active].sum()
+        return [
+            {"summary": summaries[i], "weight": float(weights[i] / total), "vector": centers[i]}
+            for i in order
+        ]
+
+    def stats(self):
+        with self._lock:
+            profiles = list(self._profiles.values())
+            return {
+                "users": len(profiles),
+                "updates": self.updates,
+                "pending": sum(len(updates) for updates in self._pending.values()),
+                "flushes": self.flushes,
+                "clusters": int(sum(int((p.weights > self.min_weight).sum()) for p in profiles)),
+                "maxsize": self._profiles.maxsize
+            }
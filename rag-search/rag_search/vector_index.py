@@ -0,0 +1,159 @@
+"""
+In-process vector index over per-user context embeddings.
+
+Vectors are L2-normalized on insert so cosine similarity is a plain dot
+product. The default backend is an exact float32 NumPy matrix; an HNSW
+backend (optional `hnswlib` package) can be selected for large histories.
+"""
+import threading
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def normalize(vectors):
+    """L2-normalize a vector or the rows of a matrix, as float32"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class ExactBackend:
+    """Brute-force dot product over a growing float32 matrix"""
+
+    def __init__(self, dim, capacity=1024):
+        self.dim = dim
+        self._matrix = np.empty((capacity, dim), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, vectors):
+        needed = self._size + len(vectors)
+        if needed > len(self._matrix):
+            grown = np.empty((max(needed, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size:needed] = vectors
+        self._size = needed
+
+    def search(self, query, k):
+        scores = self._matrix[:self._size] @ query
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+
+class HnswBackend:
+    """Approximate search with an hnswlib inner-product graph"""
+
+    def __init__(self, dim, capacity=1024, m=16, ef_construction=200, ef=64):
+        if hnswlib is None:
+            raise ImportError("The hnsw vector index backend requires the hnswlib package")
+        self.dim = dim
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=capacity, M=m, ef_construction=ef_construction)
+        self._index.set_ef(ef)
+        self._ef = ef
+
+    def __len__(self):
+        return self._index.get_current_count()
+
+    def add(self, vectors):
+        start = len(self)
+        needed = start + len(vectors)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        self._index.add_items(vectors, np.arange(start, needed))
+
+    def search(self, query, k):
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self._index.set_ef(max(self._ef, k))
+        labels, distances = self._index.knn_query(query, k=k)
+        # hnswlib's "ip" distance is 1 - dot product
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+
+BACKENDS = {
+    "exact": ExactBackend,
+    "hnsw": HnswBackend,
+}
+
+
+class VectorIndex:
+    """
+    Per-user collection of (embedding, record) pairs with top-k retrieval.
+
+    Args:
+        backend (str): Key in BACKENDS used for every user's index
+        **options: Passed to the backend constructor
+    """
+
+    def __init__(self, backend="exact", **options):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown vector index backend: {backend}")
+        self.backend = backend
+        self._options = options
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id, vector, record):
+        """Add one embedding and its record to a user's index"""
+        self.add_many(user_id, [vector], [record])
+
+    def add_many(self, user_id, vectors, records):
+        vectors = normalize(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(records):
+            raise ValueError("Expected one vector per record")
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = (BACKENDS[self.backend](vectors.shape[1], **self._options), [])
+                self._users[user_id] = entry
+            index, stored = entry
+            if index.dim != vectors.shape[1]:
+                raise ValueError(f"Expected {index.dim}-dim vectors, got {vectors.shape[1]}")
+            index.add(vectors)
+            stored.extend(records)
+
+    def search(self, user_id, query_vector, k=5):
+        """
+        Return the k records most similar to query_vector.
+
+        Returns:
+            list: (score, record) pairs, best first; empty for unknown users
+        """
+        query = normalize(query_vector)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return []
+            index, stored = entry
+            if index.dim != query.shape[-1]:
+                raise ValueError(f"Expected a {index.dim}-dim query, got {query.shape[-1]}")
+            ids, scores = index.search(query, k)
+            return [(float(score), stored[i]) for i, score in zip(ids, scores)]
+
+    def size(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            return len(entry[0]) if entry else 0
+
@@ -0,0 +1,240 @@
+"""
+Append-only, memory-mapped embedding storage with one file set per user.
+
+    <dir>/manifest.json       dtype and stored dimension shared by every user
+    <dir>/<user>.vec          row-major vectors, no header
+    <dir>/<user>.scale        float32 per-row scales (int8 only)
+    <dir>/<user>.jsonl        one metadata record per row
+
+Vectors are optionally truncated to their first `dims` components
+(Matryoshka-style) and re-normalized, then stored as float32, float16, or
+int8 with a symmetric per-row scale. Searches read the files through
+np.memmap in fixed-size blocks, so resident memory stays bounded by the
+block size rather than the history length.
+
+VectorStore has the same add/add_many/search/size surface as VectorIndex
+and can be used in its place. Several processes (e.g. gunicorn workers) can
+share one directory: appends take an exclusive file lock, and every access
+picks up rows other processes have appended since.
+"""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, use one process per directory
+    fcntl = None
+
+from .vector_index import normalize, top_k
+
+DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+
+def quantize(vectors, dtype):
+    """
+    Convert normalized float32 rows to the storage dtype.
+
+    Returns:
+        tuple: (data, scales) - scales is None unless dtype is int8
+    """
+    if dtype != "int8":
+        return vectors.astype(DTYPES[dtype]), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    data = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return data, scales
+
+
+class _UserVectors:
+    """Open file set and in-memory sidecar for one user"""
+
+    def __init__(self, base):
+        self.base = base
+        self.records = []
+        self.count = 0
+        self.offset = 0  # bytes of the .jsonl sidecar read into records
+        self._view = None
+        self._scales = None
+
+    def views(self, dtype, dim):
+        """Memory-mapped (vectors, scales) covering the first `count` rows"""
+        if self._view is None or len(self._view) != self.count:
+            self._view = np.memmap(self.base + ".vec", dtype=DTYPES[dtype], mode="r", shape=(self.count, dim))
+            if dtype == "int8":
+                self._scales = np.memmap(self.base + ".scale", dtype=np.float32, mode="r", shape=(self.count,))
+        return self._view, self._scales
+
+
+class VectorStore:
+    """
+    Per-user embedding store on disk.
+
+    Args:
+        directory (str): Where the per-user files live; created if missing
+        dtype (str): "float32", "float16" or "int8"
+        dims (int): Keep only the first dims components of each vector, 0 keeps all
+        block_rows (int): Rows scored per block during search
+    """
+
+    def __init__(self, directory, dtype="float32", dims=0, block_rows=8192):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector store dtype: {dtype}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = dtype
+        self.dims = dims
+        self.dim = dims or None
+        self.block_rows = block_rows
+        self._users = {}
+        self._lock = threading.Lock()
+        self._has_manifest = False
+        self._load_manifest()
+
+    def _load_manifest(self):
+        """Adopt the stored dtype and dimension, which another process may have written"""
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self._has_manifest = True
+        if manifest["dtype"] != self.dtype or (self.dims and manifest["dim"] != self.dims):
+            raise ValueError(
+                f"{self.directory} holds {manifest['dim']}-dim {manifest['dtype']} vectors, "
+                f"not {self.dims or manifest['dim']}-dim {self.dtype}"
+            )
+        self.dim = manifest["dim"]
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the directory, held while appending"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_manifest(self):
+        with open(os.path.join(self.directory, "manifest.json"), "w") as f:
+            json.dump({"dtype": self.dtype, "dim": self.dim}, f)
+        self._has_manifest = True
+
+    def _prepare(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.dim is not None:
+            if vectors.shape[1] < self.dim:
+                raise ValueError(f"Expected at least {self.dim}-dim vectors, got {vectors.shape[1]}")
+            vectors = vectors[:, :self.dim]
+        return normalize(vectors)
+
+    def _user(self, user_id):
+        """A user's state, brought up to date with the files; rows without metadata are ignored"""
+        state = self._users.get(user_id)
+        if state is None:
+            name = hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()[:32]
+            state = _UserVectors(os.path.join(self.directory, name))
+            self._users[user_id] = state
+        self._refresh(state)
+        return state
+
+    def _refresh(self, state):
+        """Read sidecar lines appended since the last look, by this or another process"""
+        path = state.base + ".jsonl"
+        if os.path.exists(path) and os.path.getsize(path) > state.offset:
+            with open(path, "rb") as f:
+                f.seek(state.offset)
+                data = f.read()
+            # A line still being written has no newline yet; leave it for next time
+            complete = data[:data.rfind(b"\n") + 1]
+            state.records.extend(json.loads(line) for line in complete.splitlines() if line.strip())
+            state.offset += len(complete)
+        if self.dim is not None and os.path.exists(state.base + ".vec"):
+            row_bytes = self.dim * np.dtype(DTYPES[self.dtype]).itemsize
+            rows = os.path.getsize(state.base + ".vec") // row_bytes
+            state.count = min(rows, len(state.records))
+
+    def add(self, user_id, vector, record):
+        """Append one embedding and its record to a user's files"""
+        self.add_many(user_id, [vector], [record])
+
+    def add_many(self, user_id, vectors, records):
+        vectors = self._prepare(vectors)
+        if len(vectors) != len(records):
+            raise ValueError("Expected one vector per record")
+        with self._lock, self._file_lock():
+            if not self._has_manifest:
+                self._load_manifest()
+            if not self._has_manifest:
+                # The first append fixes the dimension (dims, if set) and dtype for every process
+                self.dim = self.dim or vectors.shape[1]
+                self._write_manifest()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+
+            state = self._user(user_id)
+            data, scales = quantize(vectors, self.dtype)
+            # Truncate any torn tail from an earlier crash before appending
+            with open(state.base + ".vec", "ab") as f:
+                f.truncate(state.count * data.itemsize * self.dim)
+                f.write(data.tobytes())
+            if scales is not None:
+                with open(state.base + ".scale", "ab") as f:
+                    f.truncate(state.count * 4)
+                    f.write(scales.tobytes())
+            lines = b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records)
+            with open(state.base + ".jsonl", "ab") as f:
+                f.truncate(state.offset)
+                f.write(lines)
+            state.records.extend(records)
+            state.offset += len(lines)
+            state.count += len(records)
+
+    def search(self, user_id, query_vector, k=5):
+        """
+        Return the k records most similar to query_vector.
+
+        Returns:
+            list: (score, record) pairs, best first; empty for unknown users
+        """
+        with self._lock:
+            if self.dim is None:
+                self._load_manifest()
+            if self.dim is None:
+                return []
+            query = self._prepare(query_vector)[0]
+            state = self._user(user_id)
+            if not state.count:
+                return []
+            vectors, scales = state.views(self.dtype, self.dim)
+            records = state.records[:state.count]
+
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), self.block_rows):
+            block = vectors[start:start + self.block_rows]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores[start:start + len(block)] = block @ query
+        if scales is not None:
+            scores *= scales
+
+        ids = top_k(scores, k)
+        return [(float(scores[i]), records[i]) for i in ids]
+
+    def size(self, user_id):
+        with self._lock:
+            if self.dim is None:
+                self._load_manifest()
+            return self._user(user_id).count
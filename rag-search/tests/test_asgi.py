@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import flask
+import httpx
+import pytest
+
+from rag_search.asgi import ThreadPoolWsgiToAsgi
+
+
+@pytest.fixture
+def client():
+    app = flask.Flask(__name__)
+
+    @app.route("/echo", methods=["GET", "POST"])
+    def echo():
+        return {
+            "args": flask.request.args.to_dict(),
+            "body": flask.request.get_json(silent=True),
+            "header": flask.request.headers.get("X-Test"),
+            "path": flask.request.path
+        }
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(0.2)
+        return "done"
+
+    @app.route("/stream")
+    def stream():
+        return flask.Response((f"{n}\n" for n in range(3)), mimetype="text/plain", headers={"X-Streamed": "yes"})
+
+    transport = httpx.ASGITransport(app=ThreadPoolWsgiToAsgi(app))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_passes_the_request_through(client):
+    response = run(client.post("/echo?q=jet+plane&n=1", json={"a": "é"}, headers={"X-Test": "yes"}))
+    assert response.status_code == 200
+    assert response.json() == {"args": {"q": "jet plane", "n": "1"}, "body": {"a": "é"}, "header": "yes",
+                               "path": "/echo"}
+    assert run(client.get("/missing")).status_code == 404
+
+
+def test_streams_the_response(client):
+    response = run(client.get("/stream"))
+    assert response.text == "0\n1\n2\n"
+    assert response.headers["x-streamed"] == "yes"
+
+
+def test_serves_requests_concurrently(client):
+    async def both():
+        return await asyncio.gather(client.get("/slow"), client.get("/slow"))
+
+    start = time.perf_counter()
+    assert [response.text for response in run(both())] == ["done", "done"]
+    assert time.perf_counter() - start < 0.35
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from rag_search import cleaning
+from rag_search.request_cache import TTLMemo
+from rag_search.user_profile import UserProfiles
+from rag_search.vector_index import VectorIndex
+
+
+class FakeModel:
+    """Stands in for chat: summarizes every record in a batch prompt, except ids in skip"""
+
+    def __init__(self, skip=(), fail_on=None):
+        self.skip = set(skip)
+        self.fail_on = fail_on
+        self.prompts = []
+
+    def __call__(self, message, system_prompt, model_name, response_format):
+        records = json.loads(message.split(": ", 1)[1])
+        self.prompts.append([record["id"] for record in records])
+        if self.fail_on in self.prompts[-1]:
+            raise RuntimeError("model unavailable")
+        return json.dumps({"results": [
+            {"id": record["id"], "context": f"summary of {record['url']}"}
+            for record in records if record["id"] not in self.skip
+        ]})
+
+
+def fake_embeddings(texts):
+    embeddings = [None if "broken" in text else [1.0, float(len(text))] for text in texts]
+    errors = [{"index": i, "error": "embedding failed"} for i, vector in enumerate(embeddings) if vector is None]
+    return embeddings, errors
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(cleaning, "PRECLEAN_ENABLED", True)
+    monkeypatch.setattr(cleaning, "CLEAN_BATCH_PACK", 2)
+    monkeypatch.setattr(cleaning, "chat", model)
+    monkeypatch.setattr(cleaning, "make_embeddings_many", fake_embeddings)
+    monkeypatch.setattr(cleaning, "context_cache", TTLMemo())
+    monkeypatch.setattr(cleaning, "vector_index", VectorIndex())
+    monkeypatch.setattr(cleaning, "user_profiles", UserProfiles())
+    return model
+
+
+def record(n, **fields):
+    return {"url": f"https://example.com/{n}", "metadata": f"page {n}", "user_id": "alice", **fields}
+
+
+def test_results_keep_input_order_and_report_bad_records(model):
+    records = [record(0), {"url": "https://example.com/x"}, record(1), record(2)]
+    results = cleaning.clean_records(records)
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r["status"] for r in results] == ["success", "error", "success", "success"]
+    assert results[1]["error"] == "Missing required fields: metadata"
+    assert results[2]["data"]["context"] == "summary of https://example.com/1"
+    assert results[2]["data"]["embedding"] == [1.0, float(len("summary of https://example.com/1"))]
+    assert model.prompts == [[0, 2], [3]]
+    assert cleaning.vector_index.size("alice") == 3
+
+
+def test_cached_contexts_skip_the_model(model):
+    cleaning.clean_records([record(0), record(1)])
+    results = cleaning.clean_records([record(1), record(2)])
+    assert [r["status"] for r in results] == ["success", "success"]
+    assert model.prompts == [[0, 1], [1]]
+
+
+def test_unanswered_and_failed_packs_fail_only_their_records(model):
+    model.skip = {1}
+    model.fail_on = 2
+    results = cleaning.clean_records([record(0), record(1), record(2), record(3), record(4)])
+    assert [r["status"] for r in results] == ["success", "error", "error", "error", "success"]
+    assert results[1]["error"] == "Model returned no result for this record"
+    assert results[2]["error"] == results[3]["error"] == "model unavailable"
+
+
+def test_embedding_failures_are_reported_per_record(model):
+    results = cleaning.clean_records([record(0), record("broken")])
+    assert [r["status"] for r in results] == ["success", "error"]
+    assert results[1]["error"] == "embedding failed"
+    assert cleaning.vector_index.size("alice") == 1
@@ -0,0 +1,54 @@
+import pytest
+
+from rag_search.embedding_cache import EmbeddingCache, cache_key, normalize_text
+
+
+def test_keys_ignore_spacing_and_unicode_form_but_not_the_model():
+    assert normalize_text("  jet \n plane\t") == "jet plane"
+    assert cache_key("m", "café  au lait") == cache_key("m", "café au lait")
+    assert cache_key("m", "jet plane") != cache_key("other", "jet plane")
+    assert cache_key("m", "jet plane") != cache_key("m", "Jet plane")
+
+
+def test_memory_tier():
+    cache = EmbeddingCache(maxsize=2)
+    assert cache.get("m", "a") is None
+    cache.set_many("m", [("a", [1.0, 2.0]), ("b", [3.0, 4.0])])
+    assert cache.get_many("m", ["b", "missing", " a "]) == {0: [3.0, 4.0], 2: [1.0, 2.0]}
+    cache.set("m", "c", [5.0])
+    assert cache.stats()["memory_size"] == 2
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["persistent"]) == (2, 2, False)
+
+
+def test_disk_tier_survives_a_restart_and_is_promoted(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(db_path=path)
+    cache.set("m", "jet plane", [0.5, -0.25])
+    cache.close()
+
+    reopened = EmbeddingCache(db_path=path)
+    assert reopened.get("m", "jet plane") == [0.5, -0.25]
+    assert reopened.get("m", "jet plane") == [0.5, -0.25]
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["disk_size"]) == (1, 1, 1)
+    assert reopened.ping()
+
+
+def test_disk_ttl(tmp_path, monkeypatch):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(db_path=path).set("m", "old", [1.0])
+    reopened = EmbeddingCache(db_path=path, disk_ttl=60)
+    assert reopened.get("m", "old") == [1.0]
+
+    later = EmbeddingCache(db_path=path, disk_ttl=60)
+    monkeypatch.setattr("rag_search.embedding_cache.time.time", lambda: 10 ** 12)
+    assert later.get("m", "old") is None
+
+
+@pytest.mark.parametrize("db", [False, True])
+def test_vectors_round_trip_as_float32(tmp_path, db):
+    cache = EmbeddingCache(db_path=str(tmp_path / "e.sqlite3") if db else None)
+    cache.set("m", "x", [0.1, 0.2])
+    fresh = EmbeddingCache(db_path=str(tmp_path / "e.sqlite3")) if db else cache
+    assert fresh.get("m", "x") == pytest.approx([0.1, 0.2], abs=1e-7)
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from rag_search.job_queue import LEASE_EXPIRED, JobQueue, JobWorkers
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+
+
+def expire(queue, job_id):
+    queue._db().execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def make_ready(queue, job_id):
+    queue._db().execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+
+
+def test_claim_takes_ready_jobs_oldest_first(queue):
+    ids = queue.enqueue([{"n": 1}, {"n": 2}, {"n": 3}], webhook="https://hooks.example.com/")
+    jobs = queue.claim(2)
+    assert [job[0] for job in jobs] == ids[:2]
+    assert [job[1] for job in jobs] == [{"n": 1}, {"n": 2}]
+    assert jobs[0][2] == "https://hooks.example.com/"
+    assert jobs[0][3] == jobs[1][3]
+    assert [job[0] for job in queue.claim(5)] == ids[2:]
+    assert queue.claim(5) == []
+    assert queue.get(ids[0])["status"] == "running"
+    assert queue.get(ids[0])["attempts"] == 1
+
+
+def test_complete_and_fail(queue):
+    done, failed = queue.enqueue([{"n": 1}, {"n": 2}])
+    (_, _, _, lease), _ = queue.claim(2)
+    assert queue.complete(done, {"ok": True}, lease)
+    assert queue.get(done)["status"] == "done"
+    assert queue.get(done)["result"] == {"ok": True}
+
+    assert queue.fail(failed, "boom", lease, backoff=0) == "queued"
+    make_ready(queue, failed)
+    [(_, _, _, lease)] = queue.claim(1)
+    assert queue.fail(failed, "boom again", lease, backoff=0) == "failed"
+    job = queue.get(failed)
+    assert (job["status"], job["error"], job["attempts"]) == ("failed", "boom again", 2)
+    assert queue.stats()["done"] == 1 and queue.stats()["failed"] == 1
+
+
+def test_expired_lease_is_taken_over(queue):
+    [job_id] = queue.enqueue([{"n": 1}])
+    [(_, _, _, first)] = queue.claim(1)
+    assert queue.claim(1) == []
+    expire(queue, job_id)
+    [(_, _, _, second)] = queue.claim(1)
+    assert second != first
+    assert queue.get(job_id)["attempts"] == 2
+
+
+def test_lost_lease_cannot_complete_or_fail(queue):
+    [job_id] = queue.enqueue([{"n": 1}])
+    [(_, _, _, stale)] = queue.claim(1)
+    expire(queue, job_id)
+    [(_, _, _, current)] = queue.claim(1)
+
+    assert not queue.complete(job_id, "stale result", stale)
+    assert queue.fail(job_id, "stale error", stale) is None
+    assert queue.get(job_id)["status"] == "running"
+
+    assert queue.complete(job_id, "result", current)
+    assert queue.get(job_id)["result"] == "result"
+    assert not queue.complete(job_id, "again", current)
+
+
+def test_expired_lease_on_last_attempt_fails(queue):
+    [job_id] = queue.enqueue([{"n": 1}])
+    for _ in range(queue.max_attempts):
+        assert queue.claim(1)
+        expire(queue, job_id)
+    assert queue.claim(1) == []
+    assert queue.fail_expired() == [(job_id, None)]
+    job = queue.get(job_id)
+    assert (job["status"], job["error"], job["attempts"]) == ("failed", LEASE_EXPIRED, 2)
+    assert queue.fail_expired() == []
+
+
+def test_workers_process_and_notify(queue):
+    ok, bad = queue.enqueue([{"n": 1}, {"n": -1}], webhook="https://hooks.example.com/")
+    sent = []
+
+    def process(payloads):
+        return [(True, payload["n"] * 2) if payload["n"] > 0 else (False, "negative") for payload in payloads]
+
+    def notify(url, body):
+        sent.append(body)
+        return "200"
+
+    workers = JobWorkers(queue, process, notify=notify)
+    assert workers.run_once()
+    # The failed job is retried later, so only the finished one is reported yet
+    assert sent == [{"job_id": ok, "status": "done", "data": 2}]
+    assert queue.get(ok)["webhook_status"] == "200"
+    assert queue.get(bad)["status"] == "queued"
+
+    make_ready(queue, bad)
+    assert workers.run_once()
+    assert sent[-1] == {"job_id": bad, "status": "failed", "error": "negative"}
+    assert not workers.run_once()
+
+
+def test_workers_fail_jobs_whose_lease_ran_out(queue):
+    [job_id] = queue.enqueue([{"n": 1}], webhook="https://hooks.example.com/")
+    for _ in range(queue.max_attempts):
+        queue.claim(1)
+        expire(queue, job_id)
+    sent = []
+    workers = JobWorkers(queue, lambda payloads: [], notify=lambda url, body: sent.append(body) or "200")
+    assert not workers.run_once()
+    assert sent == [{"job_id": job_id, "status": "failed", "error": LEASE_EXPIRED}]
+
+
+def test_schema_migration_adds_lease_id(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    queue = JobQueue(path)
+    queue._db().execute("ALTER TABLE jobs DROP COLUMN lease_id")
+    queue.enqueue([{"n": 1}])
+    [(job_id, _, _, lease)] = JobQueue(path).claim(1)
+    assert JobQueue(path).complete(job_id, "done", lease)
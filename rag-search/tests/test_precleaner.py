@@ -0,0 +1,66 @@
+import pytest
+
+from rag_search.precleaner import canonical_url, condense_metadata, preclean_record
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.amazon.in/Some-Slug/dp/b0dxf6nj36/ref=sr_1_1?tag=x&qid=1",
+     "https://www.amazon.in/Some-Slug/dp/B0DXF6NJ36/"),
+    ("https://www.amazon.in/gp/product/B0DXF6NJ36?psc=1", "https://www.amazon.in/dp/B0DXF6NJ36/"),
+    ("https://www.amazon.in/s?k=rc+plane&ref=nb&crid=1", "https://www.amazon.in/s?k=rc+plane"),
+    ("https://youtu.be/abc123?si=x", "https://www.youtube.com/watch?v=abc123"),
+    ("https://m.youtube.com/watch?v=abc&t=10&si=1", "https://www.youtube.com/watch?v=abc"),
+    ("https://www.youtube.com/results?search_query=rc+jets&sp=x", "https://www.youtube.com/results?search_query=rc+jets"),
+    ("https://www.google.com/search?q=tent&sca_esv=1&tbm=isch", "https://www.google.com/search?q=tent&tbm=isch"),
+    ("HTTP://Example.com:80/a?utm_source=x&fbclid=y&id=3#frag", "http://example.com/a?id=3"),
+    ("https://www.amazon.in/gp/bestsellers?ref_=nav&pf_rd_p=1&ie=UTF8", "https://www.amazon.in/gp/bestsellers?ie=UTF8"),
+    ("https://www.youtube.com/@planes?si=x&view=0", "https://www.youtube.com/@planes?view=0"),
+    ("https://news.example.com/list?ref=home&tag=rc&sr=2&si=1&qid=9&utm_medium=x",
+     "https://news.example.com/list?ref=home&tag=rc&sr=2&si=1&qid=9"),
+    ("https://example.com:8443", "https://example.com:8443/"),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+
+@pytest.mark.parametrize("url, expected", [
+    (None, None),
+    ("", ""),
+    ("   ", ""),
+    (42, 42),
+    ("not a url", "not a url"),
+    ("http://[bad", "http://[bad"),
+])
+def test_canonical_url_leaves_unusable_input(url, expected):
+    assert canonical_url(url) == expected
+
+
+def test_condense_metadata():
+    assert condense_metadata("  Remote \n control\tplane  ") == "Remote control plane"
+    assert condense_metadata(None) == ""
+    assert condense_metadata({"title": "Plane", "tags": [1, 2]}) == '{"title":"Plane","tags":[1,2]}'
+
+
+def test_condense_metadata_cuts_at_a_word_boundary():
+    text = condense_metadata("word " * 200, max_chars=22)
+    assert text == "word word word word..."
+
+
+def test_preclean_record():
+    record = {
+        "url": "https://www.amazon.in/dp/B0DXF6NJ36?tag=bench",
+        "metadata": "A  plane",
+        "timestamp": 1759006852,
+        "geolocation": {"ok": True}
+    }
+    assert preclean_record(record) == {
+        "url": "https://www.amazon.in/dp/B0DXF6NJ36/",
+        "metadata": "A plane",
+        "timestamp": 1759006852,
+        "getGeolocation": {"ok": True}
+    }
+
+
+def test_preclean_record_without_url_or_metadata():
+    cleaned = preclean_record({"geolocation": "somewhere"})
+    assert cleaned == {"url": None, "metadata": "", "timestamp": None, "getGeolocation": None}
@@ -0,0 +1,70 @@
+import pytest
+
+from rag_search.product_ranker import TitleVectorCache, bm25_scores, prior_scores, rank, tokenize
+
+
+def test_tokenize():
+    assert tokenize("Jet-Plane TOY, 3+ years!") == ["jet", "plane", "toy", "3", "years"]
+    assert tokenize(None) == []
+
+
+def test_bm25_prefers_titles_with_rarer_matching_terms():
+    scores = bm25_scores("jet plane", ["toy jet", "toy plane", "plane plane jet", "garden hose"])
+    assert scores[3] == 0
+    assert scores[2] == max(scores)
+    assert not bm25_scores("", ["toy"]).any()
+
+
+def test_prior_shrinks_ratings_with_few_reviews():
+    products = [
+        {"rating": 5.0, "reviews": 2},
+        {"rating": 4.5, "reviews": "2,000"},
+        {"rating": None},
+    ]
+    scores = prior_scores(products)
+    assert scores[1] > scores[0] > scores[2]
+    assert ((scores >= 0) & (scores <= 1)).all()
+
+
+def test_rank_without_embeddings_uses_lexical_and_prior_scores():
+    products = [{"title": "garden hose"}, {"title": "jet plane toy"}, {"title": "hose reel"}]
+    ranked = rank("jet plane", products, [None] * 3)
+    assert [p["title"] for _, p in ranked] == ["jet plane toy", "garden hose", "hose reel"]
+    assert rank("jet plane", [], []) == []
+
+
+def test_rank_uses_query_and_context_similarity():
+    products = [{"title": "a"}, {"title": "b"}, {"title": "c"}]
+    vectors = [[1.0, 0.0], [0.0, 1.0], None]
+    ranked = rank("x", products, vectors, query_vector=[0.0, 1.0])
+    assert ranked[0][1]["title"] == "b"
+    ranked = rank("x", products, vectors, context_vectors=[[1.0, 0.0]])
+    assert ranked[0][1]["title"] == "a"
+    ranked = rank("x", products, vectors, interests=[{"vector": [0.0, 1.0], "weight": 3}])
+    assert ranked[0][1]["title"] == "b"
+
+
+def test_rank_keeps_marketplace_order_on_ties():
+    products = [{"title": "x"}, {"title": "y"}, {"title": "z"}]
+    assert [p["title"] for _, p in rank("q", products, [None] * 3)] == ["x", "y", "z"]
+
+
+def test_title_vector_cache_embeds_each_product_once():
+    batches = []
+
+    def embed_many(texts):
+        batches.append(texts)
+        return [None if text == "brok" else [float(len(text)), 1.0] for text in texts], []
+
+    cache = TitleVectorCache(embed_many, title_chars=4)
+    products = [{"asin": "A", "title": "jet plane"}, {"title": "broken"}, {"asin": "A", "title": "jet plane"}]
+    first = cache.get_many(products)
+    assert first[1] is None
+    assert first[0] == pytest.approx(first[2])
+    assert sum(x * x for x in first[0]) == pytest.approx(1.0)
+    assert batches == [["jet ", "brok"]]
+
+    cache.get_many(products[:1])
+    assert len(batches) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 3, 1)
@@ -0,0 +1,79 @@
+import orjson
+import pytest
+import requests
+
+from rag_search import products
+from rag_search.products import ProductResults, normalize_query
+
+
+@pytest.fixture
+def results():
+    records = [{"position": p, "title": f"product {p}", "asin": f"A{p}"} for p in (3, 1, 2, 4, 5)]
+    return ProductResults(records, top_k=4)
+
+
+def test_compact_view_is_in_marketplace_order(results):
+    assert [p["position"] for p in results.compact] == [1, 2, 3, 4]
+    assert set(results.compact[0]) == {"position", "title", "link_clean", "rating", "reviews", "price"}
+    assert [p["asin"] for p in results.ranked()] == ["A1", "A2", "A3", "A4"]
+    assert [p["asin"] for p in results.ranked(limit=2)] == ["A1", "A2"]
+
+
+def test_select_keeps_the_model_ranking_of_shown_positions(results):
+    assert [p["asin"] for p in results.select([3, "1", 2.0])] == ["A3", "A1", "A2"]
+
+
+@pytest.mark.parametrize("positions", [[5], [0], ["two"], [None], [1.5], [{"position": 1}]])
+def test_select_drops_positions_that_were_not_shown(results, positions):
+    assert results.select(positions) == []
+
+
+def test_select_drops_repeats_and_stops_at_the_limit(results):
+    assert [p["asin"] for p in results.select([2, 2, "2", 4, 1], limit=2)] == ["A2", "A4"]
+
+
+def test_head_limits_what_can_be_selected(results):
+    view = results.head(2)
+    assert [p["position"] for p in view.compact] == [1, 2]
+    assert view.select([3, 2]) == [results.by_position[2]]
+    assert len(results.compact) == 4
+
+
+def test_normalize_query():
+    assert normalize_query("  Jet   PLANE toy\n") == "jet plane toy"
+
+
+class FakeSearch:
+    def __init__(self, status, body):
+        self.response = requests.Response()
+        self.response.status_code = status
+        self.response._content = orjson.dumps(body)
+
+    def get_response(self):
+        return self.response
+
+
+@pytest.fixture
+def serpapi(monkeypatch):
+    def answer(status, body):
+        monkeypatch.setattr(products, "_google_search", lambda params: FakeSearch(status, body))
+    return answer
+
+
+def test_fetch_returns_organic_results(serpapi):
+    serpapi(200, {"organic_results": [{"position": 1, "title": "jet plane"}]})
+    assert products._fetch_products_details("jet plane", 5).ranked()[0]["title"] == "jet plane"
+
+
+def test_fetch_treats_no_results_as_empty(serpapi):
+    serpapi(200, {"error": "Amazon hasn't returned any results for this query."})
+    assert products._fetch_products_details("zzzz", 5).ranked() == []
+
+
+def test_fetch_raises_upstream_errors(serpapi):
+    serpapi(200, {"error": "Your account has run out of searches."})
+    with pytest.raises(products.SerpApiError, match="run out of searches"):
+        products._fetch_products_details("jet plane", 5)
+    serpapi(401, {"error": "Invalid API key."})
+    with pytest.raises(requests.exceptions.HTTPError):
+        products._fetch_products_details("jet plane", 5)
@@ -0,0 +1,59 @@
+import pytest
+
+from rag_search.prompt_budget import (estimate_tokens, pack_texts, rank_by_similarity, render_contexts,
+                                      render_product_table, truncate_to_tokens, unique_texts)
+
+
+@pytest.mark.parametrize("text, tokens", [("", 0), ("abc", 1), ("abcd", 1), ("abcde", 2)])
+def test_estimate_tokens(text, tokens):
+    assert estimate_tokens(text) == tokens
+
+
+def test_truncate_to_tokens_cuts_at_a_word():
+    assert truncate_to_tokens("short", 5) == "short"
+    assert truncate_to_tokens("one two three four five", 3) == "one two..."
+    assert truncate_to_tokens("x" * 40, 3) == "x" * 9 + "..."
+
+
+def test_unique_texts():
+    assert unique_texts(["Jet  plane", "jet plane", "", None, "  ", "toy"]) == ["Jet  plane", "toy"]
+
+
+def test_rank_by_similarity_orders_and_drops_near_duplicates():
+    texts = ["far", "close", "close again", "unembedded"]
+    vectors = [[0.0, 1.0], [1.0, 0.1], [1.0, 0.11], None]
+    ranked = rank_by_similarity(texts, vectors, [1.0, 0.0])
+    assert [text for _, text in ranked] == ["close", "far", "unembedded"]
+    assert ranked[-1][0] is None
+    assert rank_by_similarity(["a"], [None], [1.0]) == [(None, "a")]
+
+
+def test_pack_texts_truncates_the_first_text_that_does_not_fit():
+    texts = ["a" * 40, "word " * 40, "never"]
+    assert pack_texts(texts, budget=11) == ["a" * 40]
+    packed = pack_texts(texts, budget=11 + 20, min_tokens=8)
+    assert len(packed) == 2
+    assert packed[1].endswith("...")
+    assert estimate_tokens(packed[1]) <= 19
+
+
+def test_render_contexts():
+    assert render_contexts(["first\n line", "second"]) == "1. first line\n2. second"
+
+
+def test_render_product_table_stops_at_the_budget():
+    products = [
+        {"position": 1, "title": "Jet | plane", "rating": 4.5, "reviews": 10, "price": "$9"},
+        {"position": 2, "title": "x" * 200},
+        {"position": 3, "title": "toy"},
+    ]
+    table, rows = render_product_table(products, budget=1000, title_chars=20)
+    lines = table.splitlines()
+    assert lines[0] == "position|title|rating|reviews|price"
+    assert lines[1] == "1|Jet / plane|4.5|10|$9"
+    assert len(lines[2].split("|")[1]) <= 20
+    assert rows == 3
+
+    table, rows = render_product_table(products, budget=20)
+    assert rows == 1
+    assert table.count("\n") == 1
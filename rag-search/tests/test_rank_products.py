@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from rag_search import search
+from rag_search.product_ranker import TitleVectorCache
+from rag_search.products import ProductResults
+
+
+@pytest.fixture
+def products():
+    return ProductResults([{"position": p, "title": f"toy {p}", "asin": f"A{p}"} for p in range(1, 6)], top_k=5)
+
+
+def fake_embeddings(texts):
+    return [[1.0, float(i)] for i, _ in enumerate(texts)], []
+
+
+def test_late_titles_degrade_the_answer_but_are_cached(monkeypatch, products):
+    release = threading.Event()
+
+    def slow_titles(texts):
+        release.wait(5)
+        return fake_embeddings(texts)
+
+    titles = TitleVectorCache(slow_titles)
+    monkeypatch.setattr(search, "title_vectors", titles)
+    monkeypatch.setattr(search, "make_embeddings_many", fake_embeddings)
+    monkeypatch.setattr(search, "SEARCH_TITLE_TIMEOUT", 0.05)
+
+    degraded = []
+    chosen = search.rank_products("toy", ["context"], products, 3, degraded)
+    assert [p["asin"] for p in chosen] == ["A1", "A2", "A3"]
+    assert degraded == ["title_embeddings"]
+
+    # The batch carries on after the stage gave up on it
+    release.set()
+    deadline = time.monotonic() + 2
+    while titles.stats()["size"] < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    degraded = []
+    search.rank_products("toy", ["context"], products, 3, degraded)
+    assert degraded == []
+    assert titles.stats()["size"] == 5
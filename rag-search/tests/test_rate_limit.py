@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from rag_search.rate_limit import AdaptiveTokenBucket, RateLimitedError, Upstream, is_retryable, parse_duration
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+def failing(*errors, result="ok"):
+    """fn for Upstream.call that raises each error in turn, then returns result"""
+    remaining = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    fn.calls = calls
+    return fn
+
+
+@pytest.fixture
+def upstream():
+    upstream = Upstream("test", rate=1000, burst=1000, max_concurrency=4, max_attempts=3, max_delay=5)
+    upstream._backoff = lambda retry_state: 0
+    return upstream
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2", 2.0), ("0.5", 0.5), ("-3", 0.0), ("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h1m", 3660.0),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", [None, "soon", "5x"])
+def test_parse_duration_rejects(value):
+    assert parse_duration(value) is None
+
+
+def test_is_retryable():
+    assert is_retryable(http_error(503))
+    assert is_retryable(http_error(429))
+    assert is_retryable(requests.exceptions.ConnectionError())
+    assert not is_retryable(http_error(400))
+    assert not is_retryable(ValueError())
+    assert not is_retryable(RateLimitedError("local"))
+
+
+def test_bucket_spends_its_burst_then_paces():
+    bucket = AdaptiveTokenBucket(rate=10, burst=2)
+    now = bucket._updated
+    assert bucket._reserve(now) == 0
+    assert bucket._reserve(now) == 0
+    assert bucket._reserve(now) == pytest.approx(0.1)
+    assert bucket._reserve(now + 0.1) == 0
+
+
+def test_bucket_throttle_halves_the_rate_and_pauses():
+    bucket = AdaptiveTokenBucket(rate=8, burst=4)
+    bucket.on_throttle(retry_after=0.2)
+    assert bucket.rate == 4
+    assert bucket.throttled == 1
+    assert 0.1 < bucket._reserve(time.monotonic()) <= 0.2
+    for _ in range(10):
+        bucket.on_throttle()
+    assert bucket.rate == bucket.min_rate == 0.5
+
+
+def test_bucket_recovers_and_follows_headers():
+    bucket = AdaptiveTokenBucket(rate=10, burst=1)
+    bucket.on_throttle()
+    bucket.on_success()
+    assert bucket.rate == 6
+    bucket.on_success({"x-ratelimit-remaining-requests": "20", "x-ratelimit-reset-requests": "10s"})
+    assert bucket.rate == 2
+    bucket.on_success({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "1"})
+    assert bucket.stats()["paused_for"] > 0
+
+
+def test_bucket_gives_up_past_max_wait():
+    bucket = AdaptiveTokenBucket(rate=1, burst=1, max_wait=0.01)
+    bucket.acquire()
+    with pytest.raises(RateLimitedError):
+        bucket.acquire()
+
+
+def test_call_retries_retryable_errors(upstream):
+    fn = failing(http_error(503), requests.exceptions.ConnectionError())
+    assert upstream.call(fn) == "ok"
+    assert len(fn.calls) == 3
+    stats = upstream.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (1, 2, 0)
+    assert stats["errors"] == {"503": 1, "ConnectionError": 1}
+
+
+def test_call_does_not_retry_client_errors(upstream):
+    fn = failing(http_error(400))
+    with pytest.raises(requests.exceptions.HTTPError):
+        upstream.call(fn)
+    assert len(fn.calls) == 1
+    assert upstream.stats()["failures"] == 1
+
+
+def test_call_gives_up_after_max_attempts(upstream):
+    fn = failing(*(http_error(502) for _ in range(5)))
+    with pytest.raises(requests.exceptions.HTTPError):
+        upstream.call(fn)
+    assert len(fn.calls) == 3
+
+
+def test_call_honours_retry_after_and_reports_rate_limits(upstream):
+    fn = failing(*(http_error(429, {"Retry-After": "0.01"}) for _ in range(3)))
+    with pytest.raises(RateLimitedError) as info:
+        upstream.call(fn)
+    assert info.value.retry_after == pytest.approx(0.01)
+    assert upstream.bucket.throttled == 3
+    assert upstream.bucket.rate < upstream.bucket.max_rate
+
+
+def test_call_async_retries(upstream):
+    fn = failing(http_error(500))
+
+    async def attempt():
+        return fn()
+
+    assert asyncio.run(upstream.call_async(attempt)) == "ok"
+    assert len(fn.calls) == 2
+    assert upstream.stats()["retries"] == 1
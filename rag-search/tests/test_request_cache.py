@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rag_search.request_cache import AsyncSingleFlight, Coalescer, SingleFlight, SWRCache, content_key
+
+
+def concurrently(n, fn):
+    """Run fn from n threads released together; returns their results"""
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SlowFetch:
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"value {self.calls}"
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    fetch = SlowFetch()
+    assert concurrently(8, lambda: flight.do("k", fetch)) == ["value 1"] * 8
+    assert fetch.calls == 1
+    assert flight.coalesced == 7
+    assert flight.do("k", fetch) == "value 2"
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    fetch = SlowFetch(error=RuntimeError("upstream down"))
+
+    def call():
+        try:
+            return flight.do("k", fetch)
+        except RuntimeError as e:
+            return str(e)
+    assert concurrently(4, call) == ["upstream down"] * 4
+    assert fetch.calls == 1
+
+
+def test_swr_cache_fresh_hits_and_single_flight_misses():
+    cache = SWRCache(ttl=60, stale_ttl=60)
+    fetch = SlowFetch()
+    assert concurrently(6, lambda: cache.get("k", fetch)) == ["value 1"] * 6
+    assert cache.get("k", fetch) == "value 1"
+    assert fetch.calls == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["coalesced"], stats["size"]) == (1, 6, 5, 1)
+
+
+def test_swr_cache_serves_stale_while_refreshing():
+    cache = SWRCache(ttl=0.05, stale_ttl=60)
+    fetch = SlowFetch(delay=0)
+    assert cache.get("k", fetch) == "value 1"
+    time.sleep(0.06)
+    assert cache.get("k", fetch) == "value 1"
+    deadline = time.monotonic() + 2
+    while cache.get("k", fetch) != "value 2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fetch.calls == 2
+    assert cache.stats()["stale_hits"] >= 1
+
+
+def test_swr_cache_refetches_after_the_stale_window():
+    cache = SWRCache(ttl=0.01, stale_ttl=0.01)
+    fetch = SlowFetch(delay=0)
+    cache.get("k", fetch)
+    time.sleep(0.03)
+    assert cache.get("k", fetch) == "value 2"
+    assert cache.stats()["misses"] == 2
+
+
+def test_swr_cache_keeps_the_stale_value_when_a_refresh_fails():
+    cache = SWRCache(ttl=0.01, stale_ttl=60)
+    cache.get("k", lambda: "cached")
+    time.sleep(0.02)
+    assert cache.get("k", SlowFetch(delay=0, error=RuntimeError("down"))) == "cached"
+    deadline = time.monotonic() + 2
+    while not cache.stats()["refresh_errors"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.stats()["refresh_errors"] == 1
+    assert cache.get("k", lambda: "unused") == "cached"
+
+
+def test_swr_cache_does_not_cache_errors():
+    cache = SWRCache()
+    with pytest.raises(RuntimeError):
+        cache.get("k", SlowFetch(delay=0, error=RuntimeError("down")))
+    assert cache.get("k", lambda: "ok") == "ok"
+
+
+def test_content_key_ignores_key_order():
+    assert content_key("search", {"a": 1, "b": [1, 2]}) == content_key("search", {"b": [1, 2], "a": 1})
+    assert content_key("search", {"a": 1}) != content_key("search", {"a": 2})
+    assert content_key("search", {"a": 1}) != content_key("clean", {"a": 1})
+    assert content_key("search", {"a": 1}).startswith("search:")
+
+
+def test_coalescer_shares_one_call_then_memoizes():
+    coalescer = Coalescer(window=60)
+    fetch = SlowFetch()
+    assert concurrently(5, lambda: coalescer.do("k", fetch)) == ["value 1"] * 5
+    assert coalescer.do("k", fetch) == "value 1"
+    assert fetch.calls == 1
+    assert coalescer.stats() == {"coalesced": 4, "memo_hits": 1, "memo_size": 1}
+
+
+def test_coalescer_only_memoizes_kept_results():
+    coalescer = Coalescer(window=60)
+    fetch = SlowFetch(delay=0)
+
+    def keep(result):
+        return result != "value 1"
+    assert coalescer.do("k", fetch, keep=keep) == "value 1"
+    assert coalescer.do("k", fetch, keep=keep) == "value 2"
+    assert coalescer.do("k", fetch, keep=keep) == "value 2"
+    assert fetch.calls == 2
+
+
+def test_coalescer_without_a_window_does_not_memoize():
+    coalescer = Coalescer(window=0)
+    fetch = SlowFetch(delay=0)
+    assert [coalescer.do("k", fetch) for _ in range(2)] == ["value 1", "value 2"]
+    assert coalescer.stats()["memo_size"] == 0
+
+
+def test_async_single_flight_survives_a_cancelled_caller():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+    assert asyncio.run(main()) == "done"
+    assert calls == [1]
+    assert flight.coalesced == 1
+
+
+def test_coalescer_do_async():
+    coalescer = Coalescer(window=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        results = await asyncio.gather(*(coalescer.do_async("k", fetch) for _ in range(4)))
+        return results + [await coalescer.do_async("k", fetch)]
+    assert asyncio.run(main()) == [1] * 5
+    assert coalescer.stats() == {"coalesced": 3, "memo_hits": 1, "memo_size": 1}
@@ -0,0 +1,50 @@
+import base64
+
+import numpy as np
+import orjson
+import pytest
+
+from rag_search.response_encoding import (EmbeddingFormat, binary_response, dumps, embedding_fields, encode_vector,
+                                          negotiate)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, ("json", "float32")),
+    ("", ("json", "float32")),
+    ("*/*", ("json", "float32")),
+    ("application/json", ("json", "float32")),
+    ("application/json; embedding=base64", ("base64", "float32")),
+    ("application/json; embedding=base64; dtype=float16", ("base64", "float16")),
+    ("application/octet-stream", ("binary", "float32")),
+    ("application/octet-stream; dtype=float16, application/json", ("binary", "float16")),
+    ("application/octet-stream; dtype=float64, application/json; embedding=base64", ("base64", "float32")),
+    ("text/html, application/json; embedding=base64", ("base64", "float32")),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == EmbeddingFormat(*expected)
+
+
+def test_dumps_writes_numpy_natively():
+    assert orjson.loads(dumps({"v": np.array([0.5, 1.0], dtype=np.float32), 1: np.float32(2)})) == {
+        "v": [0.5, 1.0], "1": 2.0
+    }
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_base64_vectors_round_trip(dtype):
+    vector = [0.5, -1.25, 3.0]
+    fields = embedding_fields(vector, EmbeddingFormat("base64", dtype))
+    assert (fields["encoding"], fields["dtype"], fields["dim"]) == ("base64", dtype, 3)
+    assert np.frombuffer(base64.b64decode(fields["embedding"]), dtype=dtype).tolist() == vector
+    assert embedding_fields(vector, EmbeddingFormat("json", "float32")) == {"embedding": vector}
+    assert encode_vector(None, dtype) is None
+
+
+def test_binary_response_fills_missing_rows_with_nan():
+    response = binary_response([[1.0, 2.0], None, [3.0, 4.0]], "float16")
+    assert response.mimetype == "application/octet-stream"
+    assert (response.headers["X-Embedding-Count"], response.headers["X-Embedding-Dim"]) == ("3", "2")
+    rows = np.frombuffer(response.get_data(), dtype="<f2").reshape(3, 2)
+    assert rows[0].tolist() == [1.0, 2.0]
+    assert np.isnan(rows[1]).all()
+    assert binary_response([], "float32").get_data() == b""
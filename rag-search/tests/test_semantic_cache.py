@@ -0,0 +1,48 @@
+import time
+
+from rag_search.semantic_cache import SemanticCache
+
+
+def test_exact_and_near_hits_stay_in_their_scope():
+    cache = SemanticCache(threshold=0.9)
+    cache.set("alice", "jet plane toy", [1.0, 0.0, 0.0], "answer")
+    assert cache.get("alice", "jet plane toy", [0.0, 1.0, 0.0]) == "answer"
+    assert cache.get("alice", "toy jet airplane", [0.99, 0.1, 0.0]) == "answer"
+    assert cache.get("alice", "garden hose", [0.0, 1.0, 0.0]) is None
+    assert cache.get("bob", "jet plane toy", [1.0, 0.0, 0.0]) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["near_hits"], stats["misses"], stats["size"]) == (1, 1, 2, 1)
+
+
+def test_threshold_of_one_disables_near_hits():
+    cache = SemanticCache(threshold=1)
+    cache.set("alice", "jet plane toy", [1.0, 0.0], "answer")
+    assert cache.get("alice", "toy jet airplane", [1.0, 0.0]) is None
+    assert cache.get("alice", "jet plane toy", [1.0, 0.0]) == "answer"
+
+
+def test_set_replaces_the_same_text():
+    cache = SemanticCache()
+    cache.set("alice", "q", [1.0, 0.0], "old")
+    cache.set("alice", "q", [1.0, 0.0], "new")
+    assert cache.get("alice", "q", [1.0, 0.0]) == "new"
+    assert cache.stats()["size"] == 1
+
+
+def test_entries_expire():
+    cache = SemanticCache(ttl=0.01)
+    cache.set("alice", "q", [1.0, 0.0], "answer")
+    time.sleep(0.02)
+    assert cache.get("alice", "q", [1.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = SemanticCache(threshold=1, maxsize=2)
+    cache.set("alice", "a", [1.0, 0.0], "A")
+    cache.set("bob", "b", [0.0, 1.0], "B")
+    assert cache.get("alice", "a", [1.0, 0.0]) == "A"
+    cache.set("alice", "c", [1.0, 1.0], "C")
+    assert cache.get("bob", "b", [0.0, 1.0]) is None
+    assert cache.get("alice", "a", [1.0, 0.0]) == "A"
+    assert cache.get("alice", "c", [1.0, 1.0]) == "C"
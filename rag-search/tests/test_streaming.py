@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from rag_search.routes import _sse
+from rag_search.streaming import JsonStringFieldStream, iter_sse_data
+
+
+def stream(document, field="ai_message", size=1):
+    """Feed document in pieces of size characters; returns (decoded text, done)"""
+    parser = JsonStringFieldStream(field)
+    text = "".join(parser.feed(document[i:i + size]) for i in range(0, len(document), size))
+    return text, parser.done
+
+
+def test_iter_sse_data():
+    lines = ["data: one", "", ": comment", "data: two", "data:three", "", None, "event: x", "data: four"]
+    assert list(iter_sse_data(lines)) == ["one", "two\nthree", "four"]
+
+
+def test_sse_events_keep_their_payload_on_one_line():
+    payload = {"text": "line one\nline two", "accents": "é 😀"}
+    event = _sse("token", payload)
+    assert event.startswith("event: token\n") and event.endswith("\n\n")
+    assert [json.loads(data) for data in iter_sse_data(event.splitlines())] == [payload]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 1000])
+@pytest.mark.parametrize("value", [
+    "plain text",
+    'quotes " and \\ backslashes / and\nnewlines\ttabs',
+    "accents é ü and an emoji 😀 and 中文",
+    "",
+])
+def test_decodes_valid_json_in_any_split(value, size):
+    document = json.dumps({"products": [1, 2], "ai_message": value, "after": "x"})
+    assert stream(document, size=size) == (value, True)
+    ascii_document = json.dumps({"ai_message": value}, ensure_ascii=True)
+    assert stream(ascii_document, size=size) == (value, True)
+
+
+def test_waits_for_the_field_and_stops_at_its_end():
+    parser = JsonStringFieldStream("ai_message")
+    assert parser.feed('{"products": [1], "ai_mes') == ""
+    assert parser.feed('sage" : "Hel') == "Hel"
+    assert parser.feed('lo", "other": "ignored"}') == "lo"
+    assert parser.done
+    assert parser.feed('more') == ""
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+@pytest.mark.parametrize("document, expected", [
+    (r'{"ai_message": "a\uZZZZb"}', r"a\uZZZZb"),
+    (r'{"ai_message": "a\u12"}', r"a\u12"),
+    (r'{"ai_message": "a\qb"}', r"a\qb"),
+    (r'{"ai_message": "\ud83d\ude00"}', "😀"),
+    (r'{"ai_message": "lone \ud83d"}', "lone \ud83d"),
+    (r'{"ai_message": "\ud83d\uZZZZ"}', "\ud83d\\uZZZZ"),
+    (r'{"ai_message": "\ud83dxé"}', "\ud83dxé"),
+])
+def test_malformed_escapes_pass_through(document, expected, size):
+    assert stream(document, size=size) == (expected, True)
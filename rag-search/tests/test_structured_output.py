@@ -0,0 +1,71 @@
+import pytest
+
+from rag_search.structured_output import ResponseDecodeError, ResponseSchema, item_schema, loads
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "search_response",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"position": {"type": "integer"}, "title": {"type": "string"}},
+                        "required": ["position"]
+                    }
+                },
+                "ai_message": {"type": "string"}
+            },
+            "required": ["results", "ai_message"]
+        }
+    }
+}
+
+
+def test_loads_clean_json_is_not_repaired():
+    assert loads('{"a": 1}') == ({"a": 1}, False)
+    assert loads(b'[1, 2]') == ([1, 2], False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```\n[1, 2]\n```', [1, 2]),
+    ('Sure! Here it is: {"a": 1} Hope that helps.', {"a": 1}),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+    ("{'a': None, 'b': True, 'c': 'x'}", {"a": None, "b": True, "c": "x"}),
+    ('{"a": "a, ] inside a string",}', {"a": "a, ] inside a string"}),
+])
+def test_loads_repairs(text, expected):
+    assert loads(text) == (expected, True)
+
+
+@pytest.mark.parametrize("text", ["no json here", "{'a': __import__('os')}", '{"a": ', None])
+def test_loads_unrecoverable(text):
+    with pytest.raises(ResponseDecodeError) as info:
+        loads(text)
+    assert info.value.reason == "json"
+
+
+def test_parse_validates_and_counts():
+    schema = ResponseSchema(RESPONSE_FORMAT)
+    assert schema.parse('{"results": [{"position": "3"}], "ai_message": "ok"}') == {
+        "results": [{"position": 3}], "ai_message": "ok"
+    }
+    assert schema.parse('```json\n{"results": [], "ai_message": "ok",}\n```') == {"results": [], "ai_message": "ok"}
+    with pytest.raises(ResponseDecodeError) as info:
+        schema.parse('{"results": [{"title": "no position"}], "ai_message": "ok"}')
+    assert info.value.reason == "schema"
+    with pytest.raises(ResponseDecodeError):
+        schema.parse("nothing")
+    assert schema.stats() == {"parsed": 1, "repaired": 1, "invalid_json": 1, "invalid_schema": 1}
+
+
+def test_item_schema():
+    schema = item_schema(RESPONSE_FORMAT)
+    assert schema.validate({"position": 1, "title": "Plane"}) == {"position": 1, "title": "Plane"}
+    with pytest.raises(ResponseDecodeError):
+        schema.validate({"title": "Plane"})
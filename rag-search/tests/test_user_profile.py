@@ -0,0 +1,78 @@
+import pytest
+
+from rag_search.user_profile import UserProfiles
+
+DAY = 86400
+TOYS = [1.0, 0.0, 0.0]
+GARDEN = [0.0, 1.0, 0.0]
+
+
+def profiles(directory=None, **options):
+    return UserProfiles(k=2, half_life=DAY, directory=str(directory) if directory else None, flush_interval=3600,
+                        **options)
+
+
+def summaries(interests):
+    return [interest["summary"] for interest in interests]
+
+
+def test_contexts_are_clustered_by_topic():
+    store = profiles()
+    store.add("alice", TOYS, "jet plane toy", now=0)
+    store.add("alice", [0.95, 0.05, 0.0], "toy airplane", now=0)
+    store.add("alice", GARDEN, "garden hose", now=0)
+    interests = store.interests("alice", now=0)
+    assert summaries(interests) == ["toy airplane", "garden hose"]
+    assert [interest["weight"] for interest in interests] == pytest.approx([2 / 3, 1 / 3])
+    assert store.interests("bob") == []
+    assert store.stats()["clusters"] == 2
+
+
+def test_old_interests_decay_and_their_slot_is_reused():
+    store = profiles()
+    start = 100 * DAY
+    store.add("alice", TOYS, "toys", now=start)
+    store.add("alice", GARDEN, "garden", now=start)
+    store.add("alice", GARDEN, "garden", now=start + DAY)
+    interests = store.interests("alice", now=start + DAY)
+    assert summaries(interests) == ["garden", "toys"]
+    assert interests[1]["weight"] == pytest.approx(0.5 / 2)
+
+    store.add("alice", [0.0, 0.0, 1.0], "books", now=start + 30 * DAY)
+    assert summaries(store.interests("alice", now=start + 30 * DAY)) == ["books"]
+
+
+def test_query_vector_orders_interests_by_relevance():
+    store = profiles()
+    store.add("alice", TOYS, "toys", now=0)
+    store.add("alice", TOYS, "toys", now=0)
+    store.add("alice", GARDEN, "garden", now=0)
+    assert summaries(store.interests("alice", now=0, query_vector=GARDEN)) == ["garden", "toys"]
+    assert summaries(store.interests("alice", n=1, now=0)) == ["toys"]
+
+
+def test_ignores_missing_users_and_vectors():
+    store = profiles()
+    store.add("", TOYS, "toys")
+    store.add("alice", [], "toys")
+    assert store.stats()["updates"] == 0
+
+
+def test_profiles_are_written_on_flush_and_shared_between_processes(tmp_path):
+    first = profiles(tmp_path)
+    second = profiles(tmp_path)
+    first.add("alice", TOYS, "toys", now=0)
+    assert first.stats()["pending"] == 1
+    assert second.interests("alice", now=0) == []
+    assert first.flush() == 1
+    assert first.flush() == 0
+    assert summaries(second.interests("alice", now=0)) == ["toys"]
+
+    # Both write: the second flush replays its update on top of the first's file
+    first.add("alice", TOYS, "toys", now=0)
+    second.add("alice", GARDEN, "garden", now=0)
+    first.flush()
+    second.flush()
+    interests = profiles(tmp_path).interests("alice", now=0)
+    assert summaries(interests) == ["toys", "garden"]
+    assert [interest["weight"] for interest in interests] == pytest.approx([2 / 3, 1 / 3])
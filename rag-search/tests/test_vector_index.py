@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from rag_search.vector_index import VectorIndex, normalize, top_k
+
+
+def test_normalize():
+    assert normalize([3.0, 4.0]) == pytest.approx([0.6, 0.8])
+    assert np.linalg.norm(normalize([[1.0, 1.0], [0.0, 2.0]]), axis=1) == pytest.approx([1.0, 1.0])
+    assert not normalize([0.0, 0.0]).any()
+
+
+@pytest.mark.parametrize("k, expected", [(0, []), (2, [3, 1]), (4, [3, 1, 2, 0]), (10, [3, 1, 2, 0])])
+def test_top_k(k, expected):
+    assert top_k(np.array([0.1, 0.5, 0.3, 0.9]), k).tolist() == expected
+
+
+@pytest.mark.parametrize("backend", ["exact", "hnsw"])
+def test_search_returns_the_nearest_records(backend):
+    if backend == "hnsw":
+        pytest.importorskip("hnswlib")
+    vectors = np.random.default_rng(0).normal(size=(40, 16))
+    index = VectorIndex(backend, capacity=8)
+    index.add_many("alice", vectors[:30].tolist(), [{"n": i} for i in range(30)])
+    for i in range(30, 40):
+        index.add("alice", vectors[i].tolist(), {"n": i})
+    assert index.size("alice") == 40
+    for i in (0, 35):
+        (score, record), *rest = index.search("alice", (vectors[i] * 3).tolist(), k=3)
+        assert record == {"n": i}
+        assert score == pytest.approx(1.0, abs=1e-4)
+        assert len(rest) == 2
+    assert index.search("bob", vectors[0].tolist()) == []
+    assert index.size("bob") == 0
+
+
+def test_rejects_mismatched_input():
+    index = VectorIndex()
+    index.add("alice", [1.0, 0.0], {"n": 0})
+    with pytest.raises(ValueError):
+        index.add("alice", [1.0, 0.0, 0.0], {"n": 1})
+    with pytest.raises(ValueError):
+        index.search("alice", [1.0, 0.0, 0.0])
+    with pytest.raises(ValueError):
+        index.add_many("alice", [[1.0, 0.0]], [])
+    with pytest.raises(ValueError):
+        VectorIndex("annoy")
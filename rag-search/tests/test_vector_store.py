@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pytest
+
+from rag_search.vector_index import normalize
+from rag_search.vector_store import VectorStore, quantize
+
+
+def random_vectors(n, dim, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 1e-6), ("float16", 1e-3), ("int8", 1e-2)])
+def test_quantize_round_trip(dtype, tolerance):
+    vectors = normalize(random_vectors(20, 64))
+    data, scales = quantize(vectors, dtype)
+    assert data.dtype == np.dtype(dtype)
+    restored = data.astype(np.float32) * (scales[:, None] if scales is not None else 1)
+    assert (scales is not None) == (dtype == "int8")
+    assert np.abs(restored - vectors).max() < tolerance
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_search_round_trip(tmp_path, dtype):
+    vectors = random_vectors(50, 32)
+    records = [{"context": f"record {i}"} for i in range(50)]
+    store = VectorStore(str(tmp_path), dtype=dtype, block_rows=16)
+    store.add_many("alice", vectors[:30].tolist(), records[:30])
+    for vector, record in zip(vectors[30:], records[30:]):
+        store.add("alice", vector.tolist(), record)
+
+    assert store.size("alice") == 50
+    assert store.size("bob") == 0
+    assert store.search("bob", vectors[0].tolist()) == []
+    for i in (0, 29, 30, 49):
+        (score, record), *_ = store.search("alice", vectors[i].tolist(), k=3)
+        assert record == records[i]
+        assert score == pytest.approx(1.0, abs=1e-2)
+
+    # Another instance (e.g. a second worker) reads the same files
+    reopened = VectorStore(str(tmp_path), dtype=dtype)
+    assert reopened.size("alice") == 50
+    assert reopened.search("alice", vectors[7].tolist(), k=1)[0][1] == records[7]
+
+
+def test_dims_truncates_and_renormalizes(tmp_path):
+    vectors = random_vectors(10, 64)
+    store = VectorStore(str(tmp_path), dtype="float16", dims=16)
+    store.add_many("alice", vectors.tolist(), [{"n": i} for i in range(10)])
+    score, record = store.search("alice", vectors[3].tolist(), k=1)[0]
+    assert record == {"n": 3}
+    assert score == pytest.approx(1.0, abs=1e-2)
+    with open(tmp_path / "manifest.json") as f:
+        assert json.load(f)["dim"] == 16
+
+
+def test_rejects_mismatched_input(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.add("alice", [1.0, 0.0, 0.0], {"n": 0})
+    with pytest.raises(ValueError):
+        store.add("alice", [1.0, 0.0], {"n": 1})
+    with pytest.raises(ValueError):
+        store.add_many("alice", [[1.0, 0.0, 0.0]], [])
+    with pytest.raises(ValueError):
+        VectorStore(str(tmp_path / "other"), dtype="float64")